@@ -0,0 +1,665 @@
+"""
+This module allows to measure the tokenizer: throughput, allocations per
+token and peak memory of every generator and backend on fixed Russian,
+Latin and mixed-script inputs with short and long lines. It also compares the
+size and the decoding speed of pickled and encoded postings and, if asked,
+the time of indexing many files by Indexer.index and Indexer.index_many,
+split into phases by IndexStats, and the open time, index time and query
+latency of every storage backend.
+
+Run it as a script to print the results:
+    python lenin_benchmark.py [--size N] [--corpus FILE] [--backend NAME]
+                              [--method NAME] [--case NAME] [--repeat N]
+                              [--index-files N] [--workers N]
+                              [--storage NAME]
+The words of the inputs are taken from the vocabulary of tolstoy_db ("War
+and Peace"), shuffled with a fixed seed, so the numbers are reproducible. If
+a corpus file is given, its text is used for the Russian cases instead.
+"""
+import argparse
+import ast
+import gc
+import io
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from unicodedata import category
+from lenin_tokenizer import Tokenizer, TypeToken, BACKENDS, numpy
+from lenin_postings import (Position, CODECS, encode_postings,
+                            decode_postings)
+from lenin_indexer import Indexer, IndexStats
+from lenin_search_engine import SearchEngine
+from lenin_segments import compact_index
+from lenin_storage import STORAGES
+
+
+# generators of class Tokenizer measured for every backend
+METHODS = ("generate", "generate_with_type", "generate_AD", "generate_spans")
+# generators that read a file instead of a string
+FILE_METHODS = ("generate_stream", "generate_mmap")
+# length of a line in the cases with short lines
+LINE_LENGTH = 70
+
+
+def tolstoy_words(path="tolstoy_db.dir"):
+    """
+    Reads the words of "War and Peace" stored as the keys of tolstoy_db.
+
+    Args:
+        path (str): path to the .dir file of the database.
+
+    Returns:
+        List of words in the order of the file.
+    """
+    words = []
+    with open(path, encoding="latin-1") as f:
+        for line in f:
+            key, _ = ast.literal_eval(line)
+            words.append(key.encode("latin-1").decode("utf-8"))
+    return words
+
+
+def build_text(words, size, seed=0, extras=()):
+    """
+    Builds a text of shuffled words divided by spaces and punctuation.
+
+    Args:
+        words (list): words to choose from.
+        size (int): approximate number of characters of the text.
+        seed (int): seed of the random generator.
+        extras (tuple): strings that are mixed into the text besides words.
+
+    Returns:
+        The text as str without newlines.
+    """
+    rnd = random.Random(seed)
+    choices = list(words) + list(extras)
+    parts = []
+    length = 0
+    while length < size:
+        word = rnd.choice(choices)
+        sep = rnd.choice((" ", " ", " ", " ", ", ", ". ", " - "))
+        parts.append(word)
+        parts.append(sep)
+        length += len(word) + len(sep)
+    return "".join(parts)
+
+
+def split_lines(text, length=LINE_LENGTH):
+    """
+    Divides a text into lines of about the given length at spaces.
+    """
+    lines = []
+    start = 0
+    while start < len(text):
+        end = text.find(" ", start + length)
+        if end == -1:
+            end = len(text)
+        lines.append(text[start:end])
+        start = end + 1
+    return lines
+
+
+def tolstoy_text(path="tolstoy_db.dir", size=1000000, seed=0):
+    """
+    Builds a text out of the words of "War and Peace" stored as the keys of
+    tolstoy_db, divided into lines of LINE_LENGTH characters.
+
+    Args:
+        path (str): path to the .dir file of the database.
+        size (int): approximate number of characters of the text.
+        seed (int): seed of the random generator.
+
+    Returns:
+        The text as str.
+    """
+    return "\n".join(split_lines(build_text(tolstoy_words(path), size, seed)))
+
+
+def make_cases(size, corpus=None, db="tolstoy_db.dir"):
+    """
+    Builds the inputs of the benchmark.
+
+    Args:
+        size (int): approximate number of characters of every input.
+        corpus (str): path to a text file used for the Russian cases.
+        db (str): path to the .dir file of tolstoy_db.
+
+    Returns:
+        Dictionary {name of the case: list of lines}.
+    """
+    words = tolstoy_words(db)
+    russian = [w for w in words if all("а" <= c.lower() <= "я" or c in "ёЁ"
+                                       for c in w)]
+    latin = [w for w in words if w.isascii() and w.isalpha()]
+    if corpus is not None:
+        with open(corpus) as f:
+            russian_text = " ".join(f.read(size).split())
+    else:
+        russian_text = build_text(russian, size, 1)
+    latin_text = build_text(latin, size, 2)
+    mixed_text = build_text(words, size, 3,
+                            ("1812", "6:30", "«Ну!»", "😀", "𝐀𝐁𝐂", "x²",
+                             "№5", "…", "Bonaparte's"))
+    return {"russian short lines": split_lines(russian_text),
+            "russian long line": [russian_text],
+            "latin short lines": split_lines(latin_text),
+            "mixed short lines": split_lines(mixed_text),
+            "mixed long line": [mixed_text]}
+
+
+def _category_type(c):
+    """
+    Gets type of a character the way it was done before the character tables
+    were introduced. Used as a baseline.
+    """
+    cat = category(c)
+    if cat[0] == "L":
+        return "a"
+    elif cat[0] == "N":
+        return "d"
+    elif cat[0] == "Z":
+        return "s"
+    elif cat[0] == "P":
+        return "p"
+    else:
+        return "o"
+
+
+def _category_generate_with_type(text):
+    """
+    Tokenizer.generate_with_type as it was before the character tables were
+    introduced. Used as a baseline.
+    """
+    if not text:
+        return
+    previousType = ""
+    pos = 0
+    for i, c in enumerate(text):
+        currentType = _category_type(c)
+        if currentType != previousType and i>0:
+            yield TypeToken(pos, text[pos:i], previousType)
+            pos = i
+        previousType = currentType
+    yield TypeToken(pos, text[pos:i+1], previousType)
+
+
+def measure(func, *args, repeat=3):
+    """
+    Calls func(*args) several times and returns the best time in seconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_classifier(text):
+    """
+    Compares generate_with_type classifying characters by
+    unicodedata.category (before) and by the character tables (after).
+
+    Args:
+        text (str): text to tokenize.
+
+    Returns:
+        Dictionary {name: characters per second}.
+    """
+    tokenizer = Tokenizer()
+    lines = text.splitlines()
+
+    def run(generate):
+        for line in lines:
+            for _ in generate(line):
+                pass
+
+    # build the tables before the measurements
+    tokenizer._getType("a")
+    return {"category": len(text) / measure(run, _category_generate_with_type),
+            "table": len(text) / measure(run, tokenizer.generate_with_type)}
+
+
+def text_postings(text, path="war_and_peace.txt"):
+    """
+    Builds postings of a text the way older versions of Indexer stored them.
+
+    Args:
+        text (str): text to index.
+        path (str): name of the file the text is stored under.
+
+    Returns:
+        Dictionary {term: {path: [positions]}}.
+    """
+    postings = {}
+    tokens = Tokenizer(backend="regex").generate_stream(io.StringIO(text),
+                                                        types="ad")
+    for token in tokens:
+        postings.setdefault(token.s, {}).setdefault(path, []).append(
+            Position(token.line, token.col, token.col + len(token.s)))
+    return postings
+
+
+def bench_postings(postings, repeat=3):
+    """
+    Compares postings pickled as lists of positions (the old format of the
+    database) with postings encoded by encode_postings.
+
+    Args:
+        postings (dict): postings as returned by text_postings.
+        repeat (int): number of runs, the best one is taken.
+
+    Returns:
+        Dictionary {name: (size in bytes, positions decoded per second)}.
+        "encoded, paths" decodes only the paths of every term, as search
+        does for the files it skips; "columns" and "arrays" decode positions
+        into array.array and numpy columns.
+    """
+    pickled = [pickle.dumps(entry, pickle.DEFAULT_PROTOCOL)
+               for entry in postings.values()]
+    # paths are replaced by docIDs in the order they are met
+    doc_ids = {}
+    encoded = [encode_postings({doc_ids.setdefault(path, len(doc_ids)):
+                                positions
+                                for path, positions in entry.items()})
+               for entry in postings.values()]
+    count = sum(len(positions) for entry in postings.values()
+                for positions in entry.values())
+
+    def unpickle():
+        for data in pickled:
+            pickle.loads(data)
+
+    def decode(method):
+        def run():
+            for data in encoded:
+                for positions in decode_postings(data).values():
+                    if method is not None:
+                        getattr(positions, method)()
+        return run
+
+    pickled_size = sum(len(data) for data in pickled)
+    encoded_size = sum(len(data) for data in encoded)
+    results = {"pickled": (pickled_size, count / measure(unpickle,
+                                                          repeat=repeat))}
+    methods = {"encoded, paths": None, "encoded": "positions",
+               "encoded, columns": "columns"}
+    if numpy is not None:
+        methods["encoded, arrays"] = "arrays"
+    for name, method in methods.items():
+        results[name] = (encoded_size,
+                         count / measure(decode(method), repeat=repeat))
+    return results
+
+
+def _stop_word(postings):
+    """
+    Returns positions of a stop word in the file of postings of one file: the
+    texts of the benchmark have no stop words, so it occurs at every token.
+    """
+    return sorted(position for entry in postings.values()
+                  for positions in entry.values() for position in positions)
+
+
+def _rare_lines(postings, queries):
+    """
+    Returns sorted lines of the rarest terms of postings of one file.
+    """
+    lists = {term: next(iter(entry.values()))
+             for term, entry in postings.items()}
+    terms = sorted(lists, key=lambda term: len(lists[term]))
+    return [sorted({position.line for position in lists[term]})
+            for term in terms[:queries]]
+
+
+def bench_line_search(postings, queries=50, repeat=3):
+    """
+    Compares finding the lines of rare terms in the posting list of a stop
+    word by decoding the whole list and by jumping over its blocks with skip
+    entries (PostingList.on_lines), as line_search does.
+
+    Args:
+        postings (dict): {term: {path: [positions]}} of one file.
+        queries (int): number of rare terms.
+        repeat (int): number of runs, the best one is taken.
+
+    Returns:
+        Dictionary {name: queries per second}.
+    """
+    data = encode_postings({0: _stop_word(postings)})
+    lines = _rare_lines(postings, queries)
+
+    def decoded():
+        for query in lines:
+            wanted = set(query)
+            [position for position in decode_postings(data)[0]
+             if position.line in wanted]
+
+    def skipped():
+        for query in lines:
+            decode_postings(data)[0].on_lines(query)
+
+    return {"decoded": len(lines) / measure(decoded, repeat=repeat),
+            "skips": len(lines) / measure(skipped, repeat=repeat)}
+
+
+def bench_codecs(postings, queries=50, repeat=3):
+    """
+    Compares the codecs of blocks of positions on the posting list of a stop
+    word: its size, decoding of all positions and finding the lines of rare
+    terms by PostingList.on_lines, which decompresses only the blocks of
+    these lines.
+
+    Args:
+        postings (dict): {term: {path: [positions]}} of one file.
+        queries (int): number of rare terms.
+        repeat (int): number of runs, the best one is taken.
+
+    Returns:
+        Dictionary {codec: (size in bytes, positions decoded per second,
+        queries per second)}.
+    """
+    positions = _stop_word(postings)
+    lines = _rare_lines(postings, queries)
+    results = {}
+    for codec in CODECS:
+        try:
+            data = encode_postings({0: positions}, codec)
+        except ImportError:
+            continue
+
+        def decode():
+            decode_postings(data)[0].positions()
+
+        def search():
+            for query in lines:
+                decode_postings(data)[0].on_lines(query)
+
+        results[codec] = (len(data),
+                          len(positions) / measure(decode, repeat=repeat),
+                          len(lines) / measure(search, repeat=repeat))
+    return results
+
+
+def bench_indexer(text, files, workers):
+    """
+    Measures indexing of several copies of a text into a new database one by
+    one with Indexer.index and with Indexer.index_many.
+
+    Args:
+        text (str): text of every file.
+        files (int): number of files.
+        workers (list): numbers of workers of index_many to measure.
+
+    Returns:
+        Dictionary {name: (characters indexed per second, IndexStats)}.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(files):
+            paths.append(os.path.join(tmp, "file" + str(i) + ".txt"))
+            with open(paths[-1], "w", encoding="utf-8") as f:
+                f.write(text)
+        runs = [("index", None)] + [("index_many, " + str(n), n)
+                                    for n in workers]
+        for i, (name, n) in enumerate(runs):
+            stats = IndexStats()
+            start = time.perf_counter()
+            with Indexer(os.path.join(tmp, "db" + str(i)),
+                         stats=stats) as indexer:
+                if n is None:
+                    for path in paths:
+                        indexer.index(path)
+                else:
+                    indexer.index_many(paths, workers=n)
+            results[name] = (len(text) * files /
+                             (time.perf_counter() - start), stats)
+    return results
+
+
+def bench_storage(text, files, storages, queries=200, seed=0):
+    """
+    Measures every storage backend on several copies of a text: the time of
+    indexing them by Indexer.index_many, the time of opening the database by
+    SearchEngine and the latency of multiword_search on queries of one and
+    two random words of the text. The database of the last backend is also
+    written by compact_index as a memory-mapped read-only index ("compact",
+    its index time is the time of compact_index).
+
+    Args:
+        text (str): text of every file.
+        files (int): number of files.
+        storages (list): names of storage backends to measure.
+        queries (int): number of queries.
+        seed (int): seed of the random generator of the queries.
+
+    Returns:
+        Dictionary {storage: (index seconds, open seconds,
+        microseconds per query)}.
+    """
+    rnd = random.Random(seed)
+    words = sorted({token.s for token in Tokenizer().generate_AD(text)})
+    # one word in even queries, two words in odd ones
+    words = [" ".join(rnd.choice(words) for _ in range(1 + i % 2))
+             for i in range(queries)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(files):
+            paths.append(os.path.join(tmp, "file" + str(i) + ".txt"))
+            with open(paths[-1], "w", encoding="utf-8") as f:
+                f.write(text)
+
+        def search(path, storage=None):
+            start = time.perf_counter()
+            engine = SearchEngine(path, storage=storage)
+            open_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for query in words:
+                engine.multiword_search(query)
+            query_time = time.perf_counter() - start
+            engine.db.close()
+            return open_time, query_time / queries * 1e6
+
+        for storage in storages:
+            path = os.path.join(tmp, "db_" + storage)
+            start = time.perf_counter()
+            with Indexer(path, storage=storage) as indexer:
+                indexer.index_many(paths, workers=1)
+            index_time = time.perf_counter() - start
+            results[storage] = (index_time,) + search(path, storage)
+        compact = os.path.join(tmp, "db_compact")
+        start = time.perf_counter()
+        compact_index(path, compact)
+        results["compact"] = (time.perf_counter() - start,) + search(compact)
+    return results
+
+
+def bench(generate, inputs, chars, repeat=3):
+    """
+    Measures one generator.
+
+    Args:
+        generate (callable): function that takes an input and returns an
+            iterable of tokens.
+        inputs (list): inputs to pass to generate one by one.
+        chars (int): number of characters in all inputs.
+        repeat (int): number of runs, the best one is taken.
+
+    Returns:
+        Dictionary with keys:
+            chars/sec, tokens/sec - throughput,
+            blocks/token - memory blocks kept alive per token if the tokens
+                are collected into lists (the token object, its string etc.),
+            peak KiB - peak of memory allocated while the tokens are
+                consumed one by one.
+    """
+    def run():
+        for item in inputs:
+            for _ in generate(item):
+                pass
+
+    elapsed = measure(run, repeat=repeat)
+
+    gc.collect()
+    before = sys.getallocatedblocks()
+    kept = []
+    for item in inputs:
+        result = generate(item)
+        # arrays are kept as they are, they do not hold an object per token
+        if numpy is None or not isinstance(result, numpy.ndarray):
+            result = list(result)
+        kept.append(result)
+    blocks = sys.getallocatedblocks() - before - len(kept)
+    tokens = sum(len(item) for item in kept)
+    del kept
+
+    gc.collect()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"chars/sec": chars / elapsed,
+            "tokens/sec": tokens / elapsed,
+            "blocks/token": blocks / tokens if tokens else 0.0,
+            "peak KiB": peak / 1024}
+
+
+def bench_tokenizer(cases, backends=BACKENDS, methods=None, repeat=3):
+    """
+    Generator.
+    Measures the generators of the tokenizer on every case.
+
+    Args:
+        cases (dict): inputs as returned by make_cases.
+        backends (tuple): backends of the tokenizer to measure.
+        methods (tuple): names of methods to measure, all if None.
+        repeat (int): number of runs, the best one is taken.
+
+    Yields:
+        Tuples (backend, method, case, results of bench).
+    """
+    methods = methods or METHODS + FILE_METHODS + ("tokenize_arrays",)
+    for case, lines in cases.items():
+        chars = sum(len(line) for line in lines) + len(lines) - 1
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".txt",
+                                         delete=False) as f:
+            f.write("\n".join(lines))
+        try:
+            for backend in backends:
+                if backend == "numpy" and numpy is None:
+                    continue
+                tokenizer = Tokenizer(backend=backend)
+                for method in methods:
+                    if method in METHODS:
+                        generate = getattr(tokenizer, method)
+                        inputs = lines
+                    elif method == "generate_stream":
+                        def generate(path):
+                            with open(path, encoding="utf-8") as file:
+                                yield from tokenizer.generate_stream(file)
+                        inputs = [f.name]
+                    elif method == "generate_mmap":
+                        generate = tokenizer.generate_mmap
+                        inputs = [f.name]
+                    elif method == "tokenize_arrays" and backend == "numpy":
+                        def generate(text):
+                            return tokenizer.tokenize_arrays(text)[0]
+                        inputs = ["\n".join(lines)]
+                    else:
+                        continue
+                    yield (backend, method, case,
+                           bench(generate, inputs, chars, repeat))
+        finally:
+            os.remove(f.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=200000,
+                        help="number of characters of every input")
+    parser.add_argument("--corpus", help="text file for the Russian cases")
+    parser.add_argument("--backend", action="append", choices=BACKENDS,
+                        help="backend to measure (all by default)")
+    parser.add_argument("--method", action="append",
+                        choices=METHODS + FILE_METHODS + ("tokenize_arrays",),
+                        help="method to measure (all by default)")
+    parser.add_argument("--case", action="append",
+                        help="case to measure (all by default)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--index-files", type=int, default=0,
+                        help="number of files to index (indexing is not "
+                             "measured by default)")
+    parser.add_argument("--workers", type=int, action="append",
+                        help="workers of index_many (1 and the number of "
+                             "CPUs by default)")
+    parser.add_argument("--storage", action="append", choices=list(STORAGES),
+                        help="storage backend to measure, storages are "
+                             "measured if --index-files is given (all by "
+                             "default)")
+    args = parser.parse_args()
+
+    cases = make_cases(args.size, args.corpus)
+    if args.case:
+        cases = {name: cases[name] for name in args.case}
+
+    text = "\n".join(next(iter(cases.values())))
+    for name, speed in bench_classifier(text).items():
+        print("generate_with_type by {:<9} {:>12.0f} chars/sec".format(
+            name, speed))
+    print()
+
+    postings = text_postings(text)
+    for name, (size, speed) in bench_postings(postings, args.repeat).items():
+        print("postings {:<16} {:>10} bytes {:>12.0f} positions/sec".format(
+            name, size, speed))
+    for name, speed in bench_line_search(postings,
+                                         repeat=args.repeat).items():
+        print("line search {:<13} {:>12.0f} queries/sec".format(name, speed))
+    for codec, (size, speed, queries) in bench_codecs(
+            postings, repeat=args.repeat).items():
+        print("codec {:<19} {:>10} bytes {:>12.0f} positions/sec "
+              "{:>9.0f} queries/sec".format(codec, size, speed, queries))
+    print()
+
+    if args.index_files:
+        workers = args.workers or sorted({1, os.cpu_count() or 1})
+        for name, (speed, stats) in bench_indexer(text, args.index_files,
+                                                  workers).items():
+            print("indexer {:<17} {:>12.0f} chars/sec {:>10.0f} tokens/sec "
+                  "scan {:.3f} s tokenize {:.3f} s accumulate {:.3f} s "
+                  "write {:.3f} s".format(
+                      name, speed, stats.tokens_per_sec, stats.scan_time,
+                      stats.tokenize_time, stats.accumulate_time,
+                      stats.write_time))
+        print()
+        for name, (index_time, open_time, query_time) in bench_storage(
+                text, args.index_files, args.storage or list(STORAGES)).items():
+            print("storage {:<8} index {:>8.3f} s open {:>8.4f} s "
+                  "query {:>9.1f} us".format(name, index_time, open_time,
+                                             query_time))
+        print()
+
+    row = "{:<6} {:<19} {:<20} {:>11} {:>11} {:>12} {:>9}"
+    print(row.format("", "method", "case", "chars/sec", "tokens/sec",
+                     "blocks/token", "peak KiB"))
+    for backend, method, case, result in bench_tokenizer(
+            cases, args.backend or BACKENDS, args.method, args.repeat):
+        print(row.format(backend, method, case,
+                         "{:.0f}".format(result["chars/sec"]),
+                         "{:.0f}".format(result["tokens/sec"]),
+                         "{:.2f}".format(result["blocks/token"]),
+                         "{:.0f}".format(result["peak KiB"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,101 +1,597 @@
 """
 This module allows to index files into a database.
 """
-import shelve
+import fnmatch
+import hashlib
+import heapq
 import os
-from functools import total_ordering
+import pickle
+import re
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice
+from operator import itemgetter
 from lenin_tokenizer import Tokenizer
+from lenin_normalizer import Normalizer
+from lenin_postings import (Position, PostingList, META_PREFIX, CODECS,
+                            encode_positions, append_positions)
+from lenin_segments import open_index
 
 
-@total_ordering
-class Position(object):
+# number of characters of a file tokenized at once
+CHUNK_SIZE = 1 << 16
+# default number of positions kept in memory before they are written into
+# the database
+FLUSH_THRESHOLD = 1 << 20
+
+# estimated memory taken by a buffered position and by a buffered term in
+# bytes, used to keep the buffer within a memory budget
+POSITION_SIZE = 200
+TERM_SIZE = 450
+
+# number of files index_tree takes from the walk and indexes at once
+TREE_WINDOW = 1000
+
+# number of tokens taken from the tokenizer at once when the time of
+# tokenization is measured
+STATS_BATCH = 256
+
+# settings of the normalizer the database was built with
+NORMALIZER_KEY = META_PREFIX + "normalizer"
+# line breaks of universal newlines mode the tokenizer counts lines by
+_NEWLINE = re.compile(rb"\r\n?|\n")
+
+
+def stored_normalizer(db, normalizer=None):
+    """
+    Returns the normalizer a database was built with.
+
+    Args:
+        db (shelf): database.
+        normalizer (Normalizer): normalizer that is going to be used with the
+            database, if any.
+
+    Returns:
+        Normalizer or None if terms of the database are not normalized.
+
+    Raises:
+        ValueError: in case the database was built with a different
+            normalizer.
     """
-    Position stores data about the position of the first and the last
-    character of a token.
+    config = db.get(NORMALIZER_KEY)
+    if config is None:
+        return normalizer
+    if normalizer is None:
+        return Normalizer.from_config(config)
+    if normalizer.config() != config:
+        raise ValueError("The database was built with another normalizer: " +
+                         repr(Normalizer.from_config(config)))
+    return normalizer
+
+
+class IndexStats(object):
+    """
+    IndexStats collects metrics of an Indexer: the amount of indexed data,
+    the time spent in every phase of indexing and the state of the buffer at
+    every write into the database. Pass an instance to Indexer to turn the
+    metrics on.
+
+    Phases:
+        scan - reading files for their fingerprints and line offsets,
+        tokenize - dividing files into tokens,
+        accumulate - normalizing tokens and adding their positions to the
+            buffer (to the postings of a run in index_many),
+        write - writing postings into the database and run files.
+    Phase times of index_many are summed over its workers, so with several
+    workers they may exceed elapsed.
 
     Attributes:
-        line (int): line in which the token is.
-        start (int): position of the first character of the token.
-        end (int): position after the last character of the token.
+        files (int): number of indexed files.
+        bytes (int): size of the indexed files.
+        lines (int): number of lines of the indexed files.
+        tokens (int): number of indexed tokens.
+        elapsed (float): seconds spent in index, index_many and flush.
+        scan_time, tokenize_time, accumulate_time, write_time (float):
+            seconds spent in every phase.
+        flushes (list): dictionaries {"terms": number of distinct terms,
+            "positions": number of positions, "seconds": time of the write}
+            of every write of postings into the database.
+        callback (callable): called as callback(event, stats) with event
+            "flush" after every write into the database and "index" at the
+            end of every call of index and index_many, or None.
     """
-    def __init__(self, line, start, end):
+    def __init__(self, callback=None):
         """
-        Creates an instance of class Position using start and end positions.
+        Initialize itself.
 
         Args:
-            line (int): line in which the token is.
-            start (int): position of the first character of the token.
-            end (int): position after the last character of the token.
+            callback (callable): see attribute callback.
         """
-        self.line = line
-        self.start = start
-        self.end = end
-        
-    @classmethod
-    def from_token(cls, line, token):
+        self.callback = callback
+        self.files = self.bytes = self.lines = self.tokens = 0
+        self.elapsed = 0.0
+        self.scan_time = self.tokenize_time = 0.0
+        self.accumulate_time = self.write_time = 0.0
+        self.flushes = []
+
+    def _rate(self, value):
+        return value / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_sec(self):
+        return self._rate(self.bytes)
+
+    @property
+    def lines_per_sec(self):
+        return self._rate(self.lines)
+
+    @property
+    def tokens_per_sec(self):
+        return self._rate(self.tokens)
+
+    def add_file(self, metadata, seconds):
         """
-        Allows to create an instance of class Position using a token.
+        Counts an indexed file.
 
         Args:
-            token (Token): token to get the position of.
-            line (int): line in which the token is.
+            metadata (dict): metadata of the file returned by scan_file.
+            seconds (float): time of scan_file.
         """
-        return cls(line, token.pos, token.pos + len(token.s))
-    
-    def __eq__(self, obj):
+        self.files += 1
+        self.bytes += metadata["size"]
+        self.lines += metadata["lines"]
+        self.scan_time += seconds
+
+    def add_flush(self, terms, positions, seconds):
         """
-        Checks if two instances of class Position are equal.
-        Two instances of class Positon are equal if their start and end
-        attributes are equal.
+        Records a write of postings into the database.
 
         Args:
-            obj (Position): instance to compare the given token to.
-        """
-        return (self.line == obj.line and
-                self.start == obj.start and
-                self.end == obj.end)
-
-    def __lt__(self, obj):
-        less = False
-        if self.line < obj.line:
-            less = True
-        if self.line == obj.line:
-            if self.start < obj.start:
-                less = True
-        return less
-
-    def __repr__(self):
-        return '(' + str(self.line) + ',' + str(self.start) + ',' + \
-                str(self.end) + ")" 
-        
-    
+            terms (int): number of distinct terms written.
+            positions (int): number of positions written.
+            seconds (float): time of the write.
+        """
+        self.flushes.append({"terms": terms, "positions": positions,
+                             "seconds": seconds})
+        self.write_time += seconds
+        self.notify("flush")
+
+    def update(self, other):
+        """
+        Adds counters and phase times of another instance, e.g. collected by
+        a worker of index_many. Its elapsed time and flushes are ignored.
+        """
+        for name in ("files", "bytes", "lines", "tokens", "scan_time",
+                     "tokenize_time", "accumulate_time", "write_time"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def notify(self, event):
+        """
+        Calls the callback, if any, with an event.
+        """
+        if self.callback is not None:
+            self.callback(event, self)
+
+    def as_dict(self):
+        """
+        Returns the metrics as a dictionary of numbers, e.g. to send them to
+        monitoring.
+        """
+        return {"files": self.files, "bytes": self.bytes,
+                "lines": self.lines, "tokens": self.tokens,
+                "elapsed": self.elapsed,
+                "bytes_per_sec": self.bytes_per_sec,
+                "lines_per_sec": self.lines_per_sec,
+                "tokens_per_sec": self.tokens_per_sec,
+                "scan_time": self.scan_time,
+                "tokenize_time": self.tokenize_time,
+                "accumulate_time": self.accumulate_time,
+                "write_time": self.write_time,
+                "flushes": [dict(flush) for flush in self.flushes]}
+
+
+def _batches(tokens, stats):
+    """
+    Generator.
+    Takes tokens by lists of STATS_BATCH, the time spent by the tokenizer is
+    added to stats.tokenize_time.
+
+    Yields:
+        Non-empty lists of tokens.
+    """
+    clock = time.perf_counter
+    while True:
+        start = clock()
+        batch = list(islice(tokens, STATS_BATCH))
+        stats.tokenize_time += clock() - start
+        if not batch:
+            return
+        stats.tokens += len(batch)
+        yield batch
+
+
+def scan_file(path):
+    """
+    Reads a file once and returns its metadata stored in the document table
+    and the byte offsets of its lines.
+
+    The metadata are the fingerprint of the file (size, mtime and SHA-1 of
+    the content) and the number of lines the way the tokenizer numbers them:
+    lines are divided by line feeds, carriage returns and their pairs
+    (universal newlines), an empty file has no lines.
+
+    Args:
+        path (str): path to the file.
+
+    Returns:
+        Tuple (dictionary with keys size, mtime, sha1 and lines,
+        array.array of byte offsets of the starts of the lines).
+    """
+    stat = os.stat(path)
+    sha1 = hashlib.sha1()
+    # starts of lines, the last one may be the end of the file
+    offsets = array('q', [0])
+    position = 0
+    last = b""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha1.update(block)
+            i = 0
+            if last == b"\r" and block[:1] == b"\n":
+                # "\r\n" divided by the blocks
+                offsets[-1] += 1
+                i = 1
+            for match in _NEWLINE.finditer(block, i):
+                offsets.append(position + match.end())
+            position += len(block)
+            last = block[-1:]
+    if offsets[-1] == position:
+        offsets.pop()
+    return ({"size": stat.st_size, "mtime": stat.st_mtime,
+             "sha1": sha1.hexdigest(), "lines": len(offsets)}, offsets)
+
+
+def file_metadata(path):
+    """
+    Returns metadata of a file stored in the document table, see scan_file.
+    """
+    return scan_file(path)[0]
+
+
+def _tokens(tokenizer, use_mmap, path, file):
+    """
+    Returns alphabetic and digit tokens of an opened file, see Indexer.
+    """
+    if use_mmap:
+        return tokenizer.generate_mmap(path, CHUNK_SIZE, "ad")
+    return tokenizer.generate_stream(file, CHUNK_SIZE, "ad")
+
+
+def _write_run(path, postings):
+    """
+    Writes postings into a run file sorted by term.
+
+    Args:
+        path (str): path to the run file.
+        postings (dict): dictionary {term: {docID: [positions]}}.
+    """
+    with open(path, "wb") as f:
+        for term in sorted(postings):
+            pickle.dump((term, [(doc_id, len(positions),
+                                 encode_positions(positions),
+                                 positions[-1].line, positions[-1].start)
+                                for doc_id, positions
+                                in postings[term].items()]),
+                        f, pickle.HIGHEST_PROTOCOL)
+
+
+def _next_check(positions, terms, budget):
+    """
+    Returns the number of buffered positions at which a buffer holding
+    the given numbers of positions and terms may exceed a memory budget
+    first, every new position is assumed to add a new term.
+    """
+    room = budget - positions * POSITION_SIZE - terms * TERM_SIZE
+    return positions + max(1, room // (POSITION_SIZE + TERM_SIZE))
+
+
+def _read_run(path):
+    """
+    Generator.
+    Reads a run file written by _write_run.
+
+    Yields:
+        Tuples (term, [(docID, number of positions, encoded positions,
+        line and start of the last position)]) in the order of terms.
+    """
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _index_files(backend, use_mmap, config, files, run_path, timed=False,
+                 budget=None):
+    """
+    Indexes files into run files. Runs in a worker process of
+    Indexer.index_many.
+
+    Args:
+        backend (str): backend of the tokenizer.
+        use_mmap (bool): whether files are read through a memory map.
+        config (dict): settings of the normalizer or None.
+        files (list): tuples (docID, path) of the files to index.
+        run_path (str): path to the run files to write, a number is appended
+            to it.
+        timed (bool): whether to collect IndexStats.
+        budget (int): memory budget of the postings in bytes. Postings are
+            written into a run file whenever they exceed it, by default they
+            are written once, when all files are indexed.
+
+    Returns:
+        Tuple ([paths of the run files],
+        [(path, metadata of the file, line offsets)], IndexStats or None).
+    """
+    tokenizer = Tokenizer(backend=backend)
+    normalize = None if config is None else Normalizer.from_config(config)
+    stats = IndexStats() if timed else None
+    clock = time.perf_counter
+    postings = {}
+    buffered = 0
+    limit = float("inf") if budget is None else _next_check(0, 0, budget)
+    run_paths = []
+    documents = []
+
+    def spill():
+        start = clock()
+        run_paths.append(run_path + "." + str(len(run_paths)))
+        _write_run(run_paths[-1], postings)
+        postings.clear()
+        if stats is not None:
+            stats.write_time += clock() - start
+
+    for doc_id, path in files:
+        with open(path) as file:
+            tokens = _tokens(tokenizer, use_mmap, path, file)
+            batches = (tokens,) if stats is None else _batches(tokens, stats)
+            for batch in batches:
+                if stats is not None:
+                    start, written = clock(), stats.write_time
+                for token in batch:
+                    term = token.s if normalize is None else normalize(token.s)
+                    entry = postings.setdefault(term, {})
+                    entry.setdefault(doc_id, []).append(
+                        Position(token.line, token.col,
+                                 token.col + len(token.s)))
+                    buffered += 1
+                    if buffered >= limit:
+                        if (buffered * POSITION_SIZE +
+                                len(postings) * TERM_SIZE >= budget):
+                            spill()
+                            buffered = 0
+                        limit = _next_check(buffered, len(postings), budget)
+                if stats is not None:
+                    stats.accumulate_time += (clock() - start -
+                                              (stats.write_time - written))
+        start = clock()
+        documents.append((path,) + scan_file(path))
+        if stats is not None:
+            stats.add_file(documents[-1][1], clock() - start)
+    if postings or not run_paths:
+        spill()
+    return run_paths, documents, stats
+
+
+def _balance(files, groups):
+    """
+    Divides files into groups of about the same total size, the largest
+    files are placed first.
+
+    Args:
+        files (list): tuples (docID, path).
+        groups (int): number of groups.
+
+    Returns:
+        List of non-empty lists of tuples (docID, path).
+    """
+    heap = [(0, i, []) for i in range(groups)]
+    for doc_id, path in sorted(files, key=lambda f: -os.path.getsize(f[1])):
+        size, i, group = heapq.heappop(heap)
+        group.append((doc_id, path))
+        heapq.heappush(heap, (size + os.path.getsize(path), i, group))
+    return [group for _, _, group in sorted(heap, key=itemgetter(1)) if group]
+
+
+def _patterns(patterns):
+    """
+    Returns a tuple of glob patterns given as a str, an iterable or None.
+    """
+    if patterns is None:
+        return ()
+    if isinstance(patterns, str):
+        return (patterns,)
+    return tuple(patterns)
+
+
+def _matches(name, relative, patterns):
+    """
+    Checks if a file name or its path relative to the root of a walk
+    matches any of glob patterns.
+    """
+    return any(fnmatch.fnmatch(name, pattern) or
+               fnmatch.fnmatch(relative, pattern) for pattern in patterns)
+
+
+def walk_files(root, include=None, exclude=None):
+    """
+    Generator.
+    Walks a directory lazily in sorted order, subdirectories are entered
+    when they are reached. Symbolic links to directories are not followed.
+
+    Patterns are matched by fnmatch against the name of a file and against
+    its path relative to root with "/" as the separator, e.g. "*.txt" or
+    "books/*.txt" ("*" matches "/" too). Directories that match exclude are
+    not entered.
+
+    Args:
+        root (str): path to the directory.
+        include (str or iterable): glob patterns of the files to yield, all
+            files by default.
+        exclude (str or iterable): glob patterns of the files and
+            directories to skip.
+
+    Yields:
+        Tuples (path, size in bytes).
+    """
+    include = _patterns(include)
+    exclude = _patterns(exclude)
+    stack = [(root, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        subdirectories = []
+        for entry in entries:
+            relative = prefix + entry.name
+            if _matches(entry.name, relative, exclude):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append((entry.path, relative + "/"))
+            elif entry.is_file() and (not include or
+                                      _matches(entry.name, relative, include)):
+                yield entry.path, entry.stat().st_size
+        stack.extend(reversed(subdirectories))
+
+
 class Indexer(object):
     """
     Class Indexer allows to index files and write the indexes of tokens into a
     database. Every instance of class Indexer works with its own database.
 
+    Positions of tokens are collected in a buffer in memory and written into
+    the database in batches sorted by term, when the buffer holds
+    flush_threshold positions and at the end of every call of index. Call
+    close (or use the indexer as a context manager) when indexing is done.
+
+    With a memory budget the buffer is instead written into sorted run files
+    whenever its estimated size exceeds the budget, and the runs are merged
+    into the database by a streaming k-way merge at the end of every call of
+    index or index_many, so every term is written once and memory does not
+    grow with the size of the corpus.
+
+    The fingerprint of every indexed file is stored in the document table,
+    files that have not changed since they were indexed are skipped and
+    postings of changed files are replaced. Postings pickled by older
+    versions are encoded when the database is opened, see
+    PostingsDB.upgrade.
+
     Attributes:
-        db (shelf): database this instance of class Indexer works with.
+        db (PostingsDB or SegmentedIndex): database this instance of class
+            Indexer works with.
+        tokenizer (Tokenizer): tokenizer used to divide files into tokens.
+        use_mmap (bool): whether files are read through a memory map.
+        normalizer (Normalizer): normalizer of terms or None.
+        flush_threshold (int): number of buffered positions that makes the
+            indexer write the buffer into the database.
+        memory_budget (int): memory budget of the buffer in bytes or None.
+        stats (IndexStats): metrics of indexing or None.
     """
-    def __init__(self, path):
+    def __init__(self, path, backend="regex", use_mmap=False,
+                 normalizer=None, flush_threshold=FLUSH_THRESHOLD,
+                 segmented=None, storage=None, stats=None,
+                 memory_budget=None, codec=None):
         """
         Initialize itself.
 
         Args:
             path (str): path to database.
+            backend (str): backend of the tokenizer, see Tokenizer.
+            use_mmap (bool): if True, files are expected to be in UTF-8 and
+                are tokenized through a memory map (Tokenizer.generate_mmap)
+                instead of being read as text.
+            normalizer (Normalizer): normalizer applied to tokens before they
+                are written into the database. It is stored in the database,
+                so a database built with a normalizer keeps using it.
+            flush_threshold (int): number of buffered positions that makes
+                the indexer write the buffer into the database.
+            segmented (bool): if True, the database is a directory of
+                immutable segments (SegmentedIndex), every flush writes a new
+                segment. By default an existing segmented index is detected.
+            storage (str): storage backend of the database, see
+                open_storage. By default the backend of an existing database
+                is detected.
+            stats (IndexStats): collects throughput and the time of every
+                phase of indexing if given. Time is measured per batch of
+                tokens, so the metrics cost little.
+            memory_budget (int): if given, the buffer is spilled into sorted
+                run files in a temporary directory whenever its estimated
+                size exceeds memory_budget bytes, flush_threshold is not
+                used then. index_many divides the budget between its
+                workers.
+            codec (str): codec of the blocks of positions, one of CODECS of
+                lenin_postings: "varint" (the default) decodes fastest,
+                "zlib" and "lzma" make the database smaller. It is stored in
+                the database, so a database built with a codec keeps using
+                it.
+
+        Raises:
+            ValueError: in case the database was built with another
+                normalizer, flush_threshold or memory_budget is not positive
+                or the codec is unknown.
         """
-        self.db = shelve.open(path, writeback=True)
+        if not (isinstance(flush_threshold, int) and flush_threshold > 0):
+            raise ValueError(flush_threshold)
+        if not (memory_budget is None or
+                isinstance(memory_budget, int) and memory_budget > 0):
+            raise ValueError(memory_budget)
+        if not (codec is None or codec in CODECS):
+            raise ValueError(codec)
+        self.db = open_index(path, segmented, storage)
+        if codec is not None:
+            self.db.set_codec(codec)
+        self.db.upgrade()
+        self.tokenizer = Tokenizer(backend=backend)
+        self.use_mmap = use_mmap
+        self.flush_threshold = flush_threshold
+        self.memory_budget = memory_budget
+        self.stats = stats
+        # {term: {docID: [positions]}} not yet written into the database
+        self._buffer = {}
+        self._buffered = 0
+        # number of buffered positions at which the buffer is checked
+        self._limit = (flush_threshold if memory_budget is None
+                       else _next_check(0, 0, memory_budget))
+        # temporary directory and paths of the run files spilled from the
+        # buffer with a memory budget
+        self._spill_dir = None
+        self._runs = []
+        # {docID: terms} of the files being indexed
+        self._doc_terms = {}
+        # {docID: (path, metadata, line offsets)} of the files indexed by
+        # index whose postings are not flushed yet
+        self._documents = {}
+        self.normalizer = stored_normalizer(self.db, normalizer)
+        if self.normalizer is not None:
+            self.db[NORMALIZER_KEY] = self.normalizer.config()
         
     def index(self, path):
         """
-        Method index indexes a file by line and writes indexes into database
-        self.db.
+        Method index indexes a file by line and adds its positions to the
+        buffer, which is written into database self.db when it reaches the
+        flush threshold (see flush). The file is in the database after the
+        next flush. If the file was indexed before, it is skipped when it is
+        unchanged and its old postings are replaced otherwise.
 
         Args:
             path (str): path to the file to be indexed.
+
+        Returns:
+            True if the file was indexed, False if it is unchanged.
         """
-        tokenizer = Tokenizer()
-        
         if not isinstance(path, str):
             raise ValueError
         
@@ -104,16 +600,363 @@ class Indexer(object):
         except IOError:
             raise FileNotFoundError("File not found or path is incorrect")
 
-        # tokenize text, add tokens to database
-        for i, line in enumerate(file):
-            for token in tokenizer.generate_AD(line):
-                self.db.setdefault(token.s, {}).setdefault(path, []).append(
-                    Position.from_token(i, token)
-                )
-        file.close()
+        stats = self.stats
+        clock = time.perf_counter
+        started = clock()
+        # tokenize text by chunks, add tokens to database
+        with file:
+            doc_id = self._prepare(path)
+            if doc_id is None:
+                return False
+            tokens = _tokens(self.tokenizer, self.use_mmap, path, file)
+            batches = (tokens,) if stats is None else _batches(tokens, stats)
+            normalize = self.normalizer
+            buffer = self._buffer
+            for batch in batches:
+                if stats is not None:
+                    start, written = clock(), stats.write_time
+                for token in batch:
+                    term = token.s if normalize is None else normalize(token.s)
+                    buffer.setdefault(term, {}).setdefault(doc_id, []).append(
+                        Position(token.line, token.col,
+                                 token.col + len(token.s))
+                    )
+                    self._buffered += 1
+                    if self._buffered >= self._limit:
+                        self._buffer_full()
+                if stats is not None:
+                    # flushes and spills are measured as writes
+                    stats.accumulate_time += (clock() - start -
+                                              (stats.write_time - written))
+        start = clock()
+        metadata, offsets = scan_file(path)
+        if stats is not None:
+            stats.add_file(metadata, clock() - start)
+        # the file is marked as indexed once its postings are written
+        self._documents[doc_id] = (path, metadata, offsets)
+        if stats is not None:
+            stats.elapsed += clock() - started
+            stats.notify("index")
+        return True
+
+    def _buffer_full(self):
+        """
+        Writes the buffer into the database or, with a memory budget, into
+        a run file if it exceeds the budget.
+        """
+        budget = self.memory_budget
+        if budget is None:
+            self._flush()
+            return
+        terms = len(self._buffer)
+        if self._buffered * POSITION_SIZE + terms * TERM_SIZE >= budget:
+            self._spill()
+            terms = 0
+        self._limit = _next_check(self._buffered, terms, budget)
+
+    def _spill(self):
+        """
+        Writes the buffer into a new run file.
+        """
+        start = time.perf_counter()
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(self._spill_dir.name, "run" + str(len(self._runs)))
+        _write_run(path, self._buffer)
+        self._runs.append(path)
+        self._buffer.clear()
+        self._buffered = 0
+        if self.stats is not None:
+            self.stats.write_time += time.perf_counter() - start
+
+    def _prepare(self, path):
+        """
+        Compares the fingerprint of a file with the one stored when it was
+        indexed. Removes the postings of the file if it has changed.
+
+        Returns:
+            DocID of the file or None if the file is unchanged.
+        """
+        docs = self.db.docs
+        doc_id = docs.get_id(path)
+        if doc_id in self._documents:
+            # the file was indexed since the last flush
+            self._flush()
+        if doc_id is None:
+            return docs.add(path)
+        if not docs.is_indexed(doc_id):
+            if docs.terms(doc_id):
+                # postings encoded from an older database, see upgrade
+                self.db.remove_document(doc_id)
+            return doc_id
+        stored = docs.metadata(doc_id)
+        stat = os.stat(path)
+        if stat.st_size == stored["size"]:
+            if stat.st_mtime == stored["mtime"]:
+                return None
+            # the content may be the same, e.g. if the file was touched
+            metadata = file_metadata(path)
+            if metadata["sha1"] == stored.get("sha1"):
+                docs.add(path, **metadata)
+                return None
+        self.db.remove_document(doc_id)
+        return doc_id
+
+    def index_many(self, paths, workers=None):
+        """
+        Indexes many files on a pool of processes. The files are divided
+        between the workers by size, every worker builds a partial index of
+        its files and writes it into a run file sorted by term, then the runs
+        are merged into the database writing every term once.
+
+        Args:
+            paths (iterable): paths to the files to be indexed.
+            workers (int): number of processes, os.cpu_count() if None. With
+                one worker the files are indexed in this process.
+
+        Returns:
+            List of the indexed paths, unchanged files are skipped as by
+            index.
+
+        Raises:
+            ValueError: in case a path is not str.
+            FileNotFoundError: in case a file does not exist.
+        """
+        paths = list(dict.fromkeys(paths))
+        for path in paths:
+            if not isinstance(path, str):
+                raise ValueError(path)
+            if not os.path.isfile(path):
+                raise FileNotFoundError("File not found or path is incorrect: "
+                                        + path)
+        self.flush()
+        stats = self.stats
+        clock = time.perf_counter
+        started = clock()
+        files = []
+        for path in paths:
+            doc_id = self._prepare(path)
+            if doc_id is not None:
+                files.append((doc_id, path))
+        if not files:
+            return []
+        workers = min(workers or os.cpu_count() or 1, len(files))
+        config = None if self.normalizer is None else self.normalizer.config()
+        with tempfile.TemporaryDirectory() as tmp:
+            budget = (None if self.memory_budget is None
+                      else max(1, self.memory_budget // workers))
+            args = [(self.tokenizer.backend, self.use_mmap, config, group,
+                     os.path.join(tmp, "run" + str(i)), stats is not None,
+                     budget)
+                    for i, group in enumerate(_balance(files, workers))]
+            if workers == 1:
+                results = [_index_files(*arg) for arg in args]
+            else:
+                with ProcessPoolExecutor(workers) as pool:
+                    results = list(pool.map(_index_files, *zip(*args)))
+            for _, documents, worker_stats in results:
+                for path, metadata, offsets in documents:
+                    self.db.docs.add(path, **metadata)
+                    self.db.docs.set_line_offsets(path, offsets)
+                if stats is not None:
+                    stats.update(worker_stats)
+            self._merge_runs([run_path for run_paths, _, _ in results
+                              for run_path in run_paths])
+        for doc_id, path in files:
+            self.db.docs.set_terms(doc_id, self._doc_terms.pop(doc_id, ()))
+        self.db.sync()
+        if stats is not None:
+            stats.elapsed += clock() - started
+            stats.notify("index")
+        return [path for _, path in files]
+
+    def index_tree(self, root, include=None, exclude=None, workers=None,
+                   progress=None, window=TREE_WINDOW):
+        """
+        Indexes the files of a directory tree. The tree is walked lazily
+        (see walk_files) and the files are indexed by index_many in windows
+        of up to window files, so indexing starts before the walk is over.
+        Within a window the largest files are scheduled first and the files
+        are divided between the workers by size, so no worker is left with
+        a large file at the end.
+
+        Args:
+            root (str): path to the directory.
+            include (str or iterable): glob patterns of the files to index,
+                all files by default.
+            exclude (str or iterable): glob patterns of the files and
+                directories to skip.
+            workers (int): number of processes, see index_many.
+            progress (callable): called as progress(done, size) after every
+                window with the number of files processed so far (indexed or
+                skipped as unchanged) and their total size in bytes.
+            window (int): number of files indexed at once.
+
+        Returns:
+            List of the indexed paths, unchanged files are skipped as by
+            index.
+
+        Raises:
+            ValueError: in case window is not positive.
+            FileNotFoundError: in case root does not exist.
+        """
+        if not (isinstance(window, int) and window > 0):
+            raise ValueError(window)
+        indexed = []
+        done = size = 0
+        files = walk_files(root, include, exclude)
+        while True:
+            batch = list(islice(files, window))
+            if not batch:
+                return indexed
+            batch.sort(key=itemgetter(1), reverse=True)
+            indexed.extend(self.index_many([path for path, _ in batch],
+                                           workers))
+            done += len(batch)
+            size += sum(file_size for _, file_size in batch)
+            if progress is not None:
+                progress(done, size)
+
+    def refresh(self, paths=(), workers=None):
+        """
+        Brings the database up to date: indexed files that were deleted are
+        removed from it, changed files are indexed again and new files given
+        in paths are indexed. Unchanged files are not read, unless their
+        mtime changed, so the work is proportional to the change.
+
+        Args:
+            paths (iterable): paths to files to add to the database besides
+                the files already indexed.
+            workers (int): number of processes, see index_many.
+
+        Returns:
+            Dictionary {"added": paths, "updated": paths, "removed": paths}.
+
+        Raises:
+            ValueError: in case a path is not str.
+            FileNotFoundError: in case a new file does not exist.
+        """
+        self.flush()
+        docs = self.db.docs
+        indexed = [path for path in docs if docs.is_indexed(path)]
+        removed = [path for path in indexed if not os.path.isfile(path)]
+        for path in removed:
+            self.db.remove_document(path)
+        self.db.sync()
+        kept = set(indexed).difference(removed)
+        updated = self.index_many(
+            [path for path in indexed if path in kept] + list(paths), workers)
+        return {"added": [path for path in updated if path not in kept],
+                "updated": [path for path in updated if path in kept],
+                "removed": removed}
+
+    def _merge_runs(self, run_paths):
+        """
+        Merges run files written by _write_run into the database, every term
+        is read and written once. Positions of a document found in several
+        runs are joined in the order of the runs.
+        """
+        start = time.perf_counter()
+        terms = positions = 0
+        runs = heapq.merge(*map(_read_run, run_paths), key=itemgetter(0))
+        for term, records in groupby(runs, key=itemgetter(0)):
+            # {docID: [encoded positions, count, line and start of the last
+            # position]}
+            joined = {}
+            for _, entries in records:
+                for doc_id, count, data, line, col in entries:
+                    entry = joined.get(doc_id)
+                    if entry is None:
+                        joined[doc_id] = [data, count, line, col]
+                        continue
+                    if not isinstance(entry[0], bytearray):
+                        entry[0] = bytearray(entry[0])
+                    append_positions(entry[0], entry[2:], data)
+                    entry[1] += count
+                    entry[2] = line
+                    entry[3] = col
+            postings = {doc_id: PostingList(bytes(data), count)
+                        for doc_id, (data, count, _, _) in joined.items()}
+            for doc_id, entry in postings.items():
+                self._doc_terms.setdefault(doc_id, set()).add(term)
+                positions += len(entry)
+            self.db.extend(term, postings)
+            terms += 1
+        if self.stats is not None:
+            self.stats.add_flush(terms, positions,
+                                 time.perf_counter() - start)
+
+    def flush(self):
+        """
+        Writes the buffered positions into the database. Terms are written in
+        sorted order, every term is read and written once per flush. Run
+        files spilled with a memory budget are merged into the database
+        together with the buffer. The files indexed since the last flush are
+        marked as indexed afterwards.
+        """
+        start = time.perf_counter()
+        self._flush()
+        if self.stats is not None:
+            self.stats.elapsed += time.perf_counter() - start
+
+    def _flush(self):
+        """
+        Does the work of flush, the time is counted as elapsed by the caller.
+        """
+        if self._runs:
+            if self._buffer:
+                self._spill()
+            runs, self._runs = self._runs, []
+            try:
+                self._merge_runs(runs)
+            finally:
+                self._spill_dir.cleanup()
+                self._spill_dir = None
+        start = time.perf_counter()
+        terms, positions = len(self._buffer), self._buffered
+        for term in sorted(self._buffer):
+            postings = self._buffer[term]
+            for doc_id in postings:
+                self._doc_terms.setdefault(doc_id, set()).add(term)
+            self.db.extend(term, postings)
+        self._buffer.clear()
+        self._buffered = 0
+        if self.memory_budget is not None:
+            self._limit = _next_check(0, 0, self.memory_budget)
+        docs = self.db.docs
+        for doc_id, (path, metadata, offsets) in self._documents.items():
+            docs.add(path, **metadata)
+            docs.set_line_offsets(doc_id, offsets)
+            docs.set_terms(doc_id, self._doc_terms.pop(doc_id, ()))
+        self._documents.clear()
+        self.db.sync()
+        if self.stats is not None and terms:
+            self.stats.add_flush(terms, positions,
+                                 time.perf_counter() - start)
+
+    def close(self):
+        """
+        Writes the buffered positions and closes the database. Does nothing
+        if the indexer is already closed.
+        """
+        if self.db is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def __del__(self):
-        self.db.close()
+        # the database may be not opened if __init__ failed
+        if getattr(self, "db", None) is not None:
+            self.close()
         
 
 def main():
@@ -121,9 +964,10 @@ def main():
     with open('test3.txt', 'tw') as f:
         f.write('''Я не люблю красные бобы, белые бобы и бобы вообще. Противные бобы. Дурацкие бобы.''')
     ind.index("test3.txt")
+    ind.flush()
     print(dict(ind.db))
     os.remove('test3.txt')
-    del ind
+    ind.close()
     for filename in os.listdir('.'):
         if filename.startswith("test_db."):
             os.remove(filename)
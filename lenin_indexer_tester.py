@@ -1,8 +1,27 @@
 import unittest
+import hashlib
 import os
+import shutil
 import shelve
-from collections import Generator
-from lenin_indexer import Indexer, Position
+from collections.abc import Generator
+import lenin_indexer
+from lenin_indexer import Indexer, IndexStats, Position
+from lenin_postings import PostingsDB, encode_postings
+from lenin_storage import SqliteBackend
+from lenin_normalizer import Normalizer
+from lenin_tokenizer import numpy
+
+
+def remove_databases():
+    """
+    Removes databases created by the tests.
+    """
+    for filename in os.listdir('.'):
+        if filename.startswith("test_db"):
+            if os.path.isdir(filename):
+                shutil.rmtree(filename)
+            else:
+                os.remove(filename)
 
 
 class IndexerTest(unittest.TestCase):
@@ -34,6 +53,7 @@ class IndexerTest(unittest.TestCase):
         with open("test.txt", 'tw') as f:
             f.write("test")
         self.indexer.index("test.txt")
+        self.indexer.flush()
         self.assertEqual(dict(self.indexer.db),
                          {'test': {'test.txt': [Position(0, 0, 4)]}})
         
@@ -41,6 +61,7 @@ class IndexerTest(unittest.TestCase):
         with open("test.txt", 'tw') as f:
             f.write("test test")
         self.indexer.index("test.txt")
+        self.indexer.flush()
         self.assertEqual(dict(self.indexer.db),
                          {'test': {'test.txt': [Position(0, 0, 4),
                                                 Position(0, 5, 9)]}})
@@ -49,6 +70,7 @@ class IndexerTest(unittest.TestCase):
         with open("test.txt", 'tw') as f:
             f.write("test case")
         self.indexer.index("test.txt")
+        self.indexer.flush()
         self.assertEqual(dict(self.indexer.db),
                          {'test': {'test.txt': [Position(0, 0, 4)]},
                           'case': {'test.txt': [Position(0, 5, 9)]}})
@@ -60,6 +82,7 @@ class IndexerTest(unittest.TestCase):
             f.write("file two")
         self.indexer.index("test.txt")
         self.indexer.index("test1.txt")
+        self.indexer.flush()
         self.assertEqual(dict(self.indexer.db),
                          {'file': {'test.txt': [Position(0, 0, 4)],
                                   'test1.txt': [Position(0, 0, 4)]},
@@ -70,10 +93,45 @@ class IndexerTest(unittest.TestCase):
         with open("test.txt", 'tw') as f:
             f.write("""test\nme\nplease""")
         self.indexer.index("test.txt")
+        self.indexer.flush()
         self.assertEqual(dict(self.indexer.db),
                          {'test': {'test.txt': [Position(0, 0, 4)]},
                           'me': {'test.txt': [Position(1, 0, 2)]},
                           'please': {'test.txt': [Position(2, 0, 6)]}})
+
+    def test_long_file(self):
+        with open("test.txt", 'tw') as f:
+            for i in range(20000):
+                f.write("строка " + str(i) + "\n")
+        chunk_size = lenin_indexer.CHUNK_SIZE
+        lenin_indexer.CHUNK_SIZE = 1000
+        try:
+            self.indexer.index("test.txt")
+            self.indexer.flush()
+        finally:
+            lenin_indexer.CHUNK_SIZE = chunk_size
+        self.assertEqual(self.indexer.db['строка']['test.txt'][19999],
+                         Position(19999, 0, 6))
+        self.assertEqual(self.indexer.db['19999'],
+                         {'test.txt': [Position(19999, 7, 12)]})
+
+    def test_long_line(self):
+        with open("test.txt", 'tw') as f:
+            f.write("first line\n")
+            for i in range(3000):
+                f.write("слово" + str(i) + " ")
+        chunk_size = lenin_indexer.CHUNK_SIZE
+        lenin_indexer.CHUNK_SIZE = 1000
+        try:
+            self.indexer.index("test.txt")
+            self.indexer.flush()
+        finally:
+            lenin_indexer.CHUNK_SIZE = chunk_size
+        self.assertEqual(len(self.indexer.db['слово']['test.txt']), 3000)
+        self.assertEqual(self.indexer.db['слово']['test.txt'][2999],
+                         Position(1, 28880, 28885))
+        self.assertEqual(self.indexer.db['2999'],
+                         {'test.txt': [Position(1, 28885, 28889)]})
         
     def tearDown(self):
         del self.indexer
@@ -84,6 +142,793 @@ class IndexerTest(unittest.TestCase):
             os.remove('test1.txt')
         if 'test.txt' in os.listdir('.'):
             os.remove('test.txt')
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class NumpyIndexerTest(IndexerTest):
+    """
+    Tests method index of class Indexer with the numpy backend of the
+    tokenizer.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db", backend="numpy")
+
+
+
+class NormalizerIndexerTest(unittest.TestCase):
+    """
+    Tests method index of class Indexer with a normalizer.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db", normalizer=Normalizer())
+        with open("test.txt", 'tw') as f:
+            f.write("Война и мир. ВОЙНА, Ёж")
+
+    def test_normalized_terms(self):
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.assertEqual(self.indexer.db['война'],
+                         {'test.txt': [Position(0, 0, 5),
+                                       Position(0, 13, 18)]})
+        self.assertEqual(self.indexer.db['еж'],
+                         {'test.txt': [Position(0, 20, 22)]})
+        self.assertNotIn('Война', self.indexer.db)
+
+    def test_stored_normalizer(self):
+        del self.indexer
+        self.indexer = Indexer("test_db")
+        self.assertEqual(self.indexer.normalizer, Normalizer())
+
+    def test_other_normalizer(self):
+        del self.indexer
+        with self.assertRaises(ValueError):
+            self.indexer = Indexer("test_db", normalizer=Normalizer(stem=True))
+
+    def tearDown(self):
+        if hasattr(self, 'indexer'):
+            del self.indexer
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+        os.remove('test.txt')
+
+
+class DocumentIndexerTest(unittest.TestCase):
+    """
+    Tests the document table written by class Indexer.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db")
+
+    def test_metadata(self):
+        with open("test.txt", 'tw') as f:
+            f.write("one\ntwo\n\nthree")
+        with open("test1.txt", 'tw') as f:
+            f.write("one\n")
+        self.indexer.index("test.txt")
+        self.indexer.index("test1.txt")
+        self.indexer.flush()
+        docs = self.indexer.db.docs
+        self.assertEqual(docs.get_id("test.txt"), 0)
+        self.assertEqual(docs.get_id("test1.txt"), 1)
+        metadata = docs.metadata("test.txt")
+        self.assertEqual(metadata["size"], os.path.getsize("test.txt"))
+        self.assertEqual(metadata["mtime"], os.path.getmtime("test.txt"))
+        self.assertEqual(metadata["lines"], 4)
+        self.assertEqual(docs.metadata("test1.txt")["lines"], 1)
+        self.assertEqual(self.indexer.db.doc_postings("one"),
+                         {0: [Position(0, 0, 3)], 1: [Position(0, 0, 3)]})
+
+    def test_pickled_database(self):
+        self.indexer.close()
+        remove_databases()
+        with shelve.open("test_db") as shelf:
+            shelf["one"] = {"test.txt": [Position(0, 0, 3)],
+                            "test1.txt": [Position(1, 0, 3)]}
+            shelf["two"] = {"test.txt": [Position(1, 0, 3)]}
+        with open("test.txt", 'tw') as f:
+            f.write("two one")
+        self.indexer = Indexer("test_db")
+        docs = self.indexer.db.docs
+        self.assertEqual(docs.terms("test.txt"), ["one", "two"])
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.assertEqual(dict(self.indexer.db),
+                         {"one": {"test.txt": [Position(0, 4, 7)],
+                                  "test1.txt": [Position(1, 0, 3)]},
+                          "two": {"test.txt": [Position(0, 0, 3)]}})
+
+    def test_lines(self):
+        for text, lines in (("", 0), ("a", 1), ("a\n", 1), ("\n\n", 2),
+                            ("a\nb", 2)):
+            with open("test.txt", 'tw') as f:
+                f.write(text)
+            self.assertEqual(
+                lenin_indexer.file_metadata("test.txt")["lines"], lines)
+
+    def test_line_offsets(self):
+        with open("test.txt", 'w', encoding='utf-8') as f:
+            f.write("один\ntwo\n\nтри")
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.assertEqual(list(self.indexer.db.docs.line_offsets("test.txt")),
+                         [0, 9, 13, 14])
+
+    def test_line_offsets_across_chunks(self):
+        chunk_size = lenin_indexer.CHUNK_SIZE
+        lenin_indexer.CHUNK_SIZE = 3
+        try:
+            for text in ("", "a", "ab\n", "ab\ncd\n\nef", "\n\n\n", "a\r",
+                         "ab\r\ncd\re\n\r", "a\r\r\n\n\rb", "ab\r\ncd"):
+                with open("test.txt", 'w', newline='') as f:
+                    f.write(text)
+                metadata, offsets = lenin_indexer.scan_file("test.txt")
+                # lines are split as in text mode but keep their ends
+                with open("test.txt", newline='') as f:
+                    lines = f.readlines()
+                expected = [sum(map(len, lines[:i]))
+                            for i in range(len(lines))]
+                self.assertEqual(list(offsets), expected)
+                self.assertEqual(metadata["lines"], len(lines))
+        finally:
+            lenin_indexer.CHUNK_SIZE = chunk_size
+
+    def tearDown(self):
+        self.indexer.close()
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+        for filename in ('test.txt', 'test1.txt'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+class IndexManyTest(unittest.TestCase):
+    """
+    Tests method index_many of class Indexer.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db")
+        self.paths = []
+        for i in range(5):
+            path = "test" + str(i) + ".txt"
+            with open(path, 'tw') as f:
+                for j in range(i * 50 + 1):
+                    f.write("строка " + str(j % 7) + " file" + str(i) + "\n")
+            self.paths.append(path)
+
+    def expected(self):
+        sequential = Indexer("test_db_sequential")
+        for path in self.paths:
+            sequential.index(path)
+            sequential.flush()
+        result = dict(sequential.db)
+        sequential.close()
+        return result
+
+    def test_workers(self):
+        self.indexer.index_many(self.paths, workers=2)
+        self.assertEqual(dict(self.indexer.db), self.expected())
+        self.assertEqual(list(self.indexer.db.docs), self.paths)
+        self.assertEqual(self.indexer.db.docs.metadata("test4.txt")["lines"],
+                         201)
+        offsets = self.indexer.db.docs.line_offsets("test4.txt")
+        self.assertEqual(len(offsets), 201)
+        self.assertEqual(offsets[1], len("строка 0 file4\n".encode()))
+
+    def test_one_worker(self):
+        self.indexer.index_many(self.paths, workers=1)
+        self.assertEqual(dict(self.indexer.db), self.expected())
+
+    def test_normalizer(self):
+        self.indexer.close()
+        self.indexer = Indexer("test_db", normalizer=Normalizer())
+        with open(self.paths[0], 'tw') as f:
+            f.write("Война ВОЙНА")
+        self.indexer.index_many(self.paths[:2], workers=2)
+        self.assertEqual(self.indexer.db['война'],
+                         {'test0.txt': [Position(0, 0, 5),
+                                        Position(0, 6, 11)]})
+        self.assertNotIn('Война', self.indexer.db)
+
+    def test_after_index(self):
+        self.indexer.index(self.paths[0])
+        self.indexer.index_many(self.paths[1:], workers=2)
+        self.assertEqual(dict(self.indexer.db), self.expected())
+
+    def test_empty(self):
+        self.indexer.index_many([])
+        self.assertEqual(dict(self.indexer.db), {})
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            self.indexer.index_many([42])
+        with self.assertRaises(FileNotFoundError):
+            self.indexer.index_many(self.paths + ["file.txt"])
+        self.assertEqual(len(self.indexer.db.docs), 0)
+
+    def tearDown(self):
+        self.indexer.close()
+        remove_databases()
+        for path in self.paths:
+            os.remove(path)
+
+
+class RefreshIndexerTest(unittest.TestCase):
+    """
+    Tests re-indexing of changed files by class Indexer.
+    """
+    segmented = False
+    storage = None
+
+    def setUp(self):
+        self.indexer = Indexer("test_db", segmented=self.segmented,
+                               storage=self.storage)
+        self.paths = ["test0.txt", "test1.txt", "test2.txt"]
+        for i, path in enumerate(self.paths):
+            self.write(path, "file number " + str(i))
+
+    def write(self, path, text, mtime=None):
+        with open(path, 'tw') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def expected(self, paths):
+        fresh = Indexer("test_db_fresh")
+        for path in paths:
+            fresh.index(path)
+            fresh.flush()
+        result = dict(fresh.db)
+        fresh.close()
+        return result
+
+    def test_index_twice(self):
+        self.assertTrue(self.indexer.index("test0.txt"))
+        self.assertFalse(self.indexer.index("test0.txt"))
+        self.assertEqual(self.indexer.db['file'],
+                         {'test0.txt': [Position(0, 0, 4)]})
+
+    def test_changed_file(self):
+        self.indexer.index("test0.txt")
+        self.indexer.index("test1.txt")
+        self.write("test0.txt", "another file")
+        self.assertTrue(self.indexer.index("test0.txt"))
+        self.indexer.flush()
+        self.assertEqual(dict(self.indexer.db),
+                         self.expected(["test0.txt", "test1.txt"]))
+        self.assertNotIn('0', self.indexer.db)
+        self.assertEqual(self.indexer.db.docs.terms("test0.txt"),
+                         ['another', 'file'])
+
+    def test_same_size_new_mtime(self):
+        self.indexer.index("test0.txt")
+        self.write("test0.txt", "fila number 0", mtime=1)
+        self.assertTrue(self.indexer.index("test0.txt"))
+        self.indexer.flush()
+        self.assertEqual(self.indexer.db['fila'],
+                         {'test0.txt': [Position(0, 0, 4)]})
+        self.assertNotIn('file', self.indexer.db)
+
+    def test_touched_file(self):
+        self.indexer.index("test0.txt")
+        os.utime("test0.txt", (1, 1))
+        self.assertFalse(self.indexer.index("test0.txt"))
+        self.assertEqual(self.indexer.db.docs.metadata("test0.txt")["mtime"],
+                         1)
+
+    def test_fingerprint(self):
+        self.indexer.index("test0.txt")
+        self.indexer.flush()
+        metadata = self.indexer.db.docs.metadata("test0.txt")
+        self.assertEqual(metadata["sha1"],
+                         hashlib.sha1(b"file number 0").hexdigest())
+
+    def test_index_many_skips_unchanged(self):
+        self.assertEqual(self.indexer.index_many(self.paths, workers=1),
+                         self.paths)
+        self.write("test1.txt", "new text")
+        self.assertEqual(self.indexer.index_many(self.paths, workers=2),
+                         ["test1.txt"])
+        self.assertEqual(dict(self.indexer.db), self.expected(self.paths))
+
+    def test_refresh(self):
+        self.indexer.index_many(self.paths, workers=1)
+        self.write("test1.txt", "changed text")
+        os.remove("test2.txt")
+        self.write("test3.txt", "new file")
+        result = self.indexer.refresh(["test3.txt"], workers=1)
+        self.assertEqual(result, {"added": ["test3.txt"],
+                                  "updated": ["test1.txt"],
+                                  "removed": ["test2.txt"]})
+        self.assertEqual(dict(self.indexer.db),
+                         self.expected(["test0.txt", "test1.txt",
+                                        "test3.txt"]))
+        self.assertFalse(self.indexer.db.docs.is_indexed("test2.txt"))
+        self.assertEqual(self.indexer.refresh(workers=1),
+                         {"added": [], "updated": [], "removed": []})
+
+    def tearDown(self):
+        self.indexer.close()
+        remove_databases()
+        for path in self.paths + ["test3.txt"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class SegmentedIndexerTest(IndexerTest):
+    """
+    Tests method index of class Indexer writing into a segmented index.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db", segmented=True)
+
+    def test_segment_per_flush(self):
+        self.indexer.close()
+        self.indexer = Indexer("test_db", flush_threshold=2)
+        self.assertTrue(os.path.isdir("test_db"))
+        with open("test.txt", 'tw') as f:
+            f.write("one two three four five")
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.assertEqual(self.indexer.db['five'],
+                         {'test.txt': [Position(0, 19, 23)]})
+        self.assertGreater(len(self.indexer.db.segments()), 1)
+
+    def tearDown(self):
+        del self.indexer
+        remove_databases()
+        for filename in ('test.txt', 'test1.txt'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+class SegmentedRefreshIndexerTest(RefreshIndexerTest):
+    """
+    Tests re-indexing of changed files into a segmented index.
+    """
+    segmented = True
+
+
+class SqliteIndexerTest(IndexerTest):
+    """
+    Tests method index of class Indexer writing into a SQLite database.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db", storage="sqlite")
+
+    def test_storage_is_detected(self):
+        with open("test.txt", 'tw') as f:
+            f.write("мир")
+        self.indexer.index("test.txt")
+        self.indexer.close()
+        self.indexer = Indexer("test_db")
+        self.assertIsInstance(self.indexer.db.store, SqliteBackend)
+        self.assertFalse(self.indexer.index("test.txt"))
+        self.assertEqual(self.indexer.db['мир'],
+                         {'test.txt': [Position(0, 0, 3)]})
+
+    def tearDown(self):
+        del self.indexer
+        remove_databases()
+        for filename in ('test.txt', 'test1.txt'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+class CodecIndexerTest(IndexerTest):
+    """
+    Tests method index of class Indexer writing compressed postings.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db", codec="zlib")
+
+    def test_long_file(self):
+        with open("test.txt", 'tw') as f:
+            f.write("мир и война\n" * 300)
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.assertEqual(self.indexer.db.encoded("мир")[:2], b"\x04\x01")
+        self.assertEqual(self.indexer.db["мир"],
+                         {'test.txt': [Position(line, 0, 3)
+                                       for line in range(300)]})
+
+    def test_codec_is_stored(self):
+        self.indexer.close()
+        self.indexer = Indexer("test_db")
+        self.assertEqual(self.indexer.db.codec, "zlib")
+        self.indexer.close()
+        self.indexer = Indexer("test_db", codec="varint")
+        self.assertEqual(self.indexer.db.codec, "varint")
+
+    def test_error_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            Indexer("test_db1", codec="zip")
+
+    def tearDown(self):
+        del self.indexer
+        remove_databases()
+        for filename in ('test.txt', 'test1.txt'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+class SqliteRefreshIndexerTest(RefreshIndexerTest):
+    """
+    Tests re-indexing of changed files in a SQLite database.
+    """
+    storage = "sqlite"
+
+
+class FlushIndexerTest(unittest.TestCase):
+    """
+    Tests buffering and flushing of class Indexer.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db", flush_threshold=3)
+        with open("test.txt", 'tw') as f:
+            f.write("раз два раз\nдва раз три")
+
+    def test_error_wrong_threshold(self):
+        with self.assertRaises(ValueError):
+            Indexer("test_db", flush_threshold=0)
+
+    def test_intermediate_flushes(self):
+        self.indexer.index("test.txt")
+        self.assertEqual(self.indexer._buffer, {})
+        self.assertEqual(dict(self.indexer.db),
+                         {'раз': {'test.txt': [Position(0, 0, 3),
+                                               Position(0, 8, 11),
+                                               Position(1, 4, 7)]},
+                          'два': {'test.txt': [Position(0, 4, 7),
+                                               Position(1, 0, 3)]},
+                          'три': {'test.txt': [Position(1, 8, 11)]}})
+
+    def test_flush_merges_files(self):
+        with open("test1.txt", 'tw') as f:
+            f.write("три")
+        self.indexer.index("test.txt")
+        self.indexer.index("test1.txt")
+        self.indexer.flush()
+        self.assertEqual(self.indexer.db['три'],
+                         {'test.txt': [Position(1, 8, 11)],
+                          'test1.txt': [Position(0, 0, 3)]})
+
+    def test_postings_are_stored_encoded(self):
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.assertEqual(self.indexer.db.store.get('три'),
+                         encode_postings({0: [Position(1, 8, 11)]}))
+
+    def test_close(self):
+        self.indexer.index("test.txt")
+        self.indexer.close()
+        self.indexer.close()
+        self.assertIsNone(self.indexer.db)
+        db = PostingsDB("test_db")
+        self.assertEqual(db['три'], {'test.txt': [Position(1, 8, 11)]})
+        db.close()
+
+    def test_context_manager(self):
+        self.indexer.close()
+        with Indexer("test_db") as indexer:
+            indexer.index("test.txt")
+        self.assertIsNone(indexer.db)
+        db = PostingsDB("test_db")
+        self.assertEqual(len(db['раз']['test.txt']), 3)
+        db.close()
+
+    def tearDown(self):
+        self.indexer.close()
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+        for filename in ('test.txt', 'test1.txt'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+class IndexTreeTest(unittest.TestCase):
+    """
+    Tests function walk_files and method index_tree of class Indexer.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db")
+        self.files = {"a.txt": "один", "b.md": "два два",
+                      "sub/c.txt": "три три три", "sub/skip/d.txt": "четыре",
+                      "sub/skip/e.md": "пять"}
+        for name, text in self.files.items():
+            path = os.path.join("test_tree", *name.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'tw') as f:
+                f.write(text)
+
+    def walk(self, include=None, exclude=None):
+        return [os.path.relpath(path, "test_tree").replace(os.sep, "/")
+                for path, _ in lenin_indexer.walk_files("test_tree", include,
+                                                        exclude)]
+
+    def test_walk(self):
+        self.assertIsInstance(lenin_indexer.walk_files("test_tree"), Generator)
+        self.assertEqual(self.walk(), ["a.txt", "b.md", "sub/c.txt",
+                                       "sub/skip/d.txt", "sub/skip/e.md"])
+        path, size = next(lenin_indexer.walk_files("test_tree", "b.md"))
+        self.assertEqual(size, os.path.getsize(path))
+
+    def test_walk_patterns(self):
+        self.assertEqual(self.walk(include="*.txt"),
+                         ["a.txt", "sub/c.txt", "sub/skip/d.txt"])
+        self.assertEqual(self.walk(include=["*.md", "a.*"]),
+                         ["a.txt", "b.md", "sub/skip/e.md"])
+        self.assertEqual(self.walk(exclude="skip"),
+                         ["a.txt", "b.md", "sub/c.txt"])
+        self.assertEqual(self.walk(include="*.txt", exclude="sub/c.*"),
+                         ["a.txt", "sub/skip/d.txt"])
+        # "*" matches "/" as well
+        self.assertEqual(self.walk(exclude="sub/*.txt"),
+                         ["a.txt", "b.md", "sub/skip/e.md"])
+
+    def test_index_tree(self):
+        result = self.indexer.index_tree("test_tree", include="*.txt",
+                                         exclude="skip")
+        self.assertEqual(sorted(result),
+                         [os.path.join("test_tree", "a.txt"),
+                          os.path.join("test_tree", "sub", "c.txt")])
+        self.assertEqual(self.indexer.db['три'],
+                         {os.path.join("test_tree", "sub", "c.txt"):
+                          [Position(0, 0, 3), Position(0, 4, 7),
+                           Position(0, 8, 11)]})
+        self.assertEqual(self.indexer.index_tree("test_tree", "*.txt",
+                                                 "skip"), [])
+
+    def test_workers(self):
+        result = self.indexer.index_tree("test_tree", workers=2)
+        self.assertEqual(len(result), 5)
+        self.assertEqual(len(self.indexer.db.docs), 5)
+
+    def test_largest_first_in_windows(self):
+        calls = []
+        index_many = self.indexer.index_many
+
+        def recording_index_many(paths, workers=None):
+            calls.append([os.path.basename(path) for path in paths])
+            return index_many(paths, workers)
+
+        self.indexer.index_many = recording_index_many
+        progress = []
+        self.indexer.index_tree("test_tree", window=3,
+                                progress=lambda *args: progress.append(args))
+        self.assertEqual(calls, [["c.txt", "b.md", "a.txt"],
+                                 ["d.txt", "e.md"]])
+        sizes = [os.path.getsize(path) for path, _
+                 in lenin_indexer.walk_files("test_tree")]
+        self.assertEqual(progress, [(3, sum(sizes[:3])), (5, sum(sizes))])
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            self.indexer.index_tree("test_tree", window=0)
+        with self.assertRaises(FileNotFoundError):
+            self.indexer.index_tree("absent_tree")
+
+    def tearDown(self):
+        self.indexer.close()
+        remove_databases()
+        shutil.rmtree("test_tree")
+
+
+class MemoryBudgetIndexerTest(IndexerTest):
+    """
+    Tests method index of class Indexer with a memory budget small enough
+    to spill the buffer into runs many times.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db", memory_budget=3000)
+
+    def test_spills(self):
+        with open("test.txt", 'tw') as f:
+            for i in range(300):
+                f.write("слово " + str(i % 13) + " конец\n")
+        sizes = []
+        spill = self.indexer._spill
+
+        def recording_spill():
+            sizes.append(self.indexer._buffered * lenin_indexer.POSITION_SIZE
+                         + len(self.indexer._buffer)
+                         * lenin_indexer.TERM_SIZE)
+            spill()
+
+        self.indexer._spill = recording_spill
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.assertGreater(len(sizes), 10)
+        self.assertLess(max(sizes), 3000 + lenin_indexer.POSITION_SIZE
+                        + lenin_indexer.TERM_SIZE)
+        self.assertEqual(self.indexer._runs, [])
+        self.assertIsNone(self.indexer._spill_dir)
+        expected = Indexer("test_db_plain")
+        expected.index("test.txt")
+        expected.flush()
+        self.assertEqual(dict(self.indexer.db), dict(expected.db))
+        self.assertEqual(self.indexer.db.docs.terms("test.txt"),
+                         expected.db.docs.terms("test.txt"))
+        expected.close()
+
+    def test_index_many(self):
+        paths = []
+        for i in range(3):
+            paths.append("test" + str(i) + ".txt")
+            with open(paths[-1], 'tw') as f:
+                for j in range(100 * (i + 1)):
+                    f.write("строка " + str(j % 7) + " file" + str(i) + "\n")
+        try:
+            indexer = Indexer("test_db_plain")
+            indexer.index_many(paths, workers=1)
+            expected = dict(indexer.db)
+            indexer.close()
+            for workers in (1, 2):
+                self.indexer.close()
+                remove_databases()
+                self.indexer = Indexer("test_db", memory_budget=3000)
+                self.indexer.index_many(paths, workers)
+                self.assertEqual(dict(self.indexer.db), expected)
+        finally:
+            for path in paths:
+                os.remove(path)
+
+    def test_one_merge_per_index(self):
+        with open("test.txt", 'tw') as f:
+            f.write("раз два три\n" * 200)
+        stats = IndexStats()
+        self.indexer.stats = stats
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.assertEqual(stats.flushes, [dict(stats.flushes[0], terms=3,
+                                              positions=600)])
+        self.assertLessEqual(0, stats.write_time)
+        self.assertLessEqual(stats.write_time, stats.elapsed)
+
+    def test_error_wrong_budget(self):
+        for budget in (0, -1, 1.5):
+            with self.assertRaises(ValueError):
+                Indexer("test_db1", memory_budget=budget)
+
+    def tearDown(self):
+        del self.indexer
+        remove_databases()
+        for filename in ('test.txt', 'test1.txt'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+class IndexStatsTest(unittest.TestCase):
+    """
+    Tests metrics collected by class Indexer into IndexStats.
+    """
+    def setUp(self):
+        self.events = []
+        self.stats = IndexStats(
+            lambda event, stats: self.events.append((event, stats.tokens)))
+        self.indexer = Indexer("test_db", flush_threshold=4, stats=self.stats)
+        with open("test.txt", 'tw') as f:
+            f.write("раз два раз\nдва раз три")
+        with open("test1.txt", 'tw') as f:
+            f.write("три\n")
+
+    def test_index(self):
+        self.indexer.index("test.txt")
+        self.indexer.index("test1.txt")
+        self.indexer.flush()
+        self.assertEqual(self.stats.files, 2)
+        self.assertEqual(self.stats.bytes, os.path.getsize("test.txt") +
+                         os.path.getsize("test1.txt"))
+        self.assertEqual(self.stats.lines, 3)
+        self.assertEqual(self.stats.tokens, 7)
+        self.assertEqual([(f["terms"], f["positions"])
+                          for f in self.stats.flushes],
+                         [(2, 4), (2, 3)])
+        self.assertEqual(self.events, [("flush", 6), ("index", 6),
+                                       ("index", 7), ("flush", 7)])
+
+    def test_one_flush_below_threshold(self):
+        self.indexer.flush_threshold = self.indexer._limit = 100
+        self.indexer.index("test.txt")
+        self.indexer.index("test1.txt")
+        self.assertEqual(self.stats.flushes, [])
+        self.assertFalse(self.indexer.db.docs.is_indexed("test.txt"))
+        self.indexer.close()
+        self.assertEqual([(f["terms"], f["positions"])
+                          for f in self.stats.flushes], [(3, 7)])
+        self.indexer = Indexer("test_db")
+        self.assertEqual(self.indexer.db['три'],
+                         {'test.txt': [Position(1, 8, 11)],
+                          'test1.txt': [Position(0, 0, 3)]})
+        self.assertEqual(self.indexer.db.docs.terms("test1.txt"), ['три'])
+
+    def test_times(self):
+        self.indexer.index("test.txt")
+        for name in ("elapsed", "scan_time", "tokenize_time",
+                     "accumulate_time", "write_time"):
+            self.assertGreater(getattr(self.stats, name), 0)
+        self.assertAlmostEqual(self.stats.write_time,
+                               sum(f["seconds"] for f in self.stats.flushes))
+        self.assertLessEqual(self.stats.scan_time + self.stats.tokenize_time
+                             + self.stats.accumulate_time
+                             + self.stats.write_time,
+                             self.stats.elapsed)
+        self.assertEqual(self.stats.tokens_per_sec,
+                         self.stats.tokens / self.stats.elapsed)
+
+    def test_unchanged_file(self):
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.events.clear()
+        self.indexer.index("test.txt")
+        self.assertEqual(self.stats.files, 1)
+        self.assertEqual(self.events, [])
+
+    def test_index_many(self):
+        for workers in (1, 2):
+            stats = IndexStats()
+            with Indexer("test_db" + str(workers), stats=stats) as indexer:
+                indexer.index_many(["test.txt", "test1.txt"], workers)
+            self.assertEqual(stats.files, 2)
+            self.assertEqual(stats.lines, 3)
+            self.assertEqual(stats.tokens, 7)
+            self.assertEqual([(f["terms"], f["positions"])
+                              for f in stats.flushes], [(3, 7)])
+            self.assertGreater(stats.tokenize_time, 0)
+            self.assertGreater(stats.elapsed, 0)
+            self.assertLessEqual(0, stats.write_time)
+            self.assertLessEqual(stats.write_time, stats.elapsed)
+
+    def test_as_dict(self):
+        self.indexer.index("test1.txt")
+        result = self.stats.as_dict()
+        self.assertEqual(result["tokens"], 1)
+        self.assertEqual(result["bytes_per_sec"], self.stats.bytes_per_sec)
+        self.assertEqual(result["flushes"], self.stats.flushes)
+        self.assertEqual(IndexStats().as_dict()["lines_per_sec"], 0.0)
+
+    def test_no_stats(self):
+        indexer = Indexer("test_db_plain")
+        indexer.index("test.txt")
+        self.assertIsNone(indexer.stats)
+        indexer.close()
+
+    def tearDown(self):
+        self.indexer.close()
+        remove_databases()
+        for filename in ('test.txt', 'test1.txt'):
+            os.remove(filename)
+
+
+class MmapIndexerTest(IndexerTest):
+    """
+    Tests method index of class Indexer reading files through a memory map.
+    """
+    def setUp(self):
+        self.indexer = Indexer("test_db", use_mmap=True)
+
+    def test_non_ascii(self):
+        with open("test.txt", 'w', encoding='utf-8') as f:
+            f.write("Ёлки 😀 палки\nёлки")
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.assertEqual(dict(self.indexer.db),
+                         {'Ёлки': {'test.txt': [Position(0, 0, 4)]},
+                          'палки': {'test.txt': [Position(0, 7, 12)]},
+                          'ёлки': {'test.txt': [Position(1, 0, 4)]}})
+
+    def test_carriage_returns(self):
+        with open("test.txt", 'w', newline='') as f:
+            f.write("ab\rcd\r\nef\n\rgh")
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.assertEqual(dict(self.indexer.db),
+                         {'ab': {'test.txt': [Position(0, 0, 2)]},
+                          'cd': {'test.txt': [Position(1, 0, 2)]},
+                          'ef': {'test.txt': [Position(2, 0, 2)]},
+                          'gh': {'test.txt': [Position(4, 0, 2)]}})
         
 
 if __name__ == '__main__':
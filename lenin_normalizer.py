@@ -0,0 +1,127 @@
+"""
+This module allows to normalize tokens into the terms they are indexed and
+searched by.
+"""
+from functools import lru_cache
+from unicodedata import normalize
+
+
+# endings removed by the light Russian stemmer, longer endings are tried first
+_ENDINGS = sorted("""
+    иями ями ами ией иям ием иях ого ему ому его ими ыми ее ие ые ое ей ий ый
+    ой ем им ым ом их ых ую юю ая яя ою ею ам ах ях ев ов ье ия ья ию ью еи
+    ии а я о е ы и у ю й ь
+    """.split(), key=len, reverse=True)
+
+# shortest stem left by the stemmer
+_MIN_STEM = 3
+
+
+def stem(term):
+    """
+    Light Russian stemmer. Removes one inflectional ending of nouns and
+    adjectives from a lowercase Cyrillic word, so that e.g. "войны", "войне"
+    and "войну" become "войн". Other words are returned unchanged.
+
+    Args:
+        term (str): lowercase word.
+
+    Returns:
+        The stem as str.
+    """
+    if not ("а" <= term[-1] <= "я" or term[-1] == "ё"):
+        return term
+    for ending in _ENDINGS:
+        if term.endswith(ending) and len(term) - len(ending) >= _MIN_STEM:
+            return term[:-len(ending)]
+    return term
+
+
+class Normalizer(object):
+    """
+    Normalizer turns a token into the term it is indexed and searched by.
+    Normalized forms are memoized in a bounded LRU cache, as a few words make
+    up most of the tokens of any text.
+
+    Attributes:
+        nfc (bool): whether the token is put into Unicode normal form C.
+        casefold (bool): whether the case of the token is folded.
+        yo (bool): whether 'ё' is replaced by 'е'.
+        stem (bool): whether the light Russian stemmer is applied.
+        cache_size (int): maximal number of memoized terms.
+    """
+    def __init__(self, nfc=True, casefold=True, yo=True, stem=False,
+                 cache_size=1 << 16):
+        """
+        Initialises itself.
+
+        Args:
+            nfc (bool): put tokens into Unicode normal form C.
+            casefold (bool): fold the case of tokens.
+            yo (bool): replace 'ё' by 'е'.
+            stem (bool): apply the light Russian stemmer.
+            cache_size (int): maximal number of memoized terms.
+        """
+        self.nfc = nfc
+        self.casefold = casefold
+        self.yo = yo
+        self.stem = stem
+        self.cache_size = cache_size
+        self._cached = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _normalize(self, token):
+        if self.nfc:
+            token = normalize("NFC", token)
+        if self.casefold:
+            token = token.casefold()
+        if self.yo:
+            token = token.replace("ё", "е").replace("Ё", "Е")
+        if self.stem:
+            token = stem(token)
+        return token
+
+    def __call__(self, token):
+        """
+        Normalizes a token.
+
+        Args:
+            token (str): string of the token.
+
+        Returns:
+            The term as str.
+        """
+        return self._cached(token)
+
+    def cache_info(self):
+        """
+        Returns statistics of the cache as functools.lru_cache does.
+        """
+        return self._cached.cache_info()
+
+    def config(self):
+        """
+        Returns the settings of the normalizer as a dictionary, that can be
+        stored in a database and passed to from_config.
+        """
+        return {"nfc": self.nfc, "casefold": self.casefold, "yo": self.yo,
+                "stem": self.stem}
+
+    @classmethod
+    def from_config(cls, config, cache_size=1 << 16):
+        """
+        Creates an instance of class Normalizer from settings returned by
+        config.
+
+        Args:
+            config (dict): settings of the normalizer.
+            cache_size (int): maximal number of memoized terms.
+        """
+        return cls(cache_size=cache_size, **config)
+
+    def __eq__(self, obj):
+        return isinstance(obj, Normalizer) and self.config() == obj.config()
+
+    def __repr__(self):
+        return "Normalizer(" + ", ".join(
+            key + "=" + str(value) for key, value in self.config().items()
+        ) + ")"
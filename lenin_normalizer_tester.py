@@ -0,0 +1,78 @@
+import unittest
+from lenin_normalizer import Normalizer, stem
+
+
+class NormalizerTest(unittest.TestCase):
+    """
+    Tests class Normalizer
+    """
+    def setUp(self):
+        self.normalizer = Normalizer()
+
+    def test_casefold(self):
+        self.assertEqual(self.normalizer("Война"), "война")
+        self.assertEqual(self.normalizer("STRASSE"), "strasse")
+        self.assertEqual(self.normalizer("Straße"), "strasse")
+
+    def test_yo(self):
+        self.assertEqual(self.normalizer("Ёлки"), "елки")
+        self.assertEqual(self.normalizer("ещё"), "еще")
+
+    def test_nfc(self):
+        self.assertEqual(self.normalizer("ёж"), "еж")
+        self.assertEqual(Normalizer(yo=False)("ёж"), "ёж")
+
+    def test_switched_off(self):
+        normalizer = Normalizer(nfc=False, casefold=False, yo=False)
+        self.assertEqual(normalizer("Ёлки"), "Ёлки")
+
+    def test_stem(self):
+        normalizer = Normalizer(stem=True)
+        self.assertEqual(normalizer("Войны"), "войн")
+        self.assertEqual(normalizer("войне"), "войн")
+        self.assertEqual(normalizer("войнами"), "войн")
+        self.assertEqual(normalizer("мир"), "мир")
+        self.assertEqual(normalizer("peace"), "peace")
+        self.assertEqual(normalizer("1812"), "1812")
+
+    def test_cache(self):
+        normalizer = Normalizer(cache_size=2)
+        for word in ["Война", "Война", "мир", "Война"]:
+            normalizer(word)
+        info = normalizer.cache_info()
+        self.assertEqual(info.hits, 2)
+        self.assertEqual(info.misses, 2)
+        self.assertEqual(info.maxsize, 2)
+
+    def test_config(self):
+        normalizer = Normalizer(yo=False, stem=True)
+        config = normalizer.config()
+        self.assertEqual(config, {"nfc": True, "casefold": True, "yo": False,
+                                  "stem": True})
+        self.assertEqual(Normalizer.from_config(config), normalizer)
+        self.assertNotEqual(Normalizer(), normalizer)
+
+
+class StemTest(unittest.TestCase):
+    """
+    Tests function stem
+    """
+    def test_noun(self):
+        self.assertEqual(stem("бобы"), "боб")
+        self.assertEqual(stem("армиями"), "арм")
+
+    def test_adjective(self):
+        self.assertEqual(stem("красные"), "красн")
+        self.assertEqual(stem("белого"), "бел")
+
+    def test_short_word(self):
+        self.assertEqual(stem("мама"), "мам")
+        self.assertEqual(stem("он"), "он")
+        self.assertEqual(stem("и"), "и")
+
+    def test_not_russian(self):
+        self.assertEqual(stem("bonjour"), "bonjour")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,1295 @@
+"""
+This module allows to store positions of terms compactly. Postings of a term
+are encoded into bytes as delta-encoded varints and decoded lazily, when the
+positions of a file are accessed.
+
+Files are stored by docIDs, small integers assigned by DocumentTable.
+Encoded postings of a term:
+    format version (1 byte), number of files (varint),
+    then for every file in the order of docIDs:
+        difference of docIDs (varint),
+        number of positions (varint), length of the positions (varint),
+        if there are more than SKIP_INTERVAL positions: length of the skip
+        entries (varint), skip entries,
+        positions.
+Every position is a triple of varints: difference of lines, difference of
+starts (the start itself if the line differs from the previous one) and length
+of the token. Differences are zigzag encoded, so unsorted positions can be
+stored as well.
+
+Every SKIP_INTERVAL positions of a file start a block. A skip entry of a block
+is a triple of varints: difference of the line of the position before the
+block from the previous entry (zigzag encoded), start of that position and
+difference of the byte offset of the block from the previous entry. Positions
+can be decoded from any block, so a reader looking for a line jumps over the
+blocks before it. Version 2 postings without skip entries are still read.
+
+Postings written with a compressing codec (see CODECS) have version 4 and the
+number of the codec (1 byte) after the version. Every block of positions of
+a file with at least MIN_COMPRESSED positions is then compressed on its own
+and offsets of skip entries point into the compressed positions, so a reader
+decompresses only the blocks it needs.
+"""
+from bisect import bisect_left
+import pickle
+import zlib
+from array import array
+from collections.abc import MutableMapping, Sequence
+from functools import total_ordering
+from lenin_tokenizer import numpy
+try:
+    import lzma
+except ImportError:
+    lzma = None
+from lenin_storage import open_storage
+from lenin_terms import TermDictionary
+
+
+# first byte of encoded postings, pickles never start with it
+FORMAT_VERSION = 3
+_VERSION_BYTE = bytes([FORMAT_VERSION])
+# version of postings with compressed blocks, the number of the codec
+# follows it
+COMPRESSED_VERSION = 4
+_COMPRESSED_BYTE = bytes([COMPRESSED_VERSION])
+# versions of encoded postings that are read
+_VERSION_BYTES = (b"\x02", _VERSION_BYTE, _COMPRESSED_BYTE)
+# number of positions in a block of skip entries, part of the format
+SKIP_INTERVAL = 128
+# codecs of blocks of positions by number: "varint" stores the varints as
+# they are and decodes fastest, "zlib" (raw deflate) and "lzma" (raw LZMA2)
+# compress every block
+CODECS = ("varint", "zlib", "lzma")
+VARINT = "varint"
+# positions of files with fewer positions are never compressed
+MIN_COMPRESSED = 16
+
+# keys of the database that are not terms start with META_PREFIX, tokens
+# never contain it
+META_PREFIX = "\x00"
+# number of documents in the document table
+DOCS_KEY = META_PREFIX + "docs"
+# metadata of a document is stored under DOC_PREFIX + docID
+DOC_PREFIX = META_PREFIX + "doc:"
+# sorted list of terms of a document is stored under TERMS_PREFIX + docID
+TERMS_PREFIX = META_PREFIX + "terms:"
+# byte offsets of the lines of a document are stored under LINES_PREFIX +
+# docID, encoded by encode_offsets
+LINES_PREFIX = META_PREFIX + "lines:"
+# statistics of a term are stored under STATS_PREFIX + term, encoded by
+# TermStats.encode
+STATS_PREFIX = META_PREFIX + "stats:"
+# name of the codec new postings of a database are written with
+CODEC_KEY = META_PREFIX + "codec"
+# set once pickled postings of older versions are encoded, see upgrade
+ENCODED_KEY = META_PREFIX + "encoded"
+# the sorted dictionary of terms is kept in the file path + TERMS_SUFFIX
+TERMS_SUFFIX = ".terms"
+
+
+@total_ordering
+class Position(object):
+    """
+    Position stores data about the position of the first and the last
+    character of a token.
+
+    Attributes:
+        line (int): line in which the token is.
+        start (int): position of the first character of the token.
+        end (int): position after the last character of the token.
+    """
+    def __init__(self, line, start, end):
+        """
+        Creates an instance of class Position using start and end positions.
+
+        Args:
+            line (int): line in which the token is.
+            start (int): position of the first character of the token.
+            end (int): position after the last character of the token.
+        """
+        self.line = line
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_token(cls, line, token):
+        """
+        Allows to create an instance of class Position using a token.
+
+        Args:
+            token (Token): token to get the position of.
+            line (int): line in which the token is.
+        """
+        return cls(line, token.pos, token.pos + len(token.s))
+
+    def __eq__(self, obj):
+        """
+        Checks if two instances of class Position are equal.
+        Two instances of class Positon are equal if their start and end
+        attributes are equal.
+
+        Args:
+            obj (Position): instance to compare the given token to.
+        """
+        return (self.line == obj.line and
+                self.start == obj.start and
+                self.end == obj.end)
+
+    def __lt__(self, obj):
+        less = False
+        if self.line < obj.line:
+            less = True
+        if self.line == obj.line:
+            if self.start < obj.start:
+                less = True
+        return less
+
+    def __repr__(self):
+        return '(' + str(self.line) + ',' + str(self.start) + ',' + \
+                str(self.end) + ")"
+
+
+def _write_varint(out, value):
+    """
+    Appends a non-negative integer to a bytearray as a varint: 7 bits per
+    byte, the high bit is set in all bytes but the last one.
+    """
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, i):
+    """
+    Reads a varint from data starting at index i.
+
+    Returns:
+        Tuple (value, index after the varint).
+    """
+    value = shift = 0
+    while True:
+        byte = data[i]
+        i += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, i
+        shift += 7
+
+
+def _varints(data):
+    """
+    Decodes all varints of data into a list of integers.
+    """
+    values = []
+    append = values.append
+    value = shift = 0
+    for byte in data:
+        if byte < 0x80:
+            append(value | byte << shift)
+            value = shift = 0
+        else:
+            value |= (byte & 0x7f) << shift
+            shift += 7
+    return values
+
+
+def encode_positions(positions):
+    """
+    Encodes positions of a term in one file.
+
+    Args:
+        positions (iterable): instances of class Position.
+
+    Returns:
+        Encoded positions as bytes.
+    """
+    return _encode(positions)[0]
+
+
+def _encode(positions):
+    """
+    Encodes positions of a term in one file together with their skip
+    entries.
+
+    Returns:
+        Tuple (encoded positions, skip entries) of bytes.
+    """
+    out = bytearray()
+    skips = bytearray()
+    line = start = 0
+    # line and byte offset of the previous skip entry
+    skip_line = skip_offset = 0
+    countdown = SKIP_INTERVAL
+    for position in positions:
+        if not countdown:
+            _write_skip(skips, line - skip_line, start, len(out) - skip_offset)
+            skip_line = line
+            skip_offset = len(out)
+            countdown = SKIP_INTERVAL
+        countdown -= 1
+        delta = position.line - line
+        if delta:
+            offset = position.start
+        else:
+            offset = position.start - start
+        _write_varint(out, delta << 1 ^ delta >> 63)
+        _write_varint(out, offset << 1 ^ offset >> 63)
+        _write_varint(out, position.end - position.start)
+        line = position.line
+        start = position.start
+    return bytes(out), bytes(skips)
+
+
+def _write_skip(out, delta, start, offset):
+    """
+    Appends a skip entry to a bytearray.
+    """
+    _write_varint(out, delta << 1 ^ delta >> 63)
+    _write_varint(out, start)
+    _write_varint(out, offset)
+
+
+def _varint_size(value):
+    """
+    Returns the number of bytes of a varint.
+    """
+    return (value.bit_length() + 6) // 7 or 1
+
+
+def build_skips(data):
+    """
+    Builds skip entries of encoded positions, for positions joined from
+    other encoded positions without decoding them.
+
+    Args:
+        data (bytes): positions encoded by encode_positions.
+
+    Returns:
+        Skip entries as bytes, empty if there are at most SKIP_INTERVAL
+        positions.
+    """
+    skips = bytearray()
+    values = _varints(data)
+    line = start = offset = 0
+    skip_line = skip_offset = 0
+    step = 3 * SKIP_INTERVAL
+    size = _varint_size
+    for i in range(0, len(values), 3):
+        if i and not i % step:
+            _write_skip(skips, line - skip_line, start, offset - skip_offset)
+            skip_line = line
+            skip_offset = offset
+        delta = values[i]
+        shift = values[i + 1]
+        if delta:
+            line += delta >> 1 ^ -(delta & 1)
+            start = shift >> 1 ^ -(shift & 1)
+        else:
+            start += shift >> 1 ^ -(shift & 1)
+        offset += size(delta) + size(shift) + size(values[i + 2])
+    return bytes(skips)
+
+
+def append_positions(out, last, data):
+    """
+    Appends encoded positions to other encoded positions without decoding
+    them: only the first position of data is encoded again, relative to the
+    last position of out.
+
+    Args:
+        out (bytearray): encoded positions, data is appended to it.
+        last (tuple): (line, start) of the last position of out, ignored if
+            out is empty.
+        data (bytes): encoded positions.
+    """
+    if not out or not data:
+        out += data
+        return
+    # the first position of data is stored with absolute line and start
+    line, i = _read_varint(data, 0)
+    start, i = _read_varint(data, i)
+    delta = (line >> 1 ^ -(line & 1)) - last[0]
+    start = start >> 1 ^ -(start & 1)
+    if not delta:
+        start -= last[1]
+    _write_varint(out, delta << 1 ^ delta >> 63)
+    _write_varint(out, start << 1 ^ start >> 63)
+    out += data[i:]
+
+
+def _lzma_filters():
+    """
+    Returns the filters of the lzma codec: LZMA2 with a small dictionary,
+    blocks are small.
+
+    Raises:
+        ImportError: in case Python is built without lzma.
+    """
+    if lzma is None:
+        raise ImportError("the lzma codec requires the lzma module")
+    return [{"id": lzma.FILTER_LZMA2, "preset": 6, "dict_size": 1 << 16}]
+
+
+def compress_block(codec, data):
+    """
+    Compresses a block of encoded positions.
+
+    Args:
+        codec (str): one of CODECS.
+        data (bytes): encoded positions.
+
+    Returns:
+        Compressed block as bytes.
+    """
+    if codec == "zlib":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        return compressor.compress(data) + compressor.flush()
+    if codec == "lzma":
+        return lzma.compress(data, format=lzma.FORMAT_RAW,
+                             filters=_lzma_filters())
+    return data
+
+
+def decompress_block(codec, data):
+    """
+    Decompresses a block compressed by compress_block.
+    """
+    if codec == "zlib":
+        return zlib.decompress(data, -15)
+    if codec == "lzma":
+        return lzma.decompress(data, format=lzma.FORMAT_RAW,
+                               filters=_lzma_filters())
+    return data
+
+
+def _pack(data, skips, count, codec):
+    """
+    Compresses every block of encoded positions of a file.
+
+    Args:
+        data (bytes): encoded positions.
+        skips (bytes): their skip entries.
+        count (int): number of positions.
+        codec (str): one of CODECS.
+
+    Returns:
+        Tuple (compressed positions, skip entries with the offsets of the
+        compressed blocks), the arguments if the positions are not
+        compressed.
+    """
+    if codec == VARINT or count < MIN_COMPRESSED:
+        return data, skips
+    values = _varints(skips)
+    starts = [0]
+    for i in range(2, len(values), 3):
+        starts.append(starts[-1] + values[i])
+    starts.append(len(data))
+    out = bytearray()
+    packed_skips = bytearray()
+    previous = 0
+    for block in range(len(starts) - 1):
+        if block:
+            i = 3 * block - 3
+            _write_varint(packed_skips, values[i])
+            _write_varint(packed_skips, values[i + 1])
+            _write_varint(packed_skips, len(out) - previous)
+            previous = len(out)
+        out += compress_block(codec, data[starts[block]:starts[block + 1]])
+    return bytes(out), bytes(packed_skips)
+
+
+def _triples(data, line=0, start=0):
+    """
+    Generator.
+    Decodes positions into tuples (line, start, end). Positions of a block are
+    decoded from the line and the start of the position before the block.
+    """
+    values = _varints(data)
+    for i in range(0, len(values), 3):
+        delta = values[i]
+        offset = values[i + 1]
+        if delta:
+            line += delta >> 1 ^ -(delta & 1)
+            start = offset >> 1 ^ -(offset & 1)
+        else:
+            start += offset >> 1 ^ -(offset & 1)
+        yield line, start, start + values[i + 2]
+
+
+def decode_positions(data):
+    """
+    Decodes positions encoded by encode_positions.
+
+    Args:
+        data (bytes): encoded positions.
+
+    Returns:
+        List of instances of class Position.
+    """
+    return [Position(line, start, end) for line, start, end in _triples(data)]
+
+
+def _varints_array(data):
+    """
+    Decodes all varints of data into a numpy array of integers.
+    """
+    b = numpy.frombuffer(data, dtype=numpy.uint8)
+    ends = numpy.flatnonzero(b < 0x80)
+    if not len(ends):
+        return numpy.zeros(0, dtype=numpy.int64)
+    starts = numpy.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    # shift of every byte within its varint
+    owner = numpy.repeat(numpy.arange(len(ends)), ends - starts + 1)
+    shift = (numpy.arange(len(b)) - starts[owner]) * 7
+    parts = (b & 0x7f).astype(numpy.int64) << shift
+    return numpy.add.reduceat(parts, starts)
+
+
+def decode_arrays(data):
+    """
+    Decodes positions encoded by encode_positions into numpy columns without
+    creating an object per position.
+
+    Args:
+        data (bytes): encoded positions.
+
+    Returns:
+        Tuple of numpy arrays (lines, starts, ends) of int64.
+
+    Raises:
+        ImportError: in case numpy is not installed.
+    """
+    if numpy is None:
+        raise ImportError("decode_arrays requires numpy")
+    values = _varints_array(data).reshape(-1, 3)
+    values[:, :2] = values[:, :2] >> 1 ^ -(values[:, :2] & 1)
+    delta, offset, length = values.T
+    lines = numpy.cumsum(delta)
+    # starts are differences within a line, the sum restarts on a new line
+    total = numpy.cumsum(offset)
+    restart = numpy.where(delta != 0, numpy.arange(len(delta)), 0)
+    numpy.maximum.accumulate(restart, out=restart)
+    starts = total - (total[restart] - offset[restart])
+    return lines, starts, starts + length
+
+
+class PostingList(Sequence):
+    """
+    PostingList is a read-only sequence of positions of a term in one file.
+    The positions are kept encoded and are decoded on the first access.
+
+    Attributes:
+        packed (bytes): positions as they are stored, blocks are compressed
+            by codec.
+        skips (bytes): skip entries of the positions, None if they are not
+            built yet.
+        codec (str): codec of the blocks, one of CODECS.
+    """
+    __slots__ = ("packed", "skips", "codec", "_data", "_count", "_positions",
+                 "_blocks")
+
+    def __init__(self, data, count, skips=None, codec=VARINT):
+        """
+        Initialises itself.
+
+        Args:
+            data (bytes): positions encoded by encode_positions, blocks are
+                compressed by codec.
+            count (int): number of positions.
+            skips (bytes): skip entries of the positions, built from data
+                when they are needed if None. Required for compressed
+                positions of more than SKIP_INTERVAL positions.
+            codec (str): codec of the blocks, one of CODECS.
+        """
+        self.packed = data
+        self.skips = skips
+        self.codec = codec
+        self._data = data if codec == VARINT else None
+        self._count = count
+        self._positions = None
+        self._blocks = None
+
+    @classmethod
+    def from_positions(cls, positions):
+        """
+        Creates an instance of class PostingList from a list of positions.
+        """
+        data, skips = _encode(positions)
+        postings = cls(data, len(positions), skips)
+        postings._positions = list(positions)
+        return postings
+
+    @property
+    def data(self):
+        """
+        Encoded positions, every block is decompressed on the first access.
+        """
+        if self._data is None:
+            states = self._block_table()[1]
+            self._data = b"".join(
+                decompress_block(self.codec,
+                                 self.packed[states[i][2]:states[i + 1][2]])
+                for i in range(len(states) - 1))
+        return self._data
+
+    def skip_entries(self):
+        """
+        Returns the skip entries of the positions, building them if needed.
+        """
+        if self.skips is None:
+            if self._count > SKIP_INTERVAL:
+                self.skips = build_skips(self.data)
+            else:
+                self.skips = b""
+        return self.skips
+
+    def _block_table(self):
+        """
+        Returns the decoded skip entries: lists of lines and of states
+        (line, start, byte offset in packed) from which the blocks are
+        decoded.
+        """
+        if self._blocks is None:
+            values = _varints(self.skip_entries())
+            lines = []
+            states = [(0, 0, 0)]
+            line = offset = 0
+            for i in range(0, len(values), 3):
+                delta = values[i]
+                line += delta >> 1 ^ -(delta & 1)
+                offset += values[i + 2]
+                lines.append(line)
+                states.append((line, values[i + 1], offset))
+            states.append((0, 0, len(self.packed)))
+            self._blocks = lines, states
+        return self._blocks
+
+    def _scan(self, block):
+        """
+        Generator.
+        Decodes positions into tuples (line, start, end) block by block,
+        starting with a given block. Only the blocks that are decoded are
+        decompressed.
+        """
+        states = self._block_table()[1]
+        packed = self.packed
+        codec = self.codec
+        for i in range(block, len(states) - 1):
+            line, start, offset = states[i]
+            data = packed[offset:states[i + 1][2]]
+            yield from _triples(decompress_block(codec, data), line, start)
+
+    def on_lines(self, lines):
+        """
+        Finds positions in given lines. Skip entries allow to jump over the
+        blocks of positions before every line instead of decoding all of
+        them, the positions must be sorted by line.
+
+        Args:
+            lines (iterable): line numbers in ascending order.
+
+        Returns:
+            Dictionary {line: [positions]} of the lines that have positions.
+        """
+        found = {}
+        if self._positions is not None:
+            wanted = set(lines)
+            for position in self._positions:
+                if position.line in wanted:
+                    found.setdefault(position.line, []).append(position)
+            return found
+        keys = self._block_table()[0]
+        scan = iter(())
+        current = None
+        # index of the current position, -1 before the first one
+        index = -1
+        for line in lines:
+            block = bisect_left(keys, line)
+            if block * SKIP_INTERVAL > index:
+                scan = self._scan(block)
+                index = block * SKIP_INTERVAL
+                current = next(scan, None)
+            while current is not None and current[0] < line:
+                current = next(scan, None)
+                index += 1
+            if current is None:
+                break
+            while current is not None and current[0] == line:
+                found.setdefault(line, []).append(Position(*current))
+                current = next(scan, None)
+                index += 1
+        return found
+
+    def positions(self):
+        """
+        Returns the list of positions, decoding them if needed.
+        """
+        if self._positions is None:
+            self._positions = decode_positions(self.data)
+        return self._positions
+
+    def columns(self):
+        """
+        Returns the positions as three columns of integers (lines, starts,
+        ends) of type array.array without creating an object per position.
+        """
+        lines, starts, ends = array("q"), array("q"), array("q")
+        for line, start, end in _triples(self.data):
+            lines.append(line)
+            starts.append(start)
+            ends.append(end)
+        return lines, starts, ends
+
+    def arrays(self):
+        """
+        Returns the positions as three numpy arrays (lines, starts, ends),
+        see decode_arrays. Faster than columns for long posting lists.
+
+        Raises:
+            ImportError: in case numpy is not installed.
+        """
+        return decode_arrays(self.data)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        return self.positions()[index]
+
+    def __iter__(self):
+        return iter(self.positions())
+
+    def __eq__(self, obj):
+        if isinstance(obj, PostingList):
+            return self.data == obj.data
+        if isinstance(obj, Sequence):
+            return self.positions() == list(obj)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.positions())
+
+
+def encode_postings(postings, codec=VARINT):
+    """
+    Encodes postings of a term.
+
+    Args:
+        postings (dict): dictionary {docID: positions}, positions are a list
+            of instances of class Position or a PostingList.
+        codec (str): codec of the blocks of positions, one of CODECS.
+
+    Returns:
+        Encoded postings as bytes.
+
+    Raises:
+        ValueError: in case the codec is unknown.
+    """
+    if codec not in CODECS:
+        raise ValueError("Unknown codec: " + repr(codec))
+    if codec == VARINT:
+        out = bytearray(_VERSION_BYTE)
+    else:
+        out = bytearray(_COMPRESSED_BYTE)
+        out.append(CODECS.index(codec))
+    _write_varint(out, len(postings))
+    previous = 0
+    for doc_id in sorted(postings):
+        positions = postings[doc_id]
+        count = len(positions)
+        stored = VARINT if count < MIN_COMPRESSED else codec
+        if isinstance(positions, PostingList) and positions.codec == stored:
+            data = positions.packed
+            skips = positions.skip_entries()
+        else:
+            if isinstance(positions, PostingList):
+                data = positions.data
+                skips = (positions.skip_entries()
+                         if positions.codec == VARINT else build_skips(data))
+            else:
+                data, skips = _encode(positions)
+            data, skips = _pack(data, skips, count, stored)
+        _write_varint(out, doc_id - previous)
+        _write_varint(out, count)
+        _write_varint(out, len(data))
+        if count > SKIP_INTERVAL:
+            _write_varint(out, len(skips))
+            out += skips
+        out += data
+        previous = doc_id
+    return bytes(out)
+
+
+def decode_postings(data):
+    """
+    Decodes postings encoded by encode_postings. Only the docIDs are decoded,
+    positions of every document are decoded when they are accessed.
+
+    Args:
+        data (bytes): encoded postings.
+
+    Returns:
+        Dictionary {docID: PostingList} ordered by docID.
+
+    Raises:
+        ValueError: in case the data is not in the known format.
+    """
+    version = data[:1]
+    if version not in _VERSION_BYTES:
+        raise ValueError("Unknown format of postings")
+    codec = VARINT
+    i = 1
+    if version == _COMPRESSED_BYTE:
+        if len(data) < 2 or data[1] >= len(CODECS):
+            raise ValueError("Unknown codec of postings")
+        codec = CODECS[data[1]]
+        i = 2
+    postings = {}
+    files, i = _read_varint(data, i)
+    doc_id = 0
+    for _ in range(files):
+        delta, i = _read_varint(data, i)
+        doc_id += delta
+        count, i = _read_varint(data, i)
+        length, i = _read_varint(data, i)
+        skips = None
+        # version 2 postings have no skip entries
+        if count > SKIP_INTERVAL and version != b"\x02":
+            size, i = _read_varint(data, i)
+            skips = data[i:i + size]
+            i += size
+        postings[doc_id] = PostingList(
+            data[i:i + length], count, skips,
+            VARINT if count < MIN_COMPRESSED else codec)
+        i += length
+    return postings
+
+
+def encode_offsets(offsets):
+    """
+    Encodes increasing byte offsets of lines as varint differences.
+
+    Args:
+        offsets (iterable): non-decreasing non-negative integers.
+
+    Returns:
+        bytes.
+    """
+    out = bytearray()
+    previous = 0
+    for offset in offsets:
+        _write_varint(out, offset - previous)
+        previous = offset
+    return bytes(out)
+
+
+def decode_offsets(data):
+    """
+    Decodes byte offsets encoded by encode_offsets.
+
+    Returns:
+        array.array of type 'q'.
+    """
+    offsets = array('q', _varints(data))
+    total = 0
+    for i, delta in enumerate(offsets):
+        total += delta
+        offsets[i] = total
+    return offsets
+
+
+class TermStats(object):
+    """
+    TermStats holds statistics of a term: number of its occurrences in every
+    document. They are stored apart from the postings, so they are read
+    without the positions.
+
+    Attributes:
+        counts (dict): dictionary {docID: number of occurrences}.
+    """
+    __slots__ = ("counts",)
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    @classmethod
+    def from_postings(cls, postings):
+        """
+        Creates statistics of postings {docID: positions}.
+        """
+        return cls({doc_id: len(positions)
+                    for doc_id, positions in postings.items()})
+
+    @property
+    def documents(self):
+        """
+        Document frequency: number of documents that contain the term.
+        """
+        return len(self.counts)
+
+    @property
+    def occurrences(self):
+        """
+        Total number of occurrences of the term.
+        """
+        return sum(self.counts.values())
+
+    def encode(self):
+        """
+        Encodes the statistics as varint pairs (difference of docIDs, count)
+        in the order of docIDs.
+        """
+        out = bytearray()
+        previous = 0
+        for doc_id in sorted(self.counts):
+            _write_varint(out, doc_id - previous)
+            _write_varint(out, self.counts[doc_id])
+            previous = doc_id
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data):
+        """
+        Decodes statistics encoded by encode.
+        """
+        values = _varints(data)
+        counts = {}
+        doc_id = 0
+        for i in range(0, len(values), 2):
+            doc_id += values[i]
+            counts[doc_id] = values[i + 1]
+        return cls(counts)
+
+    def __eq__(self, obj):
+        return isinstance(obj, TermStats) and self.counts == obj.counts
+
+    def __repr__(self):
+        return "TermStats(" + repr(self.counts) + ")"
+
+
+class DocumentTable(object):
+    """
+    DocumentTable maps paths of indexed files to docIDs, small integers
+    postings are stored by, and keeps metadata of every document. The table
+    is stored in the keys of a database that start with DOC_PREFIX and is
+    loaded into memory when the table is created. Paths of postings pickled
+    by older versions that are not in the table get negative transient docIDs
+    which are never stored.
+
+    Attributes:
+        db (mapping): database the table is stored in, e.g. a shelf or
+            a PostingsDB.
+    """
+    def __init__(self, db):
+        """
+        Loads the table from a database.
+
+        Args:
+            db (mapping): database.
+        """
+        self.db = db
+        self._paths = []
+        self._ids = {}
+        self._transient = []
+        self._transient_ids = {}
+        for doc_id in range(db.get(DOCS_KEY, 0)):
+            path = db[DOC_PREFIX + str(doc_id)]["path"]
+            self._paths.append(path)
+            self._ids[path] = doc_id
+
+    def get_id(self, path):
+        """
+        Returns the docID of a path or None if the path is not in the table.
+        """
+        return self._ids.get(path)
+
+    def transient_id(self, path):
+        """
+        Returns the docID of a path without adding it to the table: a path
+        that is not in the table gets a negative docID kept in memory only,
+        e.g. a path read from pickled postings by a search.
+        """
+        doc_id = self._ids.get(path)
+        if doc_id is None:
+            doc_id = self._transient_ids.get(path)
+            if doc_id is None:
+                self._transient.append(path)
+                doc_id = self._transient_ids[path] = -len(self._transient)
+        return doc_id
+
+    def path(self, doc_id):
+        """
+        Returns the path of a document.
+
+        Raises:
+            IndexError: in case there is no such document.
+        """
+        if doc_id < 0:
+            return self._transient[-1 - doc_id]
+        return self._paths[doc_id]
+
+    def add(self, path, **metadata):
+        """
+        Adds a path to the table if it is not there yet and updates metadata
+        of the document.
+
+        Args:
+            path (str): path of the document.
+            **metadata: values to store, e.g. size, mtime and lines.
+
+        Returns:
+            DocID of the path.
+        """
+        doc_id = self._ids.get(path)
+        if doc_id is None:
+            doc_id = len(self._paths)
+            self._paths.append(path)
+            self._ids[path] = doc_id
+            self.db[DOC_PREFIX + str(doc_id)] = dict(metadata, path=path)
+            self.db[DOCS_KEY] = len(self._paths)
+        elif metadata:
+            key = DOC_PREFIX + str(doc_id)
+            self.db[key] = dict(self.db[key], **metadata)
+        return doc_id
+
+    def metadata(self, doc):
+        """
+        Returns metadata of a document.
+
+        Args:
+            doc (int or str): docID or path of the document.
+
+        Returns:
+            Dictionary with key path and the keys passed to add.
+
+        Raises:
+            KeyError: in case there is no such document.
+        """
+        return self.db[DOC_PREFIX + str(self._id(doc))]
+
+    def _id(self, doc):
+        return self._ids[doc] if isinstance(doc, str) else doc
+
+    def is_indexed(self, doc):
+        """
+        Checks if a document is indexed, i.e. its postings are in the
+        database. Documents keep their docIDs when they are removed.
+
+        Args:
+            doc (int or str): docID or path of the document.
+        """
+        return "size" in self.metadata(doc)
+
+    def terms(self, doc):
+        """
+        Returns the sorted list of terms of a document or None if it is not
+        stored.
+
+        Args:
+            doc (int or str): docID or path of the document.
+        """
+        return self.db.get(TERMS_PREFIX + str(self._id(doc)))
+
+    def set_terms(self, doc, terms):
+        """
+        Stores the terms of a document.
+
+        Args:
+            doc (int or str): docID or path of the document.
+            terms (iterable): terms.
+        """
+        self.db[TERMS_PREFIX + str(self._id(doc))] = sorted(terms)
+
+    def line_offsets(self, doc):
+        """
+        Returns byte offsets of the starts of the lines of a document or None
+        if they are not stored.
+
+        Args:
+            doc (int or str): docID or path of the document.
+
+        Returns:
+            array.array, offset of line i is its item i.
+        """
+        data = self.db.get(LINES_PREFIX + str(self._id(doc)))
+        return None if data is None else decode_offsets(data)
+
+    def set_line_offsets(self, doc, offsets):
+        """
+        Stores byte offsets of the starts of the lines of a document.
+
+        Args:
+            doc (int or str): docID or path of the document.
+            offsets (iterable): increasing byte offsets.
+        """
+        self.db[LINES_PREFIX + str(self._id(doc))] = encode_offsets(offsets)
+
+    def reset(self, doc):
+        """
+        Forgets metadata, terms and line offsets of a document, its docID is
+        kept.
+
+        Args:
+            doc (int or str): docID or path of the document.
+        """
+        doc_id = self._id(doc)
+        self.db[DOC_PREFIX + str(doc_id)] = {"path": self._paths[doc_id]}
+        self.db.pop(TERMS_PREFIX + str(doc_id), None)
+        self.db.pop(LINES_PREFIX + str(doc_id), None)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __iter__(self):
+        """
+        Iterates over paths in the order of docIDs.
+        """
+        return iter(self._paths)
+
+
+class PostingsDB(MutableMapping):
+    """
+    PostingsDB is a database of postings {term: {path: positions}} stored in
+    a storage backend (see lenin_storage). Paths are replaced by docIDs of
+    the document table and postings of terms are written as bytes encoded by
+    encode_postings, values of keys that start with META_PREFIX are pickled.
+    Postings pickled by older versions are read as well, without writing
+    their paths into the document table, and are encoded by upgrade.
+    Statistics of every term (TermStats) are kept up to date with its
+    postings.
+
+    Iteration and len cover the terms only. The sorted dictionary of terms
+    (TermDictionary) is kept in a file next to the database and written by
+    sync, it is built from the keys of databases written without one.
+
+    Attributes:
+        store (StorageBackend): underlying database.
+        docs (DocumentTable): docIDs and metadata of the documents.
+        dictionary (TermDictionary): sorted terms.
+        codec (str): codec postings are written with, see set_codec.
+    """
+    def __init__(self, path, flag="c", storage=None):
+        """
+        Opens the database.
+
+        Args:
+            path (str): path to the database.
+            flag (str): flag of dbm.open.
+            storage (str): name of the storage backend, see open_storage.
+        """
+        self.store = open_storage(path, storage, flag)
+        self.docs = DocumentTable(self)
+        self.dictionary = TermDictionary(path + TERMS_SUFFIX,
+                                         lambda: list(self), flag)
+        self.codec = self.get(CODEC_KEY, VARINT)
+
+    def set_codec(self, codec):
+        """
+        Sets the codec postings are written with and stores it in the
+        database. Postings written before are read as they are.
+
+        Args:
+            codec (str): one of CODECS.
+
+        Raises:
+            ValueError: in case the codec is unknown.
+        """
+        if codec not in CODECS:
+            raise ValueError("Unknown codec: " + repr(codec))
+        self[CODEC_KEY] = codec
+        self.codec = codec
+
+    def encoded(self, term):
+        """
+        Returns stored bytes of a term or None if the term is absent.
+        """
+        return self.store.get(term)
+
+    def doc_postings(self, term):
+        """
+        Returns postings of a term by docID. Paths of pickled postings that
+        are not in the document table get transient docIDs, nothing is
+        written.
+
+        Args:
+            term (str): term.
+
+        Returns:
+            Dictionary {docID: PostingList}, empty if the term is absent.
+        """
+        return self._postings(term, self.docs.transient_id)
+
+    def _postings(self, term, get_id):
+        """
+        Returns postings of a term by docID, paths of pickled postings are
+        turned into docIDs by get_id.
+        """
+        data = self.store.get(term)
+        if data is None:
+            return {}
+        if data[:1] in _VERSION_BYTES:
+            return decode_postings(data)
+        return {get_id(path): PostingList.from_positions(positions)
+                for path, positions in pickle.loads(data).items()}
+
+    def upgrade(self):
+        """
+        Encodes postings pickled by older versions, the database is read
+        through once. Their paths are added to the document table and the
+        terms of every such document are stored, so indexing the document
+        again replaces its postings.
+
+        Returns:
+            Number of encoded terms.
+        """
+        if self.get(ENCODED_KEY):
+            return 0
+        doc_terms = {}
+        count = 0
+        for term in list(self):
+            data = self.store.get(term)
+            if data[:1] in _VERSION_BYTES:
+                continue
+            postings = self._postings(term, self.docs.add)
+            for doc_id in postings:
+                doc_terms.setdefault(doc_id, []).append(term)
+            self._put(term, postings)
+            count += 1
+        for doc_id, terms in doc_terms.items():
+            stored = self.docs.terms(doc_id) or ()
+            self.docs.set_terms(doc_id, set(terms).union(stored))
+        self[ENCODED_KEY] = True
+        return count
+
+    def term_stats(self, term):
+        """
+        Returns statistics of a term without reading its positions.
+
+        Args:
+            term (str): term.
+
+        Returns:
+            TermStats or None if the term is absent.
+        """
+        data = self.get(STATS_PREFIX + term)
+        if data is not None:
+            return TermStats.decode(data)
+        # terms written before the statistics were stored
+        postings = self.doc_postings(term)
+        return TermStats.from_postings(postings) if postings else None
+
+    def _put(self, term, postings):
+        """
+        Writes postings {docID: positions} of a term and its statistics.
+        """
+        self.store.put(term, encode_postings(postings, self.codec))
+        self[STATS_PREFIX + term] = TermStats.from_postings(postings).encode()
+        self.dictionary.add(term)
+
+    def _delete(self, term):
+        """
+        Deletes postings of a term and its statistics.
+        """
+        self.store.delete(term)
+        self.store.delete(STATS_PREFIX + term)
+        self.dictionary.discard(term)
+
+    def __getitem__(self, key):
+        data = self.store.get(key)
+        if data is None:
+            raise KeyError(key)
+        if key.startswith(META_PREFIX) or data[:1] not in _VERSION_BYTES:
+            return pickle.loads(data)
+        path = self.docs.path
+        return {path(doc_id): positions
+                for doc_id, positions in decode_postings(data).items()}
+
+    def __setitem__(self, key, value):
+        if key.startswith(META_PREFIX):
+            self.store.put(key, pickle.dumps(value, pickle.DEFAULT_PROTOCOL))
+        else:
+            add = self.docs.add
+            self._put(key, {add(path): positions
+                            for path, positions in value.items()})
+
+    def __delitem__(self, key):
+        if key not in self.store:
+            raise KeyError(key)
+        if key.startswith(META_PREFIX):
+            self.store.delete(key)
+        else:
+            self._delete(key)
+
+    def __contains__(self, key):
+        return key in self.store
+
+    def __iter__(self):
+        for key in self.store.keys():
+            if not key.startswith(META_PREFIX):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def extend(self, term, postings):
+        """
+        Adds positions to the stored postings of a term. Positions of a
+        document that is already stored for the term are appended to its
+        positions.
+
+        Args:
+            term (str): term.
+            postings (dict): dictionary {docID: positions}, positions are a
+                list of instances of class Position or a PostingList.
+        """
+        entry = self._postings(term, self.docs.add)
+        for doc_id, positions in postings.items():
+            if doc_id in entry:
+                entry[doc_id] = list(entry[doc_id]) + list(positions)
+            else:
+                entry[doc_id] = positions
+        self._put(term, entry)
+
+    def remove_document(self, doc):
+        """
+        Removes postings of a document from the database using its list of
+        terms. Terms that are left without documents are deleted.
+
+        Args:
+            doc (int or str): docID or path of the document.
+        """
+        doc_id = self.docs._id(doc)
+        terms = self.docs.terms(doc_id)
+        if terms is None:
+            # databases built before the lists of terms were stored
+            terms = list(self)
+        for term in terms:
+            entry = self._postings(term, self.docs.add)
+            if entry.pop(doc_id, None) is None:
+                continue
+            if entry:
+                self._put(term, entry)
+            else:
+                self._delete(term)
+        self.docs.reset(doc_id)
+
+    def match_terms(self, pattern, limit=None):
+        """
+        Returns the first terms matching a wildcard pattern in sorted order.
+
+        Args:
+            pattern (str): pattern, "*" matches any sequence of characters.
+            limit (int): maximal number of terms or None.
+        """
+        return self.dictionary.match(pattern, limit)
+
+    def sync(self):
+        self.store.sync()
+        self.dictionary.save()
+
+    def close(self):
+        self.dictionary.save()
+        self.store.close()
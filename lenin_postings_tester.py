@@ -0,0 +1,520 @@
+import unittest
+import os
+import pickle
+import shelve
+from lenin_postings import (Position, PostingList, PostingsDB,
+                            DocumentTable, encode_positions,
+                            decode_positions, encode_postings,
+                            decode_postings, decode_arrays, encode_offsets,
+                            append_positions, TermStats, STATS_PREFIX,
+                            decode_offsets, build_skips, SKIP_INTERVAL,
+                            CODECS, MIN_COMPRESSED, compress_block,
+                            decompress_block, META_PREFIX, DOCS_KEY,
+                            _write_varint)
+import lenin_postings
+from lenin_tokenizer import numpy
+
+
+POSITIONS = [Position(0, 0, 4), Position(0, 5, 9), Position(2, 130, 135),
+             Position(2, 200, 201), Position(70000, 3, 10)]
+
+
+class EncodePositionsTest(unittest.TestCase):
+    """
+    Tests functions encode_positions and decode_positions.
+    """
+    def test_empty(self):
+        self.assertEqual(encode_positions([]), b"")
+        self.assertEqual(decode_positions(b""), [])
+
+    def test_round_trip(self):
+        data = encode_positions(POSITIONS)
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(decode_positions(data), POSITIONS)
+
+    def test_small_deltas(self):
+        # every value of a position on the same line fits into one byte
+        self.assertEqual(len(encode_positions(POSITIONS[:2])), 6)
+
+    def test_unsorted(self):
+        positions = [Position(3, 10, 12), Position(1, 5, 6),
+                     Position(1, 0, 2)]
+        self.assertEqual(decode_positions(encode_positions(positions)),
+                         positions)
+
+    def test_append(self):
+        for i in range(len(POSITIONS) + 1):
+            first, second = POSITIONS[:i], POSITIONS[i:]
+            out = bytearray(encode_positions(first))
+            last = (first[-1].line, first[-1].start) if first else None
+            append_positions(out, last, encode_positions(second))
+            self.assertEqual(bytes(out), encode_positions(POSITIONS))
+
+    def test_append_unsorted(self):
+        out = bytearray(encode_positions([Position(5, 10, 12)]))
+        append_positions(out, (5, 10), encode_positions(POSITIONS[:2]))
+        self.assertEqual(decode_positions(bytes(out)),
+                         [Position(5, 10, 12)] + POSITIONS[:2])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_decode_arrays(self):
+        positions = POSITIONS + [Position(70000, 1, 2), Position(70001, 0, 1)]
+        lines, starts, ends = decode_arrays(encode_positions(positions))
+        self.assertEqual(list(lines), [p.line for p in positions])
+        self.assertEqual(list(starts), [p.start for p in positions])
+        self.assertEqual(list(ends), [p.end for p in positions])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_decode_arrays_empty(self):
+        lines, starts, ends = decode_arrays(b"")
+        self.assertEqual(len(lines), 0)
+
+
+class PostingListTest(unittest.TestCase):
+    """
+    Tests class PostingList.
+    """
+    def setUp(self):
+        self.postings = PostingList(encode_positions(POSITIONS),
+                                    len(POSITIONS))
+
+    def test_lazy(self):
+        self.assertEqual(len(self.postings), 5)
+        self.assertIsNone(self.postings._positions)
+        self.assertEqual(self.postings[2], Position(2, 130, 135))
+        self.assertIsNotNone(self.postings._positions)
+
+    def test_equal(self):
+        self.assertEqual(self.postings, POSITIONS)
+        self.assertEqual(self.postings, PostingList.from_positions(POSITIONS))
+        self.assertNotEqual(self.postings, POSITIONS[:2])
+
+    def test_columns(self):
+        lines, starts, ends = self.postings.columns()
+        self.assertEqual(list(lines), [0, 0, 2, 2, 70000])
+        self.assertEqual(list(ends), [4, 9, 135, 201, 10])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_arrays(self):
+        lines, starts, ends = self.postings.arrays()
+        self.assertEqual(list(starts), [0, 5, 130, 200, 3])
+
+
+class EncodePostingsTest(unittest.TestCase):
+    """
+    Tests functions encode_postings and decode_postings.
+    """
+    def test_round_trip(self):
+        postings = {300: POSITIONS, 2: [Position(1, 2, 3)]}
+        data = encode_postings(postings)
+        self.assertEqual(data[0], 3)
+        decoded = decode_postings(data)
+        self.assertEqual(list(decoded), [2, 300])
+        self.assertEqual(decoded, postings)
+
+    def test_posting_list_is_not_reencoded(self):
+        postings = decode_postings(encode_postings({0: POSITIONS}))
+        self.assertEqual(encode_postings(postings),
+                         encode_postings({0: POSITIONS}))
+        self.assertIsNone(postings[0]._positions)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            decode_postings(b"\x80\x04")
+
+    def test_version_2(self):
+        # version 2 postings have no skip entries
+        positions = encode_positions(LONG)
+        data = bytearray(b"\x02\x01\x05")
+        _write_varint(data, len(LONG))
+        _write_varint(data, len(positions))
+        postings = decode_postings(bytes(data) + positions)
+        self.assertEqual(postings, {5: LONG})
+        self.assertIsNone(postings[5].skips)
+        self.assertEqual(postings[5].on_lines([14]), {14: LONG[70:80]})
+
+
+# positions in 50 lines, ten in every line
+LONG = [Position(line * 2, start * 10, start * 10 + 4)
+        for line in range(50) for start in range(10)]
+
+
+class SkipTest(unittest.TestCase):
+    """
+    Tests skip entries of long posting lists and PostingList.on_lines.
+    """
+    def setUp(self):
+        self.postings = decode_postings(encode_postings({0: LONG}))[0]
+
+    def test_skips(self):
+        skips = self.postings.skips
+        self.assertTrue(skips)
+        self.assertEqual(build_skips(encode_positions(LONG)), skips)
+        self.assertEqual(build_skips(encode_positions(LONG[:SKIP_INTERVAL])),
+                         b"")
+
+    def test_short_lists_have_no_skips(self):
+        data = encode_postings({0: LONG[:SKIP_INTERVAL]})
+        self.assertEqual(data, b"\x03\x01\x00" + bytes([SKIP_INTERVAL, 1]) +
+                         data[5:])
+        self.assertEqual(decode_postings(data)[0].on_lines([0, 2]),
+                         {0: LONG[:10], 2: LONG[10:20]})
+
+    def test_on_lines(self):
+        found = self.postings.on_lines([1, 14, 26, 27, 64, 98, 99, 500])
+        self.assertEqual(found, {14: LONG[70:80], 26: LONG[130:140],
+                                 64: LONG[320:330], 98: LONG[490:]})
+        self.assertIsNone(self.postings._positions)
+
+    def test_on_lines_across_blocks(self):
+        # line 24 is split between the first and the second block
+        self.assertEqual(self.postings.on_lines([24]), {24: LONG[120:130]})
+        self.assertEqual(self.postings.on_lines(range(100)),
+                         {line * 2: LONG[line * 10:line * 10 + 10]
+                          for line in range(50)})
+
+    def test_on_lines_decoded(self):
+        self.postings.positions()
+        self.assertEqual(self.postings.on_lines([14, 15]), {14: LONG[70:80]})
+
+    def test_joined_posting_list(self):
+        postings = PostingList(encode_positions(LONG), len(LONG))
+        self.assertEqual(postings.on_lines([0, 98]),
+                         {0: LONG[:10], 98: LONG[490:]})
+        self.assertEqual(encode_postings({0: postings}),
+                         encode_postings({0: LONG}))
+
+
+class CodecTest(unittest.TestCase):
+    """
+    Tests postings with compressed blocks.
+    """
+    def codecs(self):
+        """
+        Returns the compressing codecs available.
+        """
+        return [codec for codec in CODECS[1:]
+                if codec != "lzma" or lenin_postings.lzma is not None]
+
+    def test_blocks(self):
+        data = encode_positions(LONG)
+        for codec in self.codecs():
+            self.assertEqual(decompress_block(codec,
+                                              compress_block(codec, data)),
+                             data)
+        self.assertEqual(compress_block("varint", data), data)
+
+    def test_round_trip(self):
+        postings = {0: LONG, 3: LONG[:MIN_COMPRESSED],
+                    5: LONG[:MIN_COMPRESSED - 1]}
+        for codec in self.codecs():
+            data = encode_postings(postings, codec)
+            self.assertEqual(data[:2], bytes([4, CODECS.index(codec)]))
+            decoded = decode_postings(data)
+            self.assertEqual(decoded, postings)
+            self.assertEqual(decoded[3].codec, codec)
+            # short lists are not compressed
+            self.assertEqual(decoded[5].codec, "varint")
+            self.assertEqual(decoded[5].packed,
+                             encode_positions(LONG[:MIN_COMPRESSED - 1]))
+            self.assertEqual(encode_postings(decoded, codec), data)
+            self.assertEqual(encode_postings(decoded),
+                             encode_postings(postings))
+
+    def test_compressed(self):
+        long = [Position(line, 0, 3) for line in range(1000)]
+        size = len(encode_postings({0: long}))
+        for codec in self.codecs():
+            self.assertLess(len(encode_postings({0: long}, codec)), size / 2)
+
+    def test_on_lines_decompresses_blocks(self):
+        postings = decode_postings(encode_postings({0: LONG}, "zlib"))[0]
+        self.assertEqual(postings.on_lines([14, 98]),
+                         {14: LONG[70:80], 98: LONG[490:]})
+        self.assertIsNone(postings._data)
+        self.assertEqual(postings.data, encode_positions(LONG))
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            encode_postings({0: LONG}, "zip")
+        with self.assertRaises(ValueError):
+            decode_postings(b"\x04\x09\x00")
+
+
+class EncodeOffsetsTest(unittest.TestCase):
+    """
+    Tests functions encode_offsets and decode_offsets.
+    """
+    def test_round_trip(self):
+        offsets = [0, 10, 11, 300, 70000, 70000]
+        data = encode_offsets(offsets)
+        self.assertEqual(len(data), 9)
+        self.assertEqual(list(decode_offsets(data)), offsets)
+
+    def test_empty(self):
+        self.assertEqual(encode_offsets([]), b"")
+        self.assertEqual(list(decode_offsets(b"")), [])
+
+
+class TermStatsTest(unittest.TestCase):
+    """
+    Tests class TermStats.
+    """
+    def test_from_postings(self):
+        stats = TermStats.from_postings({3: POSITIONS, 0: POSITIONS[:1]})
+        self.assertEqual(stats.counts, {3: 5, 0: 1})
+        self.assertEqual(stats.documents, 2)
+        self.assertEqual(stats.occurrences, 6)
+
+    def test_round_trip(self):
+        stats = TermStats({300: 2, 2: 70000, 5: 1})
+        data = stats.encode()
+        self.assertEqual(len(data), 9)
+        self.assertEqual(TermStats.decode(data), stats)
+        self.assertEqual(TermStats.decode(b""), TermStats({}))
+
+
+class DocumentTableTest(unittest.TestCase):
+    """
+    Tests class DocumentTable.
+    """
+    def setUp(self):
+        self.shelf = shelve.open("test_db")
+        self.docs = DocumentTable(self.shelf)
+
+    def test_add(self):
+        self.assertEqual(self.docs.add("test.txt"), 0)
+        self.assertEqual(self.docs.add("test1.txt", size=10), 1)
+        self.assertEqual(self.docs.add("test.txt"), 0)
+        self.assertEqual(len(self.docs), 2)
+        self.assertEqual(list(self.docs), ["test.txt", "test1.txt"])
+        self.assertEqual(self.docs.get_id("test1.txt"), 1)
+        self.assertIsNone(self.docs.get_id("absent.txt"))
+        self.assertEqual(self.docs.path(1), "test1.txt")
+
+    def test_transient_id(self):
+        self.docs.add("test.txt")
+        self.assertEqual(self.docs.transient_id("test.txt"), 0)
+        self.assertEqual(self.docs.transient_id("old.txt"), -1)
+        self.assertEqual(self.docs.transient_id("old1.txt"), -2)
+        self.assertEqual(self.docs.transient_id("old.txt"), -1)
+        self.assertEqual(self.docs.path(-2), "old1.txt")
+        self.assertIsNone(self.docs.get_id("old.txt"))
+        self.assertEqual(len(self.docs), 1)
+        self.assertEqual(self.docs.add("old.txt"), 1)
+        self.assertEqual(self.docs.transient_id("old.txt"), 1)
+
+    def test_metadata(self):
+        self.docs.add("test.txt", size=10, lines=2)
+        self.docs.add("test.txt", size=12)
+        self.assertEqual(self.docs.metadata("test.txt"),
+                         {"path": "test.txt", "size": 12, "lines": 2})
+        self.assertEqual(self.docs.metadata(0), self.docs.metadata("test.txt"))
+        with self.assertRaises(KeyError):
+            self.docs.metadata("absent.txt")
+
+    def test_terms(self):
+        self.docs.add("test.txt", size=10)
+        self.assertIsNone(self.docs.terms("test.txt"))
+        self.docs.set_terms(0, {"b", "a"})
+        self.assertEqual(self.docs.terms("test.txt"), ["a", "b"])
+
+    def test_line_offsets(self):
+        self.docs.add("test.txt", size=10)
+        self.assertIsNone(self.docs.line_offsets(0))
+        self.docs.set_line_offsets("test.txt", [0, 4, 9])
+        self.assertEqual(list(self.docs.line_offsets(0)), [0, 4, 9])
+
+    def test_reset(self):
+        self.docs.add("test.txt", size=10)
+        self.docs.set_terms(0, ["a"])
+        self.docs.set_line_offsets(0, [0])
+        self.assertTrue(self.docs.is_indexed("test.txt"))
+        self.docs.reset("test.txt")
+        self.assertFalse(self.docs.is_indexed(0))
+        self.assertIsNone(self.docs.terms(0))
+        self.assertIsNone(self.docs.line_offsets(0))
+        self.assertEqual(self.docs.get_id("test.txt"), 0)
+
+    def test_persistent(self):
+        self.docs.add("test.txt")
+        self.docs.add("test1.txt", size=10)
+        self.shelf.close()
+        self.shelf = shelve.open("test_db")
+        docs = DocumentTable(self.shelf)
+        self.assertEqual(docs.get_id("test1.txt"), 1)
+        self.assertEqual(docs.metadata(1)["size"], 10)
+
+    def tearDown(self):
+        self.shelf.close()
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+
+
+class PostingsDBTest(unittest.TestCase):
+    """
+    Tests class PostingsDB.
+    """
+    def setUp(self):
+        self.db = PostingsDB("test_db")
+
+    def test_set_get(self):
+        self.db["test"] = {"test.txt": POSITIONS}
+        self.assertEqual(self.db["test"], {"test.txt": POSITIONS})
+        self.assertEqual(self.db.encoded("test"),
+                         encode_postings({0: POSITIONS}))
+        self.assertIsNone(self.db.encoded("absent"))
+
+    def test_meta_keys(self):
+        self.db["test"] = {"test.txt": POSITIONS}
+        self.db[META_PREFIX + "meta"] = {"value": 1}
+        self.assertEqual(self.db[META_PREFIX + "meta"], {"value": 1})
+        self.assertEqual(list(self.db), ["test"])
+        self.assertEqual(len(self.db), 1)
+        self.assertIn(META_PREFIX + "meta", self.db)
+
+    def test_extend(self):
+        first = self.db.docs.add("test.txt")
+        second = self.db.docs.add("test1.txt")
+        self.db.extend("test", {first: POSITIONS[:2]})
+        self.db.extend("test", {first: POSITIONS[2:],
+                                second: POSITIONS[:1]})
+        self.assertEqual(self.db["test"], {"test.txt": POSITIONS,
+                                           "test1.txt": POSITIONS[:1]})
+
+    def test_doc_postings(self):
+        self.db["test"] = {"test.txt": POSITIONS, "test1.txt": POSITIONS}
+        self.db["case"] = {"test1.txt": POSITIONS[:1]}
+        self.assertEqual(self.db.doc_postings("test"),
+                         {0: POSITIONS, 1: POSITIONS})
+        self.assertEqual(self.db.doc_postings("case"), {1: POSITIONS[:1]})
+        self.assertEqual(self.db.doc_postings("absent"), {})
+
+    def test_remove_document(self):
+        self.db["test"] = {"test.txt": POSITIONS, "test1.txt": POSITIONS}
+        self.db["case"] = {"test.txt": POSITIONS}
+        self.db.docs.set_terms("test.txt", ["test", "case"])
+        self.db.remove_document("test.txt")
+        self.assertEqual(dict(self.db), {"test": {"test1.txt": POSITIONS}})
+        self.assertIsNone(self.db.docs.terms("test.txt"))
+
+    def test_remove_document_without_terms(self):
+        self.db["test"] = {"test.txt": POSITIONS, "test1.txt": POSITIONS}
+        self.db["case"] = {"test.txt": POSITIONS}
+        self.db.remove_document(0)
+        self.assertEqual(dict(self.db), {"test": {"test1.txt": POSITIONS}})
+
+    def test_delete(self):
+        self.db["test"] = {"test.txt": POSITIONS}
+        del self.db["test"]
+        self.assertNotIn("test", self.db)
+        self.assertIsNone(self.db.term_stats("test"))
+
+    def test_term_stats(self):
+        self.db["test"] = {"test.txt": POSITIONS, "test1.txt": POSITIONS[:2]}
+        self.assertEqual(self.db.term_stats("test"), TermStats({0: 5, 1: 2}))
+        self.db.extend("test", {0: POSITIONS[:1], 2: POSITIONS[:3]})
+        self.assertEqual(self.db.term_stats("test"),
+                         TermStats({0: 6, 1: 2, 2: 3}))
+        self.db.docs.set_terms(1, ["test"])
+        self.db.remove_document(1)
+        self.assertEqual(self.db.term_stats("test"), TermStats({0: 6, 2: 3}))
+        self.assertIsNone(self.db.term_stats("absent"))
+        self.assertEqual(list(self.db), ["test"])
+
+    def test_term_stats_without_stored_stats(self):
+        self.db["test"] = {"test.txt": POSITIONS}
+        self.db.store.delete(STATS_PREFIX + "test")
+        self.assertEqual(self.db.term_stats("test"), TermStats({0: 5}))
+
+    def test_match_terms(self):
+        for term in ("болконский", "болконская", "князь", "ростов"):
+            self.db[term] = {"test.txt": POSITIONS}
+        del self.db["ростов"]
+        self.assertEqual(self.db.match_terms("болк*"),
+                         ["болконская", "болконский"])
+        self.assertEqual(self.db.match_terms("*ь"), ["князь"])
+        self.assertEqual(self.db.match_terms("*", limit=1), ["болконская"])
+        self.db.close()
+        self.assertTrue(os.path.exists("test_db.terms"))
+        self.db = PostingsDB("test_db")
+        self.assertEqual(self.db.match_terms("*"),
+                         ["болконская", "болконский", "князь"])
+
+    def test_codec(self):
+        self.assertEqual(self.db.codec, "varint")
+        self.db.set_codec("zlib")
+        self.db["test"] = {"test.txt": LONG}
+        self.assertEqual(self.db.encoded("test")[:2], b"\x04\x01")
+        self.db.close()
+        self.db = PostingsDB("test_db")
+        self.assertEqual(self.db.codec, "zlib")
+        self.assertEqual(self.db["test"], {"test.txt": LONG})
+        with self.assertRaises(ValueError):
+            self.db.set_codec("zip")
+
+    def test_dictionary_is_built(self):
+        self.db["князь"] = {"test.txt": POSITIONS}
+        self.db[META_PREFIX + "meta"] = {"value": 1}
+        self.db.close()
+        # databases written without the dictionary
+        os.remove("test_db.terms")
+        self.db = PostingsDB("test_db")
+        self.assertEqual(self.db.match_terms("*"), ["князь"])
+
+    def test_pickled_postings(self):
+        self.db.close()
+        with shelve.open("test_db") as shelf:
+            shelf["test"] = {"test.txt": POSITIONS}
+        self.db = PostingsDB("test_db")
+        self.check_pickled_postings()
+
+    def check_pickled_postings(self):
+        self.assertEqual(self.db["test"], {"test.txt": POSITIONS})
+        # reading does not add the path to the document table
+        self.assertEqual(self.db.doc_postings("test"), {-1: POSITIONS})
+        self.assertEqual(self.db.docs.path(-1), "test.txt")
+        self.assertEqual(self.db.term_stats("test").counts, {-1: 5})
+        self.assertEqual(len(self.db.docs), 0)
+        self.assertNotIn(DOCS_KEY, self.db)
+        self.assertEqual(self.db.upgrade(), 1)
+        self.assertEqual(self.db.doc_postings("test"), {0: POSITIONS})
+        self.assertEqual(self.db.encoded("test")[:1], b"\x03")
+        self.assertEqual(self.db.docs.terms("test.txt"), ["test"])
+        self.assertEqual(self.db.upgrade(), 0)
+
+    def tearDown(self):
+        self.db.close()
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+
+
+class SqlitePostingsDBTest(PostingsDBTest):
+    """
+    Tests class PostingsDB stored in a SQLite database.
+    """
+    def setUp(self):
+        self.db = PostingsDB("test_db", storage="sqlite")
+
+    def test_pickled_postings(self):
+        self.db.store.put("test", pickle.dumps({"test.txt": POSITIONS}))
+        self.check_pickled_postings()
+
+    def test_persistent(self):
+        self.db["test"] = {"test.txt": POSITIONS}
+        self.db.close()
+        self.db = PostingsDB("test_db")
+        self.assertEqual(self.db["test"], {"test.txt": POSITIONS})
+        self.assertEqual(self.db.docs.get_id("test.txt"), 0)
+
+    def tearDown(self):
+        self.db.close()
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db"):
+                os.remove(filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,9 +4,12 @@ rpresentation of search results.
 """
 import os
 import re
-import shelve
 from lenin_tokenizer import Tokenizer
-from lenin_indexer import Position
+from lenin_postings import Position, META_PREFIX
+from lenin_segments import open_index
+from lenin_indexer import stored_normalizer
+from lenin_normalizer import Normalizer
+from lenin_terms import EXPANSION_LIMIT
 
 
 class Context(object):
@@ -38,7 +41,7 @@ class Context(object):
         self.end = end
 
     @classmethod
-    def from_file(cls, filename, position, context_size):
+    def from_file(cls, filename, position, context_size, offsets=None):
         """
         Creates an instance of class Context from file.
 
@@ -48,21 +51,32 @@ class Context(object):
             context_size (int): size of the context, number of words to the
                                 left and to the right of the word to include
                                 to the context window
+            offsets (array): byte offsets of the lines of the file as stored
+                by the indexer (DocumentTable.line_offsets). If given, the
+                line is read by seeking to its offset, otherwise the file is
+                read from the start up to the line.
         Raises:
             ValueError: in case any of the arguments is of the wrong type.
         """
-        tok = Tokenizer()
+        tok = Tokenizer(backend="regex")
         if not (isinstance(filename, str)
                 and isinstance(position, Position)
                 and isinstance(context_size, int)):
             raise ValueError (filename, position, context_size)
 
         with open(filename) as f:
-            for i, line in enumerate(f):
-                if i == position.line:
-                    break
-        if i != position.line:
-            raise ValueError('Wrong line number')
+            if offsets is not None:
+                if not 0 <= position.line < len(offsets):
+                    raise ValueError('Wrong line number')
+                f.seek(offsets[position.line])
+                line = f.readline()
+            else:
+                i = -1
+                for i, line in enumerate(f):
+                    if i == position.line:
+                        break
+                if i != position.line:
+                    raise ValueError('Wrong line number')
         line = line.strip("\n")
         positions = [position]        
         right_context = line[position.start:]
@@ -155,18 +169,82 @@ class SearchEngine(object):
     initialisation.
 
     Attributes:
-        db (shelf): database to search against.
+        db (PostingsDB or SegmentedIndex): database to search against.
+        normalizer (Normalizer): normalizer applied to the words of queries
+            or None.
     """
-    def __init__(self, path):
+    def __init__(self, path, normalizer=None, storage=None):
         """
         Initialize itself.
 
         Args:
-            path (str): path to database
+            path (str): path to database, a directory of a segmented index
+                is detected
+            normalizer (Normalizer): normalizer of the words of queries. By
+                default the normalizer the database was built with is used.
+            storage (str): storage backend of the database, see
+                open_storage. By default it is detected.
+
+        Raises:
+            ValueError: in case the database was built with another
+                normalizer.
         """
-        self.db = shelve.open(path)
-        self.tok = Tokenizer()
-        
+        self.db = open_index(path, storage=storage)
+        self.tok = Tokenizer(backend="regex")
+        self.normalizer = stored_normalizer(self.db, normalizer)
+
+    def _term(self, word):
+        """
+        Returns the term a word of a query is searched by.
+        """
+        if self.normalizer is None:
+            return word
+        return self.normalizer(word)
+
+    def _pattern(self, word):
+        """
+        Returns the wildcard pattern a word of a query with "*" is matched
+        by. Parts of the word are normalized without stemming, as a part of
+        a word has no ending to strip.
+        """
+        if self.normalizer is None:
+            return word
+        config = dict(self.normalizer.config(), stem=False)
+        normalizer = Normalizer.from_config(config, cache_size=0)
+        return "*".join(map(normalizer, word.split("*")))
+
+    def _wildcard_words(self, chunk):
+        """
+        Divides a word of a query with "*" into the words the indexer would
+        make of it: alphabetic and digit runs of the tokenizer, every run
+        together with the "*" next to it. A "*" between two runs joins them
+        into one word, other characters and changes of type separate words,
+        e.g. "Анна-Павл*" is divided into "Анна" and "Павл*".
+
+        Returns:
+            List of words, the ones with "*" are patterns.
+        """
+        words = []
+        word = ""
+        for token in self.tok.generate_with_type(chunk):
+            if token.tp in "ad":
+                if word and not word.endswith("*"):
+                    words.append(word)
+                    word = ""
+                word += token.s
+            elif token.s.strip("*"):
+                # a separator, the stars around it stay with the runs
+                if token.s.startswith("*") and not word.endswith("*"):
+                    word += "*"
+                if word.strip("*"):
+                    words.append(word)
+                word = "*" if token.s.endswith("*") else ""
+            elif not word.endswith("*"):
+                word += "*"
+        if word.strip("*") or (not words and word):
+            words.append(word)
+        return words
+
     def simple_search(self, query):
         """
         Performs simple search against the database. Returns a dictionary of
@@ -176,15 +254,19 @@ class SearchEngine(object):
             query (str): search query
 
         Returns:
-            Dictionary of files and positions in format {filename: [positions]}
+            Dictionary of files and positions in format {filename: [positions]}.
+            Positions of a file are a PostingList, they are decoded when they
+            are accessed.
 
         Raises:
             ValueError: in case query is not str.
         """
         if not isinstance(query, str):
             raise ValueError
+        if query.startswith(META_PREFIX):
+            return {}
 
-        return self.db.get(query, {})
+        return self.db.get(self._term(query), {})
 
     def multiword_search(self, query):
         """
@@ -206,25 +288,177 @@ class SearchEngine(object):
         if not isinstance(query, str):
             raise ValueError
         
-        tokenizer = Tokenizer()
         query = list(self.tok.generate_AD(query))
-        simple_search_results = []
-        for word in query:
-            simple_search_results.append(set(self.simple_search(word.s)))
+        # every term is read from the database once, files are intersected
+        # as docIDs and positions are decoded only for the files that
+        # contain all the words
+        entries = [self.db.doc_postings(self._term(word.s)) for word in query]
+        if not entries:
+            return {}
 
-        if not simple_search_results:
+        docs_found = set(entries[0])
+        for entry in entries[1:]:
+            docs_found.intersection_update(entry)
+        final_result = {}
+        for doc_id in sorted(docs_found):
+            positions = final_result[self.db.docs.path(doc_id)] = []
+            for entry in entries:
+                positions.extend(entry[doc_id])
+            positions.sort()
+        return final_result
+
+    def wildcard_search(self, query, limit=EXPANSION_LIMIT):
+        """
+        Performs a search of a multiword query, in which words may contain
+        "*" matching any sequence of characters, against the database.
+        Returns a dictionary of files that contain all the words of the
+        query, a word with "*" is found in a file if any of its terms is.
+
+        Words with "*" are expanded into terms by the sorted term dictionary
+        (match_terms of the database), the terms of a word are read once and
+        their files are unioned as docIDs.
+
+        Args:
+            query (str): search query, e.g. "Болкон* княж*"
+            limit (int): maximal number of terms a word is expanded to, the
+                first terms in sorted order are taken.
+
+        Returns:
+            Dictionary of files and positions of all the words of the query
+            in a given file in the format {filename: [positions of all words]}
+
+        Raises:
+            ValueError: in case query is not str.
+        """
+        if not isinstance(query, str):
+            raise ValueError
+
+        # terms of every word of the query
+        words = []
+        for chunk in query.split():
+            if "*" in chunk:
+                for word in self._wildcard_words(chunk):
+                    if "*" in word:
+                        words.append(self.db.match_terms(self._pattern(word),
+                                                         limit))
+                    else:
+                        words.append([self._term(word)])
+            else:
+                words.extend([self._term(word.s)]
+                             for word in self.tok.generate_AD(chunk))
+        if not words:
             return {}
-        
-        files_found = simple_search_results[1]
-        for result in simple_search_results:
-            files_found.intersection_update(result)
+        # every word is a dictionary {docID: [PostingList of every term]}
+        entries = []
+        for terms in words:
+            union = {}
+            for term in terms:
+                for doc_id, positions in self.db.doc_postings(term).items():
+                    union.setdefault(doc_id, []).append(positions)
+            entries.append(union)
+
+        docs_found = set(entries[0])
+        for entry in entries[1:]:
+            docs_found.intersection_update(entry)
+        final_result = {}
+        for doc_id in sorted(docs_found):
+            positions = final_result[self.db.docs.path(doc_id)] = []
+            for entry in entries:
+                for postings in entry[doc_id]:
+                    positions.extend(postings)
+            positions.sort()
+        return final_result
+
+    def line_search(self, query):
+        """
+        Performs a search of a multiword query against the database. Returns
+        a dictionary of files and positions of the words of the query in the
+        lines that contain all of them.
+
+        Lines are intersected starting with the rarest word: positions of
+        more frequent words are looked up in its lines only, skip entries of
+        their posting lists allow to jump over the rest, so a stop word does
+        not cost more than a rare word.
+
+        Args:
+            query (str): search query
+
+        Returns:
+            Dictionary of files and positions of all the words of the query
+            in lines that contain all of them in the format
+            {filename: [positions of all words]}, files without such lines
+            are omitted.
+
+        Raises:
+            ValueError: in case query is not str.
+        """
+        if not isinstance(query, str):
+            raise ValueError
+
+        query = list(self.tok.generate_AD(query))
+        entries = [self.db.doc_postings(self._term(word.s)) for word in query]
+        if not entries:
+            return {}
+
+        docs_found = set(entries[0])
+        for entry in entries[1:]:
+            docs_found.intersection_update(entry)
         final_result = {}
-        for f in files_found:
-            for word in query:
-                final_result.setdefault(f, []).extend(self.db[word.s][f])
-            final_result[f].sort()
+        for doc_id in sorted(docs_found):
+            lists = sorted((entry[doc_id] for entry in entries), key=len)
+            found = [{}]
+            for position in lists[0]:
+                found[0].setdefault(position.line, []).append(position)
+            lines = sorted(found[0])
+            for postings in lists[1:]:
+                if not lines:
+                    break
+                found.append(postings.on_lines(lines))
+                lines = [line for line in lines if line in found[-1]]
+            if not lines:
+                continue
+            positions = final_result[self.db.docs.path(doc_id)] = []
+            for line in lines:
+                for entry in found:
+                    positions.extend(entry[line])
+            positions.sort()
         return final_result
 
+    def count(self, query):
+        """
+        Counts hits of a multiword query using the statistics of terms,
+        positions are not read. Files and hits are the same as those of
+        multiword_search.
+
+        Args:
+            query (str): search query
+
+        Returns:
+            Dictionary of files that contain all the words of the query and
+            numbers of occurrences of the words in them in the format
+            {filename: hits}.
+
+        Raises:
+            ValueError: in case query is not str.
+        """
+        if not isinstance(query, str):
+            raise ValueError
+
+        counts = []
+        for word in self.tok.generate_AD(query):
+            stats = self.db.term_stats(self._term(word.s))
+            if stats is None:
+                return {}
+            counts.append(stats.counts)
+        if not counts:
+            return {}
+        docs_found = set(counts[0])
+        for entry in counts[1:]:
+            docs_found.intersection_update(entry)
+        path = self.db.docs.path
+        return {path(doc_id): sum(entry[doc_id] for entry in counts)
+                for doc_id in sorted(docs_found)}
+
     def get_context_windows(self,
                             input_dict,
                             context_size=3):
@@ -249,14 +483,32 @@ class SearchEngine(object):
         contexts_dict = {}
         
         for f, positions in input_dict.items():
+            offsets = self._line_offsets(f)
             for position in positions:
-                context = Context.from_file(f, position, context_size)
+                context = Context.from_file(f, position, context_size,
+                                            offsets)
                 contexts_dict.setdefault(f, []).append(context)
 
         joined_contexts_dict = self.join_contexts(contexts_dict)
 
         return joined_contexts_dict
 
+    def _line_offsets(self, path):
+        """
+        Returns byte offsets of the lines of an indexed file or None if they
+        are not stored or the file has changed in size since it was indexed.
+        """
+        docs = self.db.docs
+        if docs.get_id(path) is None:
+            return None
+        metadata = docs.metadata(path)
+        try:
+            if os.path.getsize(path) != metadata.get("size"):
+                return None
+        except OSError:
+            return None
+        return docs.line_offsets(path)
+
     def join_contexts(self, input_dict):
         """
         This method joins intersecting windows in a dictionary of files and
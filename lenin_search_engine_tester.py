@@ -1,8 +1,11 @@
 import unittest
 import os
 import shelve
+import shutil
 from lenin_search_engine import SearchEngine, Context
-from lenin_indexer import Position
+from lenin_indexer import Position, Indexer
+from lenin_normalizer import Normalizer
+from lenin_storage import SqliteBackend
 
 
 # The test files are following:
@@ -127,6 +130,12 @@ class MultiwordSearchTest(unittest.TestCase):
                                   'test1.txt': [Position(0, 13, 15),
                                                 Position(0, 16, 20)]})
         
+    def test_one_word(self):
+        result = self.se.multiword_search("test")
+        self.assertEqual(result, {'test.txt': [Position(0, 10, 14),
+                                               Position(1, 9, 13)],
+                                  'test1.txt': [Position(0, 16, 20)]})
+
     def test_far_words(self):
         result = self.se.multiword_search("cat animals")
         self.assertEqual(result, {'test2.txt': [Position(0, 0, 3),
@@ -138,6 +147,299 @@ class MultiwordSearchTest(unittest.TestCase):
             if filename.startswith("test_db."):
                 os.remove(filename)
 
+class WildcardSearchTest(unittest.TestCase):
+    """
+    Tests method wildcard_search of SearchEngine.
+    """
+    def setUp(self):
+        self.se = SearchEngine("test_db")
+        self.se.db.update(DB)
+
+    def test_wrong_input_error(self):
+        with self.assertRaises(ValueError):
+            self.se.wildcard_search(123)
+
+    def test_empty_input(self):
+        self.assertEqual(self.se.wildcard_search(""), {})
+        self.assertEqual(self.se.wildcard_search("!!!"), {})
+
+    def test_absent_key(self):
+        self.assertEqual(self.se.wildcard_search("tur*"), {})
+        self.assertEqual(self.se.wildcard_search("te* turtle"), {})
+
+    def test_prefix(self):
+        self.assertEqual(self.se.wildcard_search("te*"),
+                         {'test.txt': [Position(0, 10, 14),
+                                       Position(0, 15, 19),
+                                       Position(1, 9, 13)],
+                          'test1.txt': [Position(0, 8, 12),
+                                        Position(0, 16, 20)]})
+
+    def test_wildcards_and_words(self):
+        self.assertEqual(self.se.wildcard_search("*ine t*t, another"),
+                         {'test1.txt': [Position(0, 0, 7), Position(0, 8, 12),
+                                        Position(0, 16, 20),
+                                        Position(0, 32, 38)]})
+        self.assertEqual(self.se.wildcard_search("is search"),
+                         self.se.multiword_search("is search"))
+
+    def test_several_tokens(self):
+        self.assertEqual(self.se.wildcard_search("красные-бел*"),
+                         {'test3.txt': [Position(0, 11, 18),
+                                        Position(0, 25, 30)]})
+        self.assertEqual(self.se.wildcard_search("te*_search"),
+                         self.se.wildcard_search("te* search"))
+        self.assertEqual(self.se._wildcard_words("Анна-Павл*"),
+                         ["Анна", "Павл*"])
+        self.assertEqual(self.se._wildcard_words("ab12*"), ["ab", "12*"])
+        self.assertEqual(self.se._wildcard_words("*ab*12,*"), ["*ab*12"])
+        self.assertEqual(self.se._wildcard_words("**"), ["*"])
+
+    def test_limit(self):
+        self.assertEqual(self.se.wildcard_search("t*", limit=1),
+                         {'test.txt': [Position(0, 10, 14),
+                                       Position(1, 9, 13)],
+                          'test1.txt': [Position(0, 16, 20)]})
+
+    def tearDown(self):
+        del self.se
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+
+
+class LineSearchTest(unittest.TestCase):
+    """
+    Tests method line_search of SearchEngine.
+    """
+    def setUp(self):
+        self.se = SearchEngine("test_db")
+        self.se.db.update(DB)
+
+    def test_wrong_input_error(self):
+        with self.assertRaises(ValueError):
+            self.se.line_search(123)
+
+    def test_empty_input(self):
+        self.assertEqual(self.se.line_search(""), {})
+        self.assertEqual(self.se.line_search("!!!"), {})
+
+    def test_absent_key(self):
+        self.assertEqual(self.se.line_search("turtle test"), {})
+
+    def test_same_line(self):
+        self.assertEqual(self.se.line_search("it engine"),
+                         {'test.txt': [Position(1, 0, 2),
+                                       Position(1, 21, 27)]})
+        self.assertEqual(self.se.line_search("is test"),
+                         {'test.txt': [Position(0, 5, 7), Position(0, 10, 14),
+                                       Position(1, 3, 5),
+                                       Position(1, 9, 13)]})
+
+    def test_different_lines(self):
+        self.assertEqual(self.se.line_search("this engine"), {})
+        self.assertEqual(self.se.line_search("cat dog"), {})
+
+    def test_frequent_word(self):
+        # the frequent word has skip entries, the rare one is in two lines
+        frequent = [Position(line, start, start + 1)
+                    for line in range(300) for start in range(0, 10, 2)]
+        rare = [Position(7, 3, 6), Position(250, 1, 4)]
+        self.se.db["и"] = {'long.txt': frequent}
+        self.se.db["бобы"] = {'long.txt': rare}
+        self.assertEqual(self.se.line_search("бобы и"),
+                         {'long.txt': sorted(frequent[35:40] +
+                                             frequent[1250:1255] + rare)})
+
+    def tearDown(self):
+        del self.se
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+
+
+class CountTest(unittest.TestCase):
+    """
+    Tests method count of SearchEngine.
+    """
+    def setUp(self):
+        self.se = SearchEngine("test_db")
+        self.se.db.update(DB)
+
+    def test_wrong_input_error(self):
+        with self.assertRaises(ValueError):
+            self.se.count(123)
+
+    def test_empty_input(self):
+        self.assertEqual(self.se.count(""), {})
+        self.assertEqual(self.se.count("!!!"), {})
+
+    def test_absent_key(self):
+        self.assertEqual(self.se.count("turtle test"), {})
+
+    def test_count(self):
+        self.assertEqual(self.se.count("to test"),
+                         {'test.txt': 3, 'test1.txt': 2})
+        self.assertEqual(self.se.count("бобы"), {'test3.txt': 5})
+
+    def test_same_as_search(self):
+        for query in ("test", "to test", "cat animals", "бобы и", "is is"):
+            self.assertEqual(self.se.count(query),
+                             {path: len(positions) for path, positions
+                              in self.se.multiword_search(query).items()})
+
+    def test_positions_are_not_read(self):
+        self.se.db.doc_postings = None
+        self.assertEqual(self.se.count("search engine"),
+                         {'test.txt': 2, 'test1.txt': 2})
+
+    def tearDown(self):
+        del self.se
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+
+
+class SqliteSearchTest(MultiwordSearchTest):
+    """
+    Tests method multiword_search of SearchEngine against a SQLite database.
+    """
+    def setUp(self):
+        self.se = SearchEngine("test_db", storage="sqlite")
+        self.se.db.update(DB)
+
+    def test_storage(self):
+        self.assertIsInstance(self.se.db.store, SqliteBackend)
+
+    def tearDown(self):
+        self.se.db.close()
+        del self.se
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db"):
+                os.remove(filename)
+
+
+class NormalizedSearchTest(unittest.TestCase):
+    """
+    Tests search against a database built with a normalizer.
+    """
+    def setUp(self):
+        with open("test3.txt", 'w') as f:
+            f.write(TEST3)
+        indexer = Indexer("test_db", normalizer=Normalizer(stem=True))
+        indexer.index("test3.txt")
+        del indexer
+        self.se = SearchEngine("test_db")
+
+    def test_stored_normalizer(self):
+        self.assertEqual(self.se.normalizer, Normalizer(stem=True))
+
+    def test_simple_search(self):
+        result = self.se.simple_search("ПРОТИВНЫЙ")
+        self.assertEqual(result, {'test3.txt': [Position(0, 51, 60)]})
+
+    def test_meta_key(self):
+        result = self.se.simple_search("\x00normalizer")
+        self.assertEqual(result, {})
+
+    def test_multiword_search(self):
+        result = self.se.multiword_search("боб БЕЛЫЙ")
+        self.assertEqual(result, {'test3.txt': [Position(0, 19, 23),
+                                                Position(0, 25, 30),
+                                                Position(0, 31, 35),
+                                                Position(0, 38, 42),
+                                                Position(0, 61, 65),
+                                                Position(0, 76, 80)]})
+
+    def test_wildcard_search(self):
+        # parts of a word are not stemmed
+        result = self.se.wildcard_search("БОБ* противн*")
+        self.assertEqual(result, {'test3.txt': [Position(0, 19, 23),
+                                                Position(0, 31, 35),
+                                                Position(0, 38, 42),
+                                                Position(0, 51, 60),
+                                                Position(0, 61, 65),
+                                                Position(0, 76, 80)]})
+
+    def tearDown(self):
+        del self.se
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+        os.remove("test3.txt")
+
+
+class SegmentedSearchTest(unittest.TestCase):
+    """
+    Tests search against a segmented index.
+    """
+    def setUp(self):
+        for name, text in (("test.txt", TEST), ("test1.txt", TEST1)):
+            with open(name, 'w') as f:
+                f.write(text)
+        self.indexer = Indexer("test_db", segmented=True)
+        self.indexer.index("test.txt")
+        self.indexer.flush()
+        self.se = SearchEngine("test_db")
+
+    def test_simple_search(self):
+        self.assertEqual(self.se.simple_search("test"),
+                         {'test.txt': [Position(0, 10, 14),
+                                       Position(1, 9, 13)]})
+
+    def test_new_segment(self):
+        self.indexer.index("test1.txt")
+        self.indexer.flush()
+        self.assertEqual(self.se.multiword_search("to test"),
+                         {'test.txt': [Position(0, 10, 14),
+                                       Position(1, 6, 8),
+                                       Position(1, 9, 13)],
+                          'test1.txt': [Position(0, 13, 15),
+                                        Position(0, 16, 20)]})
+
+    def test_wildcard_search(self):
+        self.indexer.index("test1.txt")
+        self.indexer.flush()
+        self.assertEqual(self.se.wildcard_search("an* engi*"),
+                         {'test1.txt': [Position(0, 0, 7),
+                                        Position(0, 32, 38)]})
+
+    def test_search_to_quote(self):
+        self.assertEqual(self.se.search_to_quote("search engine", 1),
+                         {'test.txt': ['it is to test <b>search</b> '
+                                       '<b>engine</b>']})
+
+    def test_line_endings(self):
+        with open("test1.txt", 'w', newline='') as f:
+            f.write("a b\rc d\r\ne f\ng h\n")
+        self.indexer.index("test1.txt")
+        self.indexer.flush()
+        for word, line in (("d", "c d"), ("f", "e f"), ("g", "g h")):
+            result = self.se.get_context_windows(
+                self.se.multiword_search(word), 0)
+            self.assertEqual(result['test1.txt'][0].line, line)
+
+    def test_line_endings_mmap(self):
+        self.indexer.use_mmap = True
+        with open("test1.txt", 'w', newline='') as f:
+            f.write("a b\rc d\r\ne f\rg h\n")
+        self.indexer.index("test1.txt")
+        self.indexer.flush()
+        for word, line in (("d", "c d"), ("f", "e f"), ("g", "g h")):
+            result = self.se.get_context_windows(
+                self.se.multiword_search(word), 0)
+            self.assertEqual(result['test1.txt'][0].line, line)
+        self.assertEqual(self.se.search_to_quote("g", 0),
+                         {'test1.txt': ['<b>g</b> h']})
+
+    def tearDown(self):
+        self.indexer.close()
+        del self.se
+        shutil.rmtree("test_db")
+        os.remove("test.txt")
+        os.remove("test1.txt")
+
+
 class ContextFromFileTest(unittest.TestCase):
     """
     Tests from_file classmethod of class Context.
@@ -203,6 +505,20 @@ class ContextFromFileTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             Context.from_file("test.txt", Position(7, 8, 9), 2)
 
+    def test_line_offsets(self):
+        offsets = [0, len("this is a test text\n")]
+        result = Context.from_file("test.txt", Position(1, 14, 20), 2,
+                                   offsets)
+        self.assertEqual(result.line, "it is to test search engine")
+        self.assertEqual(result.start, 6)
+        self.assertEqual(result.end, 27)
+        result = Context.from_file("test.txt", Position(0, 8, 9), 0, offsets)
+        self.assertEqual(result.line, "this is a test text")
+
+    def test_line_offsets_wrong_line_number(self):
+        with self.assertRaises(ValueError):
+            Context.from_file("test.txt", Position(2, 0, 1), 2, [0, 20])
+
     def tearDown(self):
         os.remove("test.txt")
         os.remove("test1.txt")
@@ -267,6 +583,20 @@ class JoinContextWindowsTest(unittest.TestCase):
                                        TEST1, 0, 31)]}
         self.assertEqual(result, ideal)
 
+    def test_stored_line_offsets(self):
+        docs = self.se.db.docs
+        docs.add("test.txt", size=len(TEST))
+        # line 0 points to the second line to see that the offsets are used
+        docs.set_line_offsets("test.txt", [20, 20])
+        result = self.se.get_context_windows({'test.txt': [Position(0, 0, 2)]},
+                                             0)
+        self.assertEqual(result['test.txt'][0].line, TEST[20:])
+        # offsets of a file changed since indexing are not used
+        docs.add("test.txt", size=len(TEST) + 1)
+        result = self.se.get_context_windows({'test.txt': [Position(0, 0, 2)]},
+                                             0)
+        self.assertEqual(result['test.txt'][0].line, TEST[:19])
+
     def test_eq(self):
         a = Context([Position(0, 8, 9)], TEST[0:19], 8, 9)
         b = Context([Position(0, 8, 9)], TEST[0:19], 8, 9)
@@ -0,0 +1,839 @@
+"""
+This module allows to keep an index as a directory of immutable segments.
+Every batch written by the indexer becomes a new segment, small segments are
+merged into larger ones in the background, and search reads all live
+segments merging their postings.
+
+Directory of a segmented index:
+    MANIFEST - JSON with the live segments and the deleted documents,
+    meta.* - shelf with the document table and other META_PREFIX keys,
+    *.seg - segments.
+
+Segment file:
+    header: magic b"LSEG", version (1 byte), 3 zero bytes, number of terms,
+        offset of the terms and offset of the index (unsigned 64-bit
+        little-endian integers),
+    postings of the terms encoded by encode_postings, one after another,
+    terms in UTF-8 sorted in code point order, one after another, padded
+        with zero bytes to a multiple of 8,
+    index: ends of the terms within the terms section, then ends of the
+        postings within the postings section (unsigned 64-bit little-endian
+        integers, one per term).
+"""
+import heapq
+import json
+import math
+import mmap
+import os
+import shelve
+import struct
+import sys
+import threading
+from array import array
+from collections.abc import Mapping
+from itertools import groupby, islice
+from operator import itemgetter
+from lenin_postings import (PostingsDB, DocumentTable, TermStats,
+                            META_PREFIX, STATS_PREFIX, CODEC_KEY, CODECS,
+                            VARINT, encode_postings, decode_postings)
+from lenin_storage import detect_storage
+from lenin_terms import compile_pattern
+
+
+SEGMENT_MAGIC = b"LSEG"
+SEGMENT_VERSION = 1
+_HEADER = struct.Struct("<4sB3xQQQ")
+
+MANIFEST = "MANIFEST"
+META = "meta"
+# number of segments of a tier that are merged into one segment
+MERGE_FACTOR = 4
+# segments smaller than MIN_MERGE_SIZE bytes are all in the lowest tier
+MIN_MERGE_SIZE = 1 << 16
+
+
+def _little_endian(values):
+    """
+    Converts an array of integers from or to little-endian byte order.
+    """
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def write_segment(path, items):
+    """
+    Writes a segment file. The file is written under a temporary name and
+    renamed, so a segment is never seen half-written, the temporary file is
+    removed if writing fails.
+
+    Args:
+        path (str): path to the segment file.
+        items (iterable): tuples (term, encoded postings) sorted by term.
+
+    Returns:
+        Tuple (size of the file in bytes, number of terms).
+    """
+    terms = bytearray()
+    term_ends = array("Q")
+    postings_ends = array("Q")
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(bytes(_HEADER.size))
+            end = 0
+            for term, data in items:
+                f.write(data)
+                end += len(data)
+                terms += term.encode("utf-8")
+                term_ends.append(len(terms))
+                postings_ends.append(end)
+            terms_offset = _HEADER.size + end
+            terms += bytes(-len(terms) % 8)
+            f.write(terms)
+            index_offset = terms_offset + len(terms)
+            f.write(_little_endian(term_ends).tobytes())
+            f.write(_little_endian(postings_ends).tobytes())
+            f.seek(0)
+            f.write(_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION,
+                                 len(term_ends), terms_offset, index_offset))
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    return os.path.getsize(path), len(term_ends)
+
+
+class Segment(object):
+    """
+    Segment is an immutable sorted table of terms and their encoded postings
+    stored in one file. The file is memory-mapped: opening a segment takes
+    the same time whatever its size, terms, the index and postings are paged
+    in by the operating system when they are looked up and the pages are
+    shared by all the processes that read the segment.
+
+    Attributes:
+        path (str): path to the segment file.
+        seq (int): sequence number, segments with greater numbers hold
+            newer postings.
+        size (int): size of the file in bytes.
+    """
+    def __init__(self, path, seq):
+        """
+        Opens a segment file.
+
+        Args:
+            path (str): path to the segment file.
+            seq (int): sequence number of the segment.
+
+        Raises:
+            ValueError: in case the file is not a segment.
+        """
+        self.path = path
+        self.seq = seq
+        self._mm = None
+        self._index = None
+        with open(path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            if self.size < _HEADER.size:
+                raise ValueError("Not a segment: " + path)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, terms_offset, index_offset = \
+            _HEADER.unpack_from(self._mm)
+        if (magic != SEGMENT_MAGIC or version != SEGMENT_VERSION or
+                index_offset + 16 * count != self.size):
+            self.close()
+            raise ValueError("Not a segment: " + path)
+        self._terms_offset = terms_offset
+        if sys.byteorder == "little":
+            self._index = memoryview(self._mm)[index_offset:].cast("Q")
+        else:
+            self._index = _little_endian(array("Q", self._mm[index_offset:]))
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def _term(self, i):
+        """
+        Returns the i-th term of the segment in UTF-8.
+        """
+        index = self._index
+        offset = self._terms_offset
+        return self._mm[offset + (index[i - 1] if i else 0):
+                        offset + index[i]]
+
+    def _postings(self, i):
+        """
+        Returns encoded postings of the i-th term of the segment.
+        """
+        index = self._index
+        i += self._count
+        start = _HEADER.size + (index[i - 1] if i > self._count else 0)
+        return self._mm[start:_HEADER.size + index[i]]
+
+    def _lower_bound(self, key):
+        """
+        Returns the number of the first term not less than a key in UTF-8.
+        """
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, term):
+        """
+        Returns the number of a term in the segment or None if it is absent.
+        """
+        key = term.encode("utf-8")
+        lo = self._lower_bound(key)
+        if lo < len(self) and self._term(lo) == key:
+            return lo
+        return None
+
+    def get(self, term):
+        """
+        Returns encoded postings of a term or None if it is absent.
+        """
+        i = self.find(term)
+        return None if i is None else self._postings(i)
+
+    def terms(self, prefix=""):
+        """
+        Generator.
+        Yields terms of the segment in sorted order.
+
+        Args:
+            prefix (str): only the terms that start with it are yielded, they
+                are found by binary search.
+        """
+        key = prefix.encode("utf-8")
+        for i in range(self._lower_bound(key) if key else 0, len(self)):
+            term = self._term(i)
+            if not term.startswith(key):
+                break
+            yield term.decode("utf-8")
+
+    def __iter__(self):
+        """
+        Iterates over tuples (term, encoded postings) in sorted order.
+        """
+        for i in range(len(self)):
+            yield self._term(i).decode("utf-8"), self._postings(i)
+
+    def close(self):
+        """
+        Unmaps the file. Does nothing if it is already closed.
+        """
+        if isinstance(self._index, memoryview):
+            self._index.release()
+        self._index = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def __del__(self):
+        # segments removed by a merge are closed when nobody reads them
+        if getattr(self, "_mm", None) is not None:
+            self.close()
+
+
+def _stat_key(stat):
+    """
+    Returns what identifies a version of the manifest: it is replaced by a
+    new file on every change.
+    """
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _combine(postings, seq, data, deleted):
+    """
+    Adds postings of a term from a segment to postings of the term from
+    older segments, skipping documents deleted after the segment was written.
+    Positions of a document found in several segments are joined and sorted.
+    """
+    for doc_id, positions in decode_postings(data).items():
+        if deleted.get(doc_id, -1) >= seq:
+            continue
+        if doc_id in postings:
+            postings[doc_id] = sorted(list(postings[doc_id]) +
+                                      list(positions))
+        else:
+            postings[doc_id] = positions
+    return postings
+
+
+def _records(segment):
+    """
+    Generator.
+    Yields tuples (term, sequence number, encoded postings) of a segment in
+    sorted order.
+    """
+    seq = segment.seq
+    for term, data in segment:
+        yield term, seq, data
+
+
+class SegmentedIndex(Mapping):
+    """
+    SegmentedIndex is a database of postings stored as a directory of
+    immutable segments. It reads like PostingsDB: {term: {path: positions}}
+    plus doc_postings and the document table docs.
+
+    Postings are added with extend and written into a new segment by sync.
+    Postings of a removed document stay in the segments and are skipped
+    until the segments are merged: the manifest keeps the sequence number of
+    the newest segment at the time the document was removed, so postings of
+    the document written later stay visible. The removal is forgotten once
+    merges have dropped all the postings written before it.
+
+    After every new segment the tiered merge policy is applied: segments are
+    divided into tiers by size (every tier is merge_factor times larger than
+    the previous one) and merge_factor segments of a tier are merged into
+    one. Merges run in a background thread if background is True.
+
+    Attributes:
+        path (str): path to the directory.
+        docs (DocumentTable): docIDs and metadata of the documents.
+        merge_factor (int): number of segments of a tier merged at once.
+        background (bool): whether merges run in a background thread.
+        codec (str): codec segments are written with, see set_codec.
+    """
+    def __init__(self, path, merge_factor=MERGE_FACTOR, background=True):
+        """
+        Opens the index, creating the directory if needed.
+
+        Args:
+            path (str): path to the directory.
+            merge_factor (int): number of segments of a tier merged at once.
+            background (bool): run merges in a background thread.
+
+        Raises:
+            ValueError: in case merge_factor is less than 2.
+        """
+        if not (isinstance(merge_factor, int) and merge_factor >= 2):
+            raise ValueError(merge_factor)
+        self.path = path
+        self.merge_factor = merge_factor
+        self.background = background
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._merger = None
+        self._pending = {}
+        self._segments = []
+        self._deleted = {}
+        self._counter = 0
+        self._manifest_stat = None
+        self._meta = None
+        self._load()
+        if not is_segmented(path):
+            self._write_manifest()
+
+    def _manifest_path(self):
+        return os.path.join(self.path, MANIFEST)
+
+    def _load(self):
+        """
+        Reads the manifest and opens the live segments, segments that are
+        already open are kept.
+        """
+        manifest_path = self._manifest_path()
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+                self._manifest_stat = _stat_key(os.fstat(f.fileno()))
+        except FileNotFoundError:
+            manifest = {"counter": 0, "segments": [], "deleted": {}}
+        opened = {segment.path: segment for segment in self._segments}
+        self._segments = []
+        for name, seq in manifest["segments"]:
+            path = os.path.join(self.path, name)
+            segment = opened.get(path)
+            if segment is None:
+                segment = Segment(path, seq)
+            self._segments.append(segment)
+        self._counter = manifest["counter"]
+        self._deleted = {int(doc_id): seq
+                         for doc_id, seq in manifest["deleted"].items()}
+        if self._meta is not None:
+            self._meta.close()
+        self._meta = shelve.open(os.path.join(self.path, META))
+        self.docs = DocumentTable(self._meta)
+        self.codec = self._meta.get(CODEC_KEY, VARINT)
+
+    def _write_manifest(self, segments=None, deleted=None, sync_meta=True):
+        """
+        Writes the manifest atomically, then the segments and the deleted
+        documents it lists become live. Must be called with the lock held.
+
+        Args:
+            segments (list): live segments, the current ones if None.
+            deleted (dict): deleted documents {docID: sequence number}, the
+                current ones if None.
+            sync_meta (bool): write the shelf of the document table first.
+                Merges do not touch the shelf: it is written without the
+                lock by the thread that adds documents.
+        """
+        if segments is None:
+            segments = self._segments
+        if deleted is None:
+            deleted = self._deleted
+        if sync_meta:
+            self._meta.sync()
+        manifest = {"counter": self._counter,
+                    "segments": [[os.path.basename(segment.path), segment.seq]
+                                 for segment in segments],
+                    "deleted": deleted}
+        path = self._manifest_path()
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._manifest_stat = _stat_key(os.stat(path))
+        self._segments = segments
+        self._deleted = deleted
+
+    def reload(self):
+        """
+        Reads the manifest again if another process has changed it, e.g. an
+        indexer writing into the index a search engine reads.
+        """
+        try:
+            key = _stat_key(os.stat(self._manifest_path()))
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if key != self._manifest_stat:
+                self._load()
+
+    def segments(self):
+        """
+        Returns the list of live segments ordered by sequence number.
+        """
+        with self._lock:
+            return sorted(self._segments, key=lambda segment: segment.seq)
+
+    def _new_segment(self, items, seq=None):
+        """
+        Writes a segment with a new name. Returns the segment or None if
+        there are no items.
+        """
+        with self._lock:
+            self._counter += 1
+            name = "{:08d}.seg".format(self._counter)
+            if seq is None:
+                seq = self._counter
+        path = os.path.join(self.path, name)
+        size, count = write_segment(path, items)
+        if not count:
+            os.remove(path)
+            return None
+        return Segment(path, seq)
+
+    def doc_postings(self, term):
+        """
+        Returns postings of a term by docID merged from all live segments.
+
+        Args:
+            term (str): term.
+
+        Returns:
+            Dictionary {docID: positions}, empty if the term is absent.
+        """
+        self.reload()
+        postings = {}
+        deleted = self._deleted
+        for segment in self.segments():
+            data = segment.get(term)
+            if data is not None:
+                _combine(postings, segment.seq, data, deleted)
+        return postings
+
+    def term_stats(self, term):
+        """
+        Returns statistics of a term. They are counted from the headers of
+        the postings in the segments, positions are not decoded.
+
+        Args:
+            term (str): term.
+
+        Returns:
+            TermStats or None if the term is absent.
+        """
+        self.reload()
+        counts = {}
+        deleted = self._deleted
+        for segment in self.segments():
+            data = segment.get(term)
+            if data is None:
+                continue
+            for doc_id, positions in decode_postings(data).items():
+                if deleted.get(doc_id, -1) < segment.seq:
+                    counts[doc_id] = counts.get(doc_id, 0) + len(positions)
+        return TermStats(counts) if counts else None
+
+    def __getitem__(self, key):
+        if key.startswith(META_PREFIX):
+            return self._meta[key]
+        postings = self.doc_postings(key)
+        if not postings:
+            raise KeyError(key)
+        path = self.docs.path
+        return {path(doc_id): positions
+                for doc_id, positions in postings.items()}
+
+    def __setitem__(self, key, value):
+        """
+        Sets a META_PREFIX key. Postings of terms are added with extend.
+
+        Raises:
+            TypeError: in case the key is a term.
+        """
+        if not key.startswith(META_PREFIX):
+            raise TypeError("Segments are immutable, use extend")
+        self._meta[key] = value
+
+    def __contains__(self, key):
+        if key.startswith(META_PREFIX):
+            return key in self._meta
+        return bool(self.doc_postings(key))
+
+    def __iter__(self):
+        """
+        Iterates over the terms in sorted order.
+        """
+        self.reload()
+        segments = self.segments()
+        terms = heapq.merge(*(segment.terms() for segment in segments))
+        for term, _ in groupby(terms):
+            if not self._deleted or self.doc_postings(term):
+                yield term
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def match_terms(self, pattern, limit=None):
+        """
+        Returns the first terms matching a wildcard pattern in sorted order.
+        Sorted terms of the segments serve as the term dictionary: they are
+        looked up by the prefix of the pattern.
+
+        Args:
+            pattern (str): pattern, "*" matches any sequence of characters,
+                see lenin_terms.
+            limit (int): maximal number of terms or None.
+        """
+        self.reload()
+        prefix, regex = compile_pattern(pattern)
+        terms = heapq.merge(*(segment.terms(prefix)
+                              for segment in self.segments()))
+        found = (term for term, _ in groupby(terms)
+                 if regex.fullmatch(term) and
+                 (not self._deleted or self.doc_postings(term)))
+        return list(islice(found, limit))
+
+    def set_codec(self, codec):
+        """
+        Sets the codec new and merged segments are written with and stores
+        it in the index.
+
+        Args:
+            codec (str): one of CODECS of lenin_postings.
+
+        Raises:
+            ValueError: in case the codec is unknown.
+        """
+        if codec not in CODECS:
+            raise ValueError("Unknown codec: " + repr(codec))
+        self._meta[CODEC_KEY] = codec
+        self.codec = codec
+
+    def upgrade(self):
+        """
+        Does nothing, segments never hold pickled postings, see
+        PostingsDB.upgrade.
+
+        Returns:
+            0, the number of encoded terms.
+        """
+        return 0
+
+    def extend(self, term, postings):
+        """
+        Adds positions of a term, they are written into a new segment by
+        sync.
+
+        Args:
+            term (str): term.
+            postings (dict): dictionary {docID: positions}.
+        """
+        entry = self._pending.setdefault(term, {})
+        for doc_id, positions in postings.items():
+            if doc_id in entry:
+                entry[doc_id] = list(entry[doc_id]) + list(positions)
+            else:
+                entry[doc_id] = positions
+
+    def remove_document(self, doc):
+        """
+        Removes postings of a document: they are skipped by search and
+        dropped by merges.
+
+        Args:
+            doc (int or str): docID or path of the document.
+        """
+        doc_id = self.docs._id(doc)
+        with self._lock:
+            self._deleted[doc_id] = self._counter
+            self.docs.reset(doc_id)
+            self._write_manifest()
+
+    def sync(self):
+        """
+        Writes the added postings into a new segment and applies the merge
+        policy.
+        """
+        if self._pending:
+            pending = self._pending
+            self._pending = {}
+            segment = self._new_segment(
+                (term, encode_postings(pending[term], self.codec))
+                for term in sorted(pending))
+            with self._lock:
+                if segment is not None:
+                    self._write_manifest(self._segments + [segment])
+                else:
+                    self._write_manifest()
+            self.maybe_merge()
+        else:
+            self._meta.sync()
+
+    def _tiers(self, segments):
+        """
+        Divides segments into tiers by size.
+
+        Returns:
+            Dictionary {tier: [segments ordered by sequence number]}.
+        """
+        tiers = {}
+        for segment in sorted(segments, key=lambda segment: segment.seq):
+            ratio = max(segment.size, 1) / MIN_MERGE_SIZE
+            tier = max(0, math.floor(math.log(ratio, self.merge_factor)))
+            tiers.setdefault(tier, []).append(segment)
+        return tiers
+
+    def _pick(self):
+        """
+        Returns segments to merge according to the tiered policy or None.
+        """
+        tiers = self._tiers(self.segments())
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][:self.merge_factor]
+        return None
+
+    def maybe_merge(self):
+        """
+        Merges segments while the merge policy finds segments to merge. In
+        background mode the merges run in a thread, one at a time.
+        """
+        if not self.background:
+            self._merge_loop()
+            return
+        with self._lock:
+            if self._merger is not None and self._merger.is_alive():
+                return
+            self._merger = threading.Thread(target=self._merge_loop,
+                                            daemon=True)
+            self._merger.start()
+
+    def _prune_deleted(self, segments):
+        """
+        Returns the removed documents without those that no segment of a list
+        holds stale postings of: every segment is newer than the removal,
+        its postings of the document were written later or dropped by a
+        merge. Must be called with the lock held.
+        """
+        oldest = min((segment.seq for segment in segments), default=math.inf)
+        return {doc_id: seq for doc_id, seq in self._deleted.items()
+                if seq >= oldest}
+
+    def _merge_loop(self):
+        while True:
+            segments = self._pick()
+            if segments is None:
+                return
+            self.merge(segments)
+
+    def merge(self, segments=None):
+        """
+        Merges segments into one, dropping postings of removed documents.
+
+        Args:
+            segments (list): live segments to merge, all if None.
+        """
+        if segments is None:
+            segments = self.segments()
+        if not segments:
+            return
+        with self._lock:
+            deleted = dict(self._deleted)
+        streams = [_records(segment) for segment in segments]
+
+        def items():
+            for term, records in groupby(heapq.merge(*streams),
+                                         key=itemgetter(0)):
+                postings = {}
+                for _, seq, data in records:
+                    _combine(postings, seq, data, deleted)
+                if postings:
+                    yield term, encode_postings(postings, self.codec)
+
+        merged = self._new_segment(items(),
+                                   max(segment.seq for segment in segments))
+        try:
+            with self._lock:
+                live = [segment for segment in self._segments
+                        if segment not in segments]
+                if merged is not None:
+                    live.append(merged)
+                self._write_manifest(live, self._prune_deleted(live),
+                                     sync_meta=False)
+        except BaseException:
+            # the merged segments stay live
+            if merged is not None:
+                merged.close()
+                os.remove(merged.path)
+            raise
+        # merged segments may still be read, their files are closed when
+        # the segments are no longer referenced
+        for segment in segments:
+            os.remove(segment.path)
+
+    def wait(self):
+        """
+        Waits for the background merge to finish.
+        """
+        merger = self._merger
+        if merger is not None:
+            merger.join()
+
+    def close(self):
+        """
+        Writes the added postings, waits for merges and closes the index.
+        """
+        self.sync()
+        self.wait()
+        for segment in self.segments():
+            segment.close()
+        self._meta.close()
+
+
+def is_segmented(path):
+    """
+    Checks if a path is a directory of a segmented index.
+    """
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def open_index(path, segmented=None, storage=None, **kwargs):
+    """
+    Opens a database of postings.
+
+    Args:
+        path (str): path to the database.
+        segmented (bool): open a SegmentedIndex if True, a PostingsDB if
+            False. By default a SegmentedIndex is opened if path is its
+            directory.
+        storage (str): storage backend of a PostingsDB, see open_storage.
+            Ignored for a SegmentedIndex.
+        **kwargs: arguments of SegmentedIndex.
+
+    Returns:
+        SegmentedIndex or PostingsDB.
+    """
+    if segmented is None:
+        segmented = is_segmented(path)
+    if segmented:
+        return SegmentedIndex(path, **kwargs)
+    return PostingsDB(path, storage=storage)
+
+
+def compact_index(source, path, storage=None, codec=None):
+    """
+    Writes a PostingsDB as a segmented index of one segment, a read-only
+    copy that opens in constant time: the segment is memory-mapped and only
+    the pages of the terms looked up are read. The PostingsDB is opened for
+    reading only, its pickled postings of older versions are encoded in the
+    copy.
+
+    Args:
+        source (str): path to the PostingsDB.
+        path (str): path to the directory of the new index.
+        storage (str): storage backend of the PostingsDB, see open_storage.
+        codec (str): codec of the blocks of positions, see CODECS of
+            lenin_postings. By default the codec of the PostingsDB is used.
+
+    Returns:
+        Tuple (size of the segment in bytes, number of terms).
+
+    Raises:
+        ValueError: in case there is an index at path already or the codec
+            is unknown.
+        FileNotFoundError: in case there is no database at source.
+    """
+    if is_segmented(path):
+        raise ValueError("Index exists: " + path)
+    if codec is not None and codec not in CODECS:
+        raise ValueError("Unknown codec: " + repr(codec))
+    if detect_storage(source) is None:
+        raise FileNotFoundError("Database not found: " + source)
+    db = PostingsDB(source, "r", storage)
+    try:
+        index = SegmentedIndex(path, background=False)
+        try:
+            return _compact(db, index, codec or db.codec)
+        finally:
+            index.close()
+    finally:
+        db.close()
+
+
+def _compact(db, index, codec):
+    """
+    Copies a PostingsDB into a new SegmentedIndex, see compact_index.
+    """
+    def items():
+        doc_path = db.docs.path
+        add = index.docs.add
+        for term in db.dictionary.terms():
+            postings = db.doc_postings(term)
+            if postings and min(postings) < 0:
+                # transient docIDs of pickled postings
+                postings = {add(doc_path(doc_id)) if doc_id < 0 else doc_id:
+                            positions
+                            for doc_id, positions in postings.items()}
+            if postings:
+                yield term, encode_postings(postings, codec)
+
+    # statistics of terms are counted from the segment
+    for key in db.store.keys():
+        if key.startswith(META_PREFIX) and not key.startswith(STATS_PREFIX):
+            index[key] = db[key]
+    # the document table copied above
+    index.docs = DocumentTable(index._meta)
+    index.set_codec(codec)
+    segment = index._new_segment(items())
+    with index._lock:
+        if segment is not None:
+            index._write_manifest(index._segments + [segment])
+        else:
+            index._write_manifest()
+    return (segment.size, len(segment)) if segment is not None else (0, 0)
@@ -0,0 +1,415 @@
+import unittest
+import os
+import shelve
+import shutil
+import threading
+from lenin_postings import Position, PostingsDB, encode_postings, META_PREFIX
+from lenin_segments import (Segment, SegmentedIndex, write_segment,
+                            open_index, is_segmented, compact_index)
+
+
+P = [Position(0, 0, 4), Position(1, 2, 6), Position(3, 0, 1)]
+
+
+class SegmentTest(unittest.TestCase):
+    """
+    Tests function write_segment and class Segment.
+    """
+    def setUp(self):
+        self.items = [("a", encode_postings({0: P})),
+                      ("войн", encode_postings({1: P[:1]})),
+                      ("мир", encode_postings({0: P[:2], 2: P}))]
+        self.size, self.count = write_segment("test.seg", self.items)
+        self.segment = Segment("test.seg", 1)
+
+    def test_write(self):
+        self.assertEqual(self.count, 3)
+        self.assertEqual(self.size, os.path.getsize("test.seg"))
+        self.assertNotIn("test.seg.tmp", os.listdir('.'))
+
+    def test_get(self):
+        self.assertEqual(len(self.segment), 3)
+        for term, data in self.items:
+            self.assertEqual(self.segment.get(term), data)
+        self.assertIsNone(self.segment.get("b"))
+        self.assertIsNone(self.segment.get(""))
+        self.assertIsNone(self.segment.get("я"))
+
+    def test_iteration(self):
+        self.assertEqual(list(self.segment), self.items)
+        self.assertEqual(list(self.segment.terms()), ["a", "войн", "мир"])
+
+    def test_prefix(self):
+        self.assertEqual(list(self.segment.terms("во")), ["войн"])
+        self.assertEqual(list(self.segment.terms("в")), ["войн"])
+        self.assertEqual(list(self.segment.terms("a")), ["a"])
+        self.assertEqual(list(self.segment.terms("б")), [])
+        self.assertEqual(list(self.segment.terms("я")), [])
+
+    def test_empty(self):
+        write_segment("test1.seg", [])
+        segment = Segment("test1.seg", 2)
+        self.assertEqual(len(segment), 0)
+        self.assertIsNone(segment.get("a"))
+        segment.close()
+
+    def test_not_a_segment(self):
+        with open("test1.seg", "wb") as f:
+            f.write(b"not a segment at all, not a segment at all")
+        with self.assertRaises(ValueError):
+            Segment("test1.seg", 2)
+        with open("test1.seg", "wb") as f:
+            f.write(b"LSEG")
+        with self.assertRaises(ValueError):
+            Segment("test1.seg", 2)
+
+    def test_truncated(self):
+        with open("test.seg", "rb") as f:
+            data = f.read()
+        with open("test1.seg", "wb") as f:
+            f.write(data[:-8])
+        with self.assertRaises(ValueError):
+            Segment("test1.seg", 2)
+
+    def test_close(self):
+        self.segment.close()
+        self.segment.close()
+        # the file of a closed segment can be replaced
+        write_segment("test.seg", self.items[:1])
+        segment = Segment("test.seg", 2)
+        self.assertEqual(list(segment), self.items[:1])
+        segment.close()
+
+    def tearDown(self):
+        self.segment.close()
+        for filename in ("test.seg", "test1.seg"):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+class SegmentedIndexTest(unittest.TestCase):
+    """
+    Tests class SegmentedIndex.
+    """
+    def setUp(self):
+        self.index = SegmentedIndex("test_db", background=False)
+        self.a = self.index.docs.add("a.txt")
+        self.b = self.index.docs.add("b.txt")
+
+    def reopen(self, **kwargs):
+        self.index.close()
+        self.index = SegmentedIndex("test_db", **kwargs)
+
+    def test_segments(self):
+        self.index.extend("мир", {self.a: P[:1]})
+        self.index.sync()
+        self.index.extend("мир", {self.b: P})
+        self.index.extend("война", {self.a: P})
+        self.index.sync()
+        self.assertEqual(len(self.index.segments()), 2)
+        self.assertEqual(self.index["мир"], {"a.txt": P[:1], "b.txt": P})
+        self.assertEqual(list(self.index), ["война", "мир"])
+        self.assertEqual(len(self.index), 2)
+        self.assertIn("война", self.index)
+        self.assertNotIn("absent", self.index)
+        self.assertIsNone(self.index.get("absent"))
+
+    def test_document_in_several_segments(self):
+        self.index.extend("мир", {self.a: P[1:]})
+        self.index.sync()
+        self.index.extend("мир", {self.a: P[:1]})
+        self.index.sync()
+        self.assertEqual(self.index.doc_postings("мир"), {self.a: P})
+
+    def test_persistent(self):
+        self.index.extend("мир", {self.a: P})
+        self.index[META_PREFIX + "normalizer"] = {"stem": True}
+        self.reopen()
+        self.assertTrue(is_segmented("test_db"))
+        self.assertEqual(self.index["мир"], {"a.txt": P})
+        self.assertEqual(self.index[META_PREFIX + "normalizer"],
+                         {"stem": True})
+        self.assertEqual(self.index.docs.get_id("b.txt"), self.b)
+
+    def test_term_stats(self):
+        self.index.extend("мир", {self.a: P[:1], self.b: P})
+        self.index.sync()
+        self.index.extend("мир", {self.a: P})
+        self.index.sync()
+        self.assertEqual(self.index.term_stats("мир").counts,
+                         {self.a: 4, self.b: 3})
+        self.index.remove_document("b.txt")
+        self.assertEqual(self.index.term_stats("мир").counts, {self.a: 4})
+        self.assertIsNone(self.index.term_stats("absent"))
+
+    def test_match_terms(self):
+        self.index.extend("мир", {self.a: P})
+        self.index.extend("мирный", {self.b: P})
+        self.index.sync()
+        self.index.extend("мирный", {self.a: P})
+        self.index.extend("мировой", {self.b: P})
+        self.index.extend("война", {self.b: P})
+        self.index.sync()
+        self.assertEqual(self.index.match_terms("мир*"),
+                         ["мир", "мирный", "мировой"])
+        self.assertEqual(self.index.match_terms("мир*", limit=2),
+                         ["мир", "мирный"])
+        self.assertEqual(self.index.match_terms("*й"), ["мирный", "мировой"])
+        self.index.remove_document("b.txt")
+        self.assertEqual(self.index.match_terms("*"), ["мир", "мирный"])
+
+    def test_terms_are_immutable(self):
+        with self.assertRaises(TypeError):
+            self.index["мир"] = {"a.txt": P}
+
+    def test_remove_document(self):
+        self.index.extend("мир", {self.a: P, self.b: P})
+        self.index.extend("война", {self.a: P})
+        self.index.sync()
+        self.index.remove_document("a.txt")
+        self.assertEqual(dict(self.index), {"мир": {"b.txt": P}})
+        # postings written after the removal are visible
+        self.index.extend("война", {self.a: P[:1]})
+        self.index.sync()
+        self.assertEqual(self.index["война"], {"a.txt": P[:1]})
+        self.reopen(background=False)
+        self.assertEqual(self.index["война"], {"a.txt": P[:1]})
+
+    def test_merge(self):
+        for i in range(3):
+            self.index.extend("мир", {self.a: [Position(i, 0, 3)]})
+            self.index.extend("война" + str(i), {self.b: P})
+            self.index.sync()
+        self.index.remove_document("b.txt")
+        self.index.merge()
+        self.assertEqual(len(self.index.segments()), 1)
+        segment = self.index.segments()[0]
+        self.assertEqual(list(segment.terms()), ["мир"])
+        self.assertEqual(self.index["мир"],
+                         {"a.txt": [Position(i, 0, 3) for i in range(3)]})
+        self.assertEqual(len([name for name in os.listdir("test_db")
+                              if name.endswith(".seg")]), 1)
+
+    def test_merge_after_reindex(self):
+        self.index.extend("мир", {self.a: P, self.b: P[:1]})
+        self.index.extend("война", {self.a: P})
+        self.index.sync()
+        # the document is indexed again
+        self.index.remove_document("a.txt")
+        self.index.extend("мир", {self.a: P[:1]})
+        self.index.sync()
+        self.index.merge()
+        self.assertEqual(len(self.index.segments()), 1)
+        self.assertEqual(dict(self.index),
+                         {"мир": {"a.txt": P[:1], "b.txt": P[:1]}})
+
+    def test_merge_prunes_deleted(self):
+        self.index.extend("мир", {self.a: P, self.b: P})
+        self.index.sync()
+        self.index.remove_document("b.txt")
+        self.index.extend("война", {self.a: P})
+        self.index.sync()
+        self.index.merge(self.index.segments()[1:])
+        self.assertEqual(self.index._deleted, {self.b: 1})
+        self.index.merge()
+        self.assertEqual(self.index._deleted, {})
+        self.reopen(background=False)
+        self.assertEqual(self.index._deleted, {})
+        self.assertEqual(dict(self.index), {"мир": {"a.txt": P},
+                                            "война": {"a.txt": P}})
+
+    def test_merge_policy(self):
+        self.reopen(merge_factor=2, background=False)
+        for i in range(4):
+            self.index.extend("мир", {self.a: [Position(i, 0, 3)]})
+            self.index.sync()
+        self.assertEqual(len(self.index.segments()), 1)
+        self.assertEqual(len(self.index["мир"]["a.txt"]), 4)
+
+    def test_codec(self):
+        self.index.set_codec("zlib")
+        long = [Position(i, 0, 3) for i in range(100)]
+        self.index.extend("мир", {self.a: long[:50]})
+        self.index.sync()
+        self.index.extend("мир", {self.a: long[50:]})
+        self.index.sync()
+        self.index.merge()
+        self.assertEqual(self.index.segments()[0].get("мир")[:2], b"\x04\x01")
+        self.reopen(background=False)
+        self.assertEqual(self.index.codec, "zlib")
+        self.assertEqual(self.index["мир"], {"a.txt": long})
+
+    def test_background_merge(self):
+        self.reopen(merge_factor=2, background=True)
+        for i in range(8):
+            self.index.extend("мир", {self.a: [Position(i, 0, 3)]})
+            self.index.sync()
+        self.index.wait()
+        self.index.maybe_merge()
+        self.index.wait()
+        self.assertEqual(len(self.index.segments()), 1)
+        self.assertEqual(self.index["мир"]["a.txt"],
+                         [Position(i, 0, 3) for i in range(8)])
+
+    def segment_files(self):
+        return sorted(name for name in os.listdir("test_db")
+                      if name.endswith((".seg", ".tmp")))
+
+    def live_segment_files(self):
+        return sorted(os.path.basename(segment.path)
+                      for segment in self.index.segments())
+
+    def test_add_documents_while_merging(self):
+        errors = []
+        excepthook = threading.excepthook
+        threading.excepthook = errors.append
+        try:
+            self.reopen(merge_factor=2, background=True)
+            paths = []
+            for i in range(50):
+                for j in range(20):
+                    paths.append("doc{}_{}.txt".format(i, j))
+                    doc_id = self.index.docs.add(paths[-1], size=j)
+                    self.index.extend("мир", {doc_id: P[:1]})
+                self.index.sync()
+            self.index.wait()
+        finally:
+            threading.excepthook = excepthook
+        self.assertEqual(errors, [])
+        self.assertEqual(self.segment_files(), self.live_segment_files())
+        self.reopen(background=False)
+        self.assertEqual(sorted(self.index["мир"]), sorted(paths))
+        self.assertEqual(self.segment_files(), self.live_segment_files())
+
+    def test_failed_merge(self):
+        self.index.extend("мир", {self.a: P})
+        self.index.sync()
+        self.index.extend("мир", {self.b: P})
+        self.index.sync()
+        segments = self.index.segments()
+
+        def fail(*args, **kwargs):
+            raise OSError("disk full")
+
+        self.index._write_manifest = fail
+        with self.assertRaises(OSError):
+            self.index.merge()
+        del self.index._write_manifest
+        self.assertEqual(self.index.segments(), segments)
+        self.assertEqual(self.segment_files(), self.live_segment_files())
+        self.reopen(background=False)
+        self.assertEqual(self.index["мир"], {"a.txt": P, "b.txt": P})
+
+    def test_reload(self):
+        reader = SegmentedIndex("test_db", background=False)
+        self.assertNotIn("мир", reader)
+        self.index.extend("мир", {self.a: P})
+        self.index.sync()
+        self.assertEqual(reader["мир"], {"a.txt": P})
+        reader.close()
+
+    def test_error_wrong_merge_factor(self):
+        with self.assertRaises(ValueError):
+            SegmentedIndex("test_db", merge_factor=1)
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree("test_db")
+
+
+class CompactIndexTest(unittest.TestCase):
+    """
+    Tests function compact_index.
+    """
+    def setUp(self):
+        self.db = PostingsDB("test_db")
+        self.db["мир"] = {"a.txt": P, "b.txt": P[:1]}
+        self.db["война"] = {"b.txt": P}
+        self.db[META_PREFIX + "normalizer"] = {"stem": True}
+        self.db.docs.set_terms("b.txt", ["война", "мир"])
+        self.db.close()
+
+    def test_compact(self):
+        size, count = compact_index("test_db", "test_dir")
+        self.assertEqual(count, 2)
+        index = open_index("test_dir")
+        self.assertIsInstance(index, SegmentedIndex)
+        self.assertEqual(len(index.segments()), 1)
+        self.assertEqual(index.segments()[0].size, size)
+        self.assertEqual(dict(index), {"война": {"b.txt": P},
+                                       "мир": {"a.txt": P, "b.txt": P[:1]}})
+        self.assertEqual(index[META_PREFIX + "normalizer"], {"stem": True})
+        self.assertEqual(index.docs.terms("b.txt"), ["война", "мир"])
+        self.assertEqual(index.term_stats("мир").counts, {0: 3, 1: 1})
+        index.close()
+
+    def test_pickled_postings(self):
+        with shelve.open("test_db") as shelf:
+            shelf["князь"] = {"c.txt": P, "a.txt": P[:1]}
+        self.db = PostingsDB("test_db")
+        self.db.dictionary.add("князь")
+        self.db.close()
+        compact_index("test_db", "test_dir")
+        index = open_index("test_dir")
+        self.assertEqual(index["князь"], {"a.txt": P[:1], "c.txt": P})
+        self.assertEqual(index.docs.get_id("c.txt"), 2)
+        index.close()
+
+    def test_codec(self):
+        compact_index("test_db", "test_dir", codec="zlib")
+        index = open_index("test_dir")
+        self.assertEqual(index.codec, "zlib")
+        self.assertEqual(index["война"], {"b.txt": P})
+        index.close()
+        with self.assertRaises(ValueError):
+            compact_index("test_db", "test_dir1", codec="zip")
+
+    def test_source_is_read_only(self):
+        os.remove("test_db.terms")
+        compact_index("test_db", "test_dir")
+        self.assertFalse(os.path.exists("test_db.terms"))
+
+    def test_missing_source(self):
+        with self.assertRaises(FileNotFoundError):
+            compact_index("test_db1", "test_dir")
+        self.assertFalse(os.path.exists("test_dir"))
+        self.assertFalse(any(name.startswith("test_db1")
+                             for name in os.listdir('.')))
+
+    def test_existing_index(self):
+        compact_index("test_db", "test_dir")
+        with self.assertRaises(ValueError):
+            compact_index("test_db", "test_dir")
+
+    def tearDown(self):
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+        if os.path.exists("test_dir"):
+            shutil.rmtree("test_dir")
+
+
+class OpenIndexTest(unittest.TestCase):
+    """
+    Tests function open_index.
+    """
+    def test_open(self):
+        db = open_index("test_db")
+        self.assertIsInstance(db, PostingsDB)
+        db.close()
+        db = open_index("test_dir", segmented=True)
+        self.assertIsInstance(db, SegmentedIndex)
+        db.close()
+        db = open_index("test_dir")
+        self.assertIsInstance(db, SegmentedIndex)
+        db.close()
+
+    def tearDown(self):
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db."):
+                os.remove(filename)
+        shutil.rmtree("test_dir")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+"""
+This module allows to store the database of postings in different storage
+backends. A backend is a persistent mapping of str keys to bytes values,
+writes are collected into one transaction until sync is called.
+
+Backends:
+    shelve - dbm files as created by shelve.open (dbm.dumb on systems
+        without gdbm or ndbm: the whole key directory is loaded into memory
+        when the database is opened and space of rewritten values is never
+        reclaimed),
+    sqlite - a single SQLite file in WAL mode, values are stored as BLOBs.
+"""
+import dbm
+import os
+import sqlite3
+
+
+# first bytes of every SQLite database file
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+class StorageBackend(object):
+    """
+    StorageBackend is the interface of storage backends: a persistent
+    mapping of str keys to bytes values.
+    """
+    def get(self, key):
+        """
+        Returns the value of a key or None if the key is absent.
+        """
+        raise NotImplementedError
+
+    def put(self, key, value):
+        """
+        Sets the value of a key.
+        """
+        raise NotImplementedError
+
+    def put_many(self, items):
+        """
+        Sets values of many keys.
+
+        Args:
+            items (iterable): tuples (key, value).
+        """
+        for key, value in items:
+            self.put(key, value)
+
+    def delete(self, key):
+        """
+        Deletes a key. Does nothing if the key is absent.
+        """
+        raise NotImplementedError
+
+    def keys(self):
+        """
+        Returns an iterable of all keys.
+        """
+        raise NotImplementedError
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def sync(self):
+        """
+        Writes the changes to disk.
+        """
+
+    def close(self):
+        """
+        Writes the changes to disk and closes the database.
+        """
+        raise NotImplementedError
+
+
+class ShelveBackend(StorageBackend):
+    """
+    Storage backend on the dbm files shelve.open creates, databases created
+    by older versions are read as they are.
+
+    Attributes:
+        db (dbm): underlying database.
+    """
+    def __init__(self, path, flag="c"):
+        """
+        Opens the database.
+
+        Args:
+            path (str): path to the database without extensions.
+            flag (str): flag of dbm.open.
+        """
+        self.db = dbm.open(path, flag)
+
+    def get(self, key):
+        return self.db.get(key.encode("utf-8"))
+
+    def put(self, key, value):
+        self.db[key.encode("utf-8")] = value
+
+    def delete(self, key):
+        try:
+            del self.db[key.encode("utf-8")]
+        except KeyError:
+            pass
+
+    def keys(self):
+        return [key.decode("utf-8") for key in self.db.keys()]
+
+    def __contains__(self, key):
+        return key.encode("utf-8") in self.db
+
+    def sync(self):
+        if hasattr(self.db, "sync"):
+            self.db.sync()
+
+    def close(self):
+        self.db.close()
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Storage backend on a SQLite database in WAL mode: readers do not block
+    the writer. Writes are collected into one transaction until sync.
+
+    Attributes:
+        connection (sqlite3.Connection): connection to the database, None
+            after the database is closed.
+    """
+    def __init__(self, path, flag="c"):
+        """
+        Opens the database.
+
+        Args:
+            path (str): path to the database file.
+            flag (str): "r" to open for reading only, "w" to open an
+                existing database, "c" to create it if needed, "n" to always
+                create a new one.
+
+        Raises:
+            FileNotFoundError: in case the database does not exist and flag
+                is "r" or "w".
+        """
+        if flag in ("r", "w") and not os.path.exists(path):
+            raise FileNotFoundError(path)
+        if flag == "n" and os.path.exists(path):
+            os.remove(path)
+        if flag == "r":
+            self.connection = sqlite3.connect(
+                "file:" + path + "?mode=ro", uri=True, isolation_level=None)
+        else:
+            self.connection = sqlite3.connect(path, isolation_level=None)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS postings "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL) WITHOUT ROWID")
+
+    def _begin(self):
+        if not self.connection.in_transaction:
+            self.connection.execute("BEGIN")
+
+    def get(self, key):
+        row = self.connection.execute(
+            "SELECT value FROM postings WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, key, value):
+        self._begin()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO postings VALUES (?, ?)", (key, value))
+
+    def put_many(self, items):
+        self._begin()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO postings VALUES (?, ?)", items)
+
+    def delete(self, key):
+        self._begin()
+        self.connection.execute("DELETE FROM postings WHERE key = ?", (key,))
+
+    def keys(self):
+        return [key for key, in
+                self.connection.execute("SELECT key FROM postings")]
+
+    def __contains__(self, key):
+        return self.connection.execute(
+            "SELECT 1 FROM postings WHERE key = ?", (key,)).fetchone() \
+            is not None
+
+    def sync(self):
+        if self.connection.in_transaction:
+            self.connection.execute("COMMIT")
+
+    def close(self):
+        if self.connection is not None:
+            self.sync()
+            self.connection.close()
+            self.connection = None
+
+
+STORAGES = {"shelve": ShelveBackend, "sqlite": SqliteBackend}
+
+
+def detect_storage(path):
+    """
+    Returns the name of the storage backend of an existing database or None
+    if there is no database at path.
+    """
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            if f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC:
+                return "sqlite"
+    if dbm.whichdb(path):
+        return "shelve"
+    return None
+
+
+def open_storage(path, storage=None, flag="c"):
+    """
+    Opens a storage backend.
+
+    Args:
+        path (str): path to the database.
+        storage (str): name of the backend, one of STORAGES. By default the
+            backend of an existing database is detected, new databases are
+            created by the shelve backend.
+        flag (str): flag of dbm.open.
+
+    Returns:
+        Instance of a subclass of StorageBackend.
+
+    Raises:
+        ValueError: in case the backend is unknown.
+    """
+    if storage is None:
+        storage = detect_storage(path) or "shelve"
+    if storage not in STORAGES:
+        raise ValueError("Unknown storage: " + repr(storage))
+    return STORAGES[storage](path, flag)
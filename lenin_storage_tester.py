@@ -0,0 +1,120 @@
+import unittest
+import os
+import shelve
+from lenin_storage import (ShelveBackend, SqliteBackend, detect_storage,
+                           open_storage)
+
+
+class ShelveBackendTest(unittest.TestCase):
+    """
+    Tests class ShelveBackend.
+    """
+    def open(self, flag="c"):
+        return ShelveBackend("test_db", flag)
+
+    def setUp(self):
+        self.store = self.open()
+
+    def test_put_get(self):
+        self.store.put("мир", b"\x02\x01")
+        self.assertEqual(self.store.get("мир"), b"\x02\x01")
+        self.assertIsNone(self.store.get("absent"))
+        self.assertIn("мир", self.store)
+        self.assertNotIn("absent", self.store)
+
+    def test_put_many(self):
+        self.store.put_many([("a", b"1"), ("b", b"2"), ("a", b"3")])
+        self.assertEqual(sorted(self.store.keys()), ["a", "b"])
+        self.assertEqual(self.store.get("a"), b"3")
+
+    def test_delete(self):
+        self.store.put("a", b"1")
+        self.store.delete("a")
+        self.store.delete("absent")
+        self.assertNotIn("a", self.store)
+        self.assertEqual(list(self.store.keys()), [])
+
+    def test_persistent(self):
+        self.store.put("a", b"1")
+        self.store.sync()
+        self.store.put("b", b"2")
+        self.store.close()
+        self.store = self.open("r")
+        self.assertEqual(self.store.get("a"), b"1")
+        self.assertEqual(self.store.get("b"), b"2")
+
+    def tearDown(self):
+        self.store.close()
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db"):
+                os.remove(filename)
+
+
+class SqliteBackendTest(ShelveBackendTest):
+    """
+    Tests class SqliteBackend.
+    """
+    def open(self, flag="c"):
+        return SqliteBackend("test_db", flag)
+
+    def test_wal(self):
+        mode, = self.store.connection.execute(
+            "PRAGMA journal_mode").fetchone()
+        self.assertEqual(mode, "wal")
+
+    def test_reader_sees_synced_writes(self):
+        self.store.put("a", b"1")
+        reader = self.open("r")
+        self.assertIsNone(reader.get("a"))
+        self.store.sync()
+        self.assertEqual(reader.get("a"), b"1")
+        with self.assertRaises(Exception):
+            reader.put("b", b"2")
+        reader.close()
+
+    def test_new(self):
+        self.store.put("a", b"1")
+        self.store.close()
+        self.store = self.open("n")
+        self.assertIsNone(self.store.get("a"))
+
+    def test_error_absent_database(self):
+        with self.assertRaises(FileNotFoundError):
+            SqliteBackend("test_db1", "r")
+
+
+class OpenStorageTest(unittest.TestCase):
+    """
+    Tests functions detect_storage and open_storage.
+    """
+    def test_detect(self):
+        self.assertIsNone(detect_storage("test_db"))
+        with shelve.open("test_db") as shelf:
+            shelf["a"] = 1
+        self.assertEqual(detect_storage("test_db"), "shelve")
+        SqliteBackend("test_db1").close()
+        self.assertEqual(detect_storage("test_db1"), "sqlite")
+
+    def test_open(self):
+        store = open_storage("test_db")
+        self.assertIsInstance(store, ShelveBackend)
+        store.close()
+        store = open_storage("test_db1", "sqlite")
+        self.assertIsInstance(store, SqliteBackend)
+        store.close()
+        store = open_storage("test_db1")
+        self.assertIsInstance(store, SqliteBackend)
+        store.close()
+
+    def test_error_unknown_storage(self):
+        with self.assertRaises(ValueError):
+            open_storage("test_db", "lmdb")
+
+    def tearDown(self):
+        for filename in os.listdir('.'):
+            if filename.startswith("test_db"):
+                os.remove(filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+"""
+This module keeps the sorted dictionary of the terms of a database, which
+answers prefix and wildcard queries without reading all the keys of the
+database.
+
+Dictionary file:
+    terms in UTF-8 sorted in code point order, one per line.
+
+Wildcard patterns: "*" matches any sequence of characters, including an
+empty one. Terms are looked up by the part of the pattern before the first
+"*", a pattern that starts with "*" is matched against all the terms.
+"""
+import os
+import re
+from bisect import bisect_left
+from itertools import islice
+
+
+# maximal number of terms a wildcard is expanded to by default
+EXPANSION_LIMIT = 1000
+
+
+def compile_pattern(pattern):
+    """
+    Compiles a wildcard pattern.
+
+    Args:
+        pattern (str): pattern, "*" matches any sequence of characters.
+
+    Returns:
+        Tuple (prefix, regular expression): prefix is the part of the
+        pattern before the first "*", the expression matches whole terms.
+    """
+    parts = pattern.split("*")
+    return parts[0], re.compile(".*".join(map(re.escape, parts)), re.S)
+
+
+def _contains(terms, term):
+    """
+    Checks if a sorted list contains a term.
+    """
+    i = bisect_left(terms, term)
+    return i < len(terms) and terms[i] == term
+
+
+def prefix_terms(terms, prefix):
+    """
+    Generator.
+    Yields terms starting with a prefix from a sorted sequence of terms.
+    """
+    for i in range(bisect_left(terms, prefix), len(terms)):
+        if not terms[i].startswith(prefix):
+            break
+        yield terms[i]
+
+
+def match_terms(terms, pattern, limit=None):
+    """
+    Matches a wildcard pattern against a sorted sequence of terms.
+
+    Args:
+        terms (sequence): terms sorted in code point order.
+        pattern (str): wildcard pattern.
+        limit (int): maximal number of terms returned or None.
+
+    Returns:
+        List of the first matching terms in sorted order.
+    """
+    prefix, regex = compile_pattern(pattern)
+    found = (term for term in prefix_terms(terms, prefix)
+             if regex.fullmatch(term))
+    return list(islice(found, limit))
+
+
+class TermDictionary(object):
+    """
+    TermDictionary is the sorted list of the terms of a database kept in a
+    file next to it. Added and removed terms are collected in sets and
+    merged into the list when it is read or saved, the file is read again
+    when another process replaces it.
+
+    Attributes:
+        path (str): path to the dictionary file.
+    """
+    def __init__(self, path, keys=None, flag="c"):
+        """
+        Opens the dictionary, the file is read on the first lookup.
+
+        Args:
+            path (str): path to the dictionary file.
+            keys (callable): returns the terms of the database, called to
+                build the dictionary of a database written without one.
+            flag (str): "r" to never write the file, "n" to start with an
+                empty dictionary, other flags of dbm.open write it.
+        """
+        self.path = path
+        self._keys = keys
+        self._writable = flag != "r"
+        self._terms = None
+        self._stat = None
+        self._added = set()
+        self._removed = set()
+        self._dirty = False
+        if flag == "n":
+            self._terms = []
+            self._dirty = os.path.exists(path)
+
+    def add(self, term):
+        """
+        Adds a term. Does nothing if the term is already in the dictionary.
+        """
+        self._added.add(term)
+        self._removed.discard(term)
+
+    def discard(self, term):
+        """
+        Removes a term. Does nothing if the term is absent.
+        """
+        self._removed.add(term)
+        self._added.discard(term)
+
+    def _file_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        """
+        Reads the file or builds the dictionary from the keys of the
+        database if there is no file.
+        """
+        self._stat = self._file_stat()
+        if self._stat is not None:
+            with open(self.path, encoding="utf-8", newline="") as f:
+                self._terms = f.read().split("\n")[:-1]
+        else:
+            self._terms = sorted(self._keys()) if self._keys else []
+            self._dirty = bool(self._terms)
+
+    def terms(self):
+        """
+        Returns the list of terms sorted in code point order.
+        """
+        if self._terms is None or (not self._dirty and not self._added and
+                                   not self._removed and
+                                   self._file_stat() != self._stat):
+            self._load()
+        if self._added or self._removed:
+            terms = self._terms
+            if self._removed:
+                removed = self._removed
+                terms = [term for term in terms if term not in removed]
+                self._dirty |= len(terms) != len(self._terms)
+            added = sorted(term for term in self._added
+                           if not _contains(terms, term))
+            if added:
+                # both parts are sorted runs, sorting merges them
+                terms = terms + added
+                terms.sort()
+                self._dirty = True
+            self._terms = terms
+            self._added = set()
+            self._removed = set()
+        return self._terms
+
+    def match(self, pattern, limit=None):
+        """
+        Returns the first terms matching a wildcard pattern in sorted order,
+        see match_terms.
+        """
+        return match_terms(self.terms(), pattern, limit)
+
+    def save(self):
+        """
+        Writes the dictionary if it has changed. The file is written under a
+        temporary name and renamed, so it is never seen half-written.
+        """
+        if not self._writable or (self._terms is None and not self._added
+                                  and not self._removed):
+            return
+        terms = self.terms()
+        if not self._dirty:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            for term in terms:
+                f.write(term)
+                f.write("\n")
+        os.replace(tmp, self.path)
+        self._stat = self._file_stat()
+        self._dirty = False
+
+    def __len__(self):
+        return len(self.terms())
+
+    def __contains__(self, term):
+        return _contains(self.terms(), term)
+
+    def __iter__(self):
+        return iter(self.terms())
@@ -0,0 +1,115 @@
+import unittest
+import os
+from lenin_terms import (TermDictionary, compile_pattern, match_terms,
+                         prefix_terms)
+
+
+TERMS = ["болконская", "болконский", "болконского", "болонья", "княжна",
+         "князь", "ростов"]
+
+
+class MatchTermsTest(unittest.TestCase):
+    """
+    Tests functions compile_pattern, prefix_terms and match_terms.
+    """
+    def test_compile_pattern(self):
+        prefix, regex = compile_pattern("бол*ск*й")
+        self.assertEqual(prefix, "бол")
+        self.assertTrue(regex.fullmatch("болконский"))
+        self.assertFalse(regex.fullmatch("болконская"))
+        self.assertEqual(compile_pattern("*.?")[0], "")
+        self.assertTrue(compile_pattern("*.?")[1].fullmatch("a.?"))
+        self.assertFalse(compile_pattern("*.?")[1].fullmatch("ab"))
+
+    def test_prefix_terms(self):
+        self.assertEqual(list(prefix_terms(TERMS, "болк")), TERMS[:3])
+        self.assertEqual(list(prefix_terms(TERMS, "кн")), TERMS[4:6])
+        self.assertEqual(list(prefix_terms(TERMS, "я")), [])
+        self.assertEqual(list(prefix_terms(TERMS, "")), TERMS)
+
+    def test_match_terms(self):
+        self.assertEqual(match_terms(TERMS, "болкон*"), TERMS[:3])
+        self.assertEqual(match_terms(TERMS, "бол*я"), ["болконская",
+                                                       "болонья"])
+        self.assertEqual(match_terms(TERMS, "*ь"), ["князь"])
+        self.assertEqual(match_terms(TERMS, "князь"), ["князь"])
+        self.assertEqual(match_terms(TERMS, "княз"), [])
+        self.assertEqual(match_terms(TERMS, "*"), TERMS)
+
+    def test_limit(self):
+        self.assertEqual(match_terms(TERMS, "бол*", limit=2), TERMS[:2])
+        self.assertEqual(match_terms(TERMS, "бол*", limit=0), [])
+
+
+class TermDictionaryTest(unittest.TestCase):
+    """
+    Tests class TermDictionary.
+    """
+    def setUp(self):
+        self.dictionary = TermDictionary("test.terms")
+
+    def test_add_discard(self):
+        for term in reversed(TERMS):
+            self.dictionary.add(term)
+        self.dictionary.discard("ростов")
+        self.dictionary.discard("absent")
+        self.assertEqual(self.dictionary.terms(), TERMS[:-1])
+        self.assertIn("князь", self.dictionary)
+        self.assertNotIn("ростов", self.dictionary)
+        self.dictionary.add("ростов")
+        self.dictionary.add("князь")
+        self.assertEqual(list(self.dictionary), TERMS)
+        self.assertEqual(len(self.dictionary), len(TERMS))
+
+    def test_save(self):
+        for term in TERMS:
+            self.dictionary.add(term)
+        self.dictionary.save()
+        with open("test.terms", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "\n".join(TERMS) + "\n")
+        dictionary = TermDictionary("test.terms")
+        self.assertEqual(dictionary.match("кн*"), ["княжна", "князь"])
+        self.assertNotIn("test.terms.tmp", os.listdir("."))
+
+    def test_not_changed(self):
+        self.dictionary.save()
+        self.assertFalse(os.path.exists("test.terms"))
+        self.dictionary.add("князь")
+        self.dictionary.save()
+        stat = os.stat("test.terms")
+        self.dictionary.add("князь")
+        self.dictionary.discard("absent")
+        self.dictionary.save()
+        self.assertEqual(os.stat("test.terms").st_mtime_ns, stat.st_mtime_ns)
+
+    def test_built_from_keys(self):
+        dictionary = TermDictionary("test.terms", keys=lambda: TERMS[::-1])
+        self.assertEqual(dictionary.terms(), TERMS)
+        dictionary.save()
+        self.assertEqual(TermDictionary("test.terms").terms(), TERMS)
+
+    def test_reload(self):
+        reader = TermDictionary("test.terms", flag="r")
+        self.assertEqual(reader.terms(), [])
+        self.dictionary.add("князь")
+        self.dictionary.save()
+        self.assertEqual(reader.terms(), ["князь"])
+        reader.add("ростов")
+        reader.save()
+        self.assertEqual(TermDictionary("test.terms").terms(), ["князь"])
+
+    def test_new(self):
+        self.dictionary.add("князь")
+        self.dictionary.save()
+        dictionary = TermDictionary("test.terms", flag="n")
+        self.assertEqual(dictionary.terms(), [])
+        dictionary.save()
+        self.assertEqual(TermDictionary("test.terms").terms(), [])
+
+    def tearDown(self):
+        if os.path.exists("test.terms"):
+            os.remove("test.terms")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,170 @@
 This module allows to tokenize a string of characters.
 """
 from unicodedata import category
+import codecs
+import mmap
 import shelve
 import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# codes of token types as they are stored in the character tables
+_TYPE_CODES = {"L": ord("a"), "N": ord("d"), "Z": ord("s"), "P": ord("p")}
+_OTHER = ord("o")
+_PLANE_SIZE = 0x10000
+
+# plane number -> bytearray of type codes for every codepoint of the plane
+_planes = {}
+
+
+def _plane_table(plane):
+    """
+    Returns the table of type codes for one Unicode plane. The table is built
+    on the first request and cached for the lifetime of the process, so the
+    astral planes are only classified if the text actually contains them.
+
+    Args:
+        plane (int): number of the plane (0 is the Basic Multilingual Plane).
+
+    Returns:
+        bytearray of length 0x10000 mapping the lower 16 bits of a codepoint
+        to the code of its type (ord of 'a', 'd', 's', 'p' or 'o').
+    """
+    table = _planes.get(plane)
+    if table is None:
+        table = bytearray(_PLANE_SIZE)
+        base = plane * _PLANE_SIZE
+        for i in range(_PLANE_SIZE):
+            table[i] = _TYPE_CODES.get(category(chr(base + i))[0], _OTHER)
+        _planes[plane] = table
+    return table
+
+
+def _char_type(cp):
+    """
+    Returns the type code of a codepoint using the character tables.
+
+    Args:
+        cp (int): codepoint.
+    """
+    return _plane_table(cp >> 16)[cp & 0xFFFF]
+
+
+def _line_breaks(text, start, end, after_cr):
+    """
+    Counts the line breaks in a part of a string the way universal newlines
+    mode does: a line feed, a carriage return and their pair are one break.
+
+    Args:
+        text (str): string.
+        start (int): start of the part.
+        end (int): end of the part.
+        after_cr (bool): whether the character before the part is a carriage
+            return, a line feed at the start then completes its pair.
+
+    Returns:
+        tuple of the number of line breaks and the position after the last
+        line break character (-1 if the part contains none).
+    """
+    breaks = text.count("\n", start, end)
+    last = text.rfind("\n", start, end)
+    returns = text.count("\r", start, end)
+    if returns:
+        breaks += returns - text.count("\r\n", start, end)
+        last = max(last, text.rfind("\r", start, end))
+    if after_cr and start < end and text[start] == "\n":
+        breaks -= 1
+    return breaks, last + 1 if last >= 0 else -1
+
+
+# tokenizer backends:
+#   char - walks the string one character at a time
+#   regex - classifies the whole string with str.translate and finds the runs
+#           of one type with compiled regular expressions
+#   numpy - classifies the codepoints of the whole string as an array and
+#           finds the runs from the changes of type (requires numpy)
+BACKENDS = ("char", "regex", "numpy")
+
+# all types of tokens
+TYPES = "adspo"
+
+# types of runs -> compiled regex finding them in a type string
+_runs = {}
+
+_bmp_types = None
+
+
+def _type_string(text):
+    """
+    Classifies every character of a string.
+
+    Args:
+        text (str): non-empty string to classify.
+
+    Returns:
+        str of the same length as text consisting of type letters
+        ('a', 'd', 's', 'p', 'o').
+    """
+    global _bmp_types
+    if _bmp_types is None:
+        _bmp_types = _plane_table(0).decode("latin-1")
+    # characters outside of the BMP are left unchanged by the first
+    # translation, they are rare enough to be mapped separately
+    types = text.translate(_bmp_types)
+    if max(text) > "\uffff":
+        astral = {ord(c): _char_type(ord(c)) for c in set(types)
+                  if c > "\uffff"}
+        types = types.translate(astral)
+    return types
+
+
+def _runs_regex(types):
+    """
+    Returns a compiled regex that finds runs of the given types in a string
+    made by _type_string.
+
+    Args:
+        types (str): types of runs, e.g. "ad".
+    """
+    regex = _runs.get(types)
+    if regex is None:
+        regex = _runs[types] = re.compile("|".join(tp + "+" for tp in types))
+    return regex
+
+
+# generators that can be used by Tokenizer.tokenize_many
+BATCH_METHODS = ("generate", "generate_with_type", "generate_AD",
+                 "generate_spans")
+
+# tokenizers of a worker process by backend
+_worker_tokenizers = {}
+
+
+def _tokenize_chunk(backend, method, texts):
+    """
+    Tokenizes a chunk of strings in a worker process of
+    Tokenizer.tokenize_many.
+
+    Args:
+        backend (str): backend of the tokenizer.
+        method (str): one of BATCH_METHODS.
+        texts (list): strings to be tokenized.
+
+    Returns:
+        List of lists of tokens, one per string.
+    """
+    tokenizer = _worker_tokenizers.get(backend)
+    if tokenizer is None:
+        tokenizer = _worker_tokenizers[backend] = Tokenizer(backend=backend)
+    generate = getattr(tokenizer, method)
+    return [list(generate(text)) for text in texts]
 
 
 class Token(object):
@@ -15,6 +177,10 @@ class Token(object):
        s (str): string represention of the token.
        
     """
+    # tokens are created for every word of a corpus, so they do not get
+    # a __dict__
+    __slots__ = ("pos", "s")
+
     def __init__(self, pos, s):
         """
         Initialises itself.
@@ -44,6 +210,8 @@ class TypeToken(Token):
             p - punctuation
             o - other
     """
+    __slots__ = ("tp",)
+
     def __init__(self, pos, s, tp):
         """
         Initialises itself.
@@ -58,11 +226,132 @@ class TypeToken(Token):
         self.tp = tp
 
 
+class StreamToken(TypeToken):
+    """
+    StreamToken is TypeToken found in a stream by Tokenizer.generate_stream.
+
+    Attributes:
+        pos (int): position of the first character of the token counted from
+            the beginning of the stream.
+        s (str): string represention of the token.
+        tp (str): type of token.
+        line (int): line in which the token starts, lines are divided by
+            line feeds, carriage returns and their pairs (as in universal
+            newlines mode) and counted from 0.
+        col (int): position of the first character of the token counted from
+            the beginning of its line.
+    """
+    __slots__ = ("line", "col")
+
+    def __init__(self, pos, s, tp, line, col):
+        """
+        Initialises itself.
+
+        Args:
+            pos (int): position of the first character of the token in the
+                stream.
+            s (str): string represention of the token.
+            tp (str): type of token.
+            line (int): line in which the token starts.
+            col (int): position of the first character of the token in its
+                line.
+        """
+        self.pos = pos
+        self.s = s
+        self.tp = tp
+        self.line = line
+        self.col = col
+
+
+class ByteToken(StreamToken):
+    """
+    ByteToken is StreamToken found in a UTF-8 file by
+    Tokenizer.generate_mmap.
+
+    Attributes:
+        pos (int): position of the first character of the token counted from
+            the beginning of the file.
+        s (str): string represention of the token.
+        tp (str): type of token.
+        line (int): line in which the token starts.
+        col (int): position of the first character of the token counted from
+            the beginning of its line.
+        byte (int): position of the first byte of the token in the file. The
+            token takes len(s.encode("utf-8")) bytes.
+    """
+    __slots__ = ("byte",)
+
+    def __init__(self, pos, s, tp, line, col, byte):
+        """
+        Initialises itself.
+
+        Args:
+            pos (int): position of the first character of the token in the
+                file.
+            s (str): string represention of the token.
+            tp (str): type of token.
+            line (int): line in which the token starts.
+            col (int): position of the first character of the token in its
+                line.
+            byte (int): position of the first byte of the token in the file.
+        """
+        self.pos = pos
+        self.s = s
+        self.tp = tp
+        self.line = line
+        self.col = col
+        self.byte = byte
+
+
+def _type_array(text):
+    """
+    Classifies every character of a string with numpy.
+
+    Args:
+        text (str): non-empty string to classify.
+
+    Returns:
+        numpy array of uint8 type codes (ord of 'a', 'd', 's', 'p', 'o').
+    """
+    cps = numpy.frombuffer(text.encode("utf-32-le", "surrogatepass"),
+                           dtype=numpy.uint32)
+    bmp = numpy.frombuffer(_plane_table(0), dtype=numpy.uint8)
+    if cps.max() < _PLANE_SIZE:
+        return bmp[cps]
+    planes = cps >> 16
+    types = numpy.empty(len(cps), dtype=numpy.uint8)
+    for plane in numpy.unique(planes).tolist():
+        mask = planes == plane
+        table = numpy.frombuffer(_plane_table(plane), dtype=numpy.uint8)
+        types[mask] = table[cps[mask] & 0xFFFF]
+    return types
+
+
 class Tokenizer(object):
     """
     Class tokenizer that can tokenize a string using method tokenize
     or generate.
+
+    Attributes:
+        backend (str): the way the string is scanned, one of BACKENDS. All
+            backends produce the same tokens.
     """
+    def __init__(self, backend="char"):
+        """
+        Initialises itself.
+
+        Args:
+            backend (str): one of BACKENDS.
+
+        Raises:
+            ValueError: in case backend is unknown.
+        """
+        if backend not in BACKENDS:
+            raise ValueError("Unknown backend: " + repr(backend))
+        if backend == "numpy" and numpy is None:
+            raise ImportError("numpy backend requires numpy")
+        self.backend = backend
+
     def _getType(self, c):
         """
         Gets type of a character.
@@ -78,17 +367,84 @@ class Tokenizer(object):
                 p - punctuation
                 o - other
         """
-        cat = category(c)
-        if cat[0] == "L":
-            return "a"
-        elif cat[0] == "N":
-            return "d"
-        elif cat[0] == "Z":
-            return "s"
-        elif cat[0] == "P":
-            return "p"
-        else:
-            return "o"
+        return chr(_char_type(ord(c)))
+
+    def _spans(self, text, types):
+        """
+        Generator.
+        Finds runs of characters of one type with the backend of the
+        tokenizer.
+
+        Args:
+            text (str): non-empty string to be tokenized.
+            types (str): types of runs to yield.
+
+        Yields:
+            Tuples (start, end, tp).
+        """
+        if not types:
+            return
+        if self.backend == "regex":
+            codes = _type_string(text)
+            for m in _runs_regex(types).finditer(codes):
+                start = m.start()
+                yield start, m.end(), codes[start]
+            return
+        if self.backend == "numpy":
+            starts, ends, tps = self.tokenize_arrays(text, types)
+            yield from zip(starts.tolist(), ends.tolist(),
+                           map(chr, tps.tolist()))
+            return
+
+        # types are compared as codes and turned into str only when a span
+        # is yielded
+        wanted = frozenset(types.encode("ascii"))
+        bmp = _plane_table(0)
+        previousType = -1
+        pos = 0
+        for i, c in enumerate(text):
+            cp = ord(c)
+            if cp < _PLANE_SIZE:
+                currentType = bmp[cp]
+            else:
+                currentType = _char_type(cp)
+            if currentType != previousType:
+                if i>0 and previousType in wanted:
+                    yield pos, i, chr(previousType)
+                pos = i
+                previousType = currentType
+        if previousType in wanted:
+            yield pos, len(text), chr(previousType)
+
+    def generate_spans(self, text, types=None):
+        """
+        Generator.
+        Divides a string into runs of characters of one type. Unlike the
+        other generators it neither creates token objects nor slices the
+        string: text[start:end] is the string of a span.
+
+        Args:
+            text (str): String to be tokenized.
+            types (str): types of spans to yield, e.g. "ad" for alphabetic
+                and digit spans only. All spans are yielded if None.
+
+        Yields:
+            Tuples (start, end, tp) where start is the position of the first
+            character of the span, end is the position after its last
+            character and tp is its type.
+
+        Raises:
+            ValueError: in case text is not str or types contains an unknown
+                type.
+        """
+        if not isinstance(text, str):
+            raise ValueError
+        if types is None:
+            types = TYPES
+        elif not set(types) <= set(TYPES):
+            raise ValueError("Unknown types: " + repr(types))
+        if text:
+            yield from self._spans(text, types)
         
     def generate(self, text):
         """
@@ -105,31 +461,8 @@ class Tokenizer(object):
         Raises:
             ValueError: in case text is not str.
         """
-        if not isinstance(text, str):
-            raise ValueError
-        
-        # check the first symbol of a sequence to set initial value of pos
-        # pos>=0 is the start position of a word
-        # pos=-1 means we are between the words waiting for a new word to start
-        if not text:
-            return
-        if text[0].isalpha():
-            pos = 0
-        else:
-            pos = -1
-        
-        for i, c in enumerate(text):
-            # when the word ends add it to the list, set pos to -1
-            if not c.isalpha() and pos>=0:
-                yield Token(pos, text[pos:i])
-                pos = -1
-            # finds the beginning of the next word
-            if  not text[i-1].isalpha() and c.isalpha():
-                pos=i
-        # if the last character was alphabetic, we did not add
-        # the last token to the list
-        if c.isalpha():
-            yield Token(pos, text[pos:i+1])
+        for start, end, _ in self.generate_spans(text, "a"):
+            yield Token(start, text[start:end])
 
     def tokenize(self, text):
         """
@@ -161,21 +494,8 @@ class Tokenizer(object):
         Raises:
             ValueError: in case text is not str.
         """
-        if not isinstance(text, str):
-            raise ValueError
-        
-        if not text:
-            return
-        
-        previousType = ""
-        pos = 0
-        for i, c in enumerate(text):
-            currentType = self._getType(c)
-            if currentType != previousType and i>0:
-                yield TypeToken(pos, text[pos:i], previousType)
-                pos = i
-            previousType = currentType
-        yield TypeToken(pos, text[pos:i+1], previousType)
+        for start, end, tp in self.generate_spans(text):
+            yield TypeToken(start, text[start:end], tp)
 
     def tokenize_with_type(self, text):
         """
@@ -196,7 +516,8 @@ class Tokenizer(object):
         """
         Generator.
         Divides a string into TypeToken instances. Returns only those with type
-        'a' or 'd'.
+        'a' or 'd'. Spaces, punctuation and other characters are skipped
+        without creating tokens for them.
         
         Args:
             text (str): String to be tokenized.
@@ -207,9 +528,310 @@ class Tokenizer(object):
         Raises:
             ValueError: in case text is not str.
         """
-        for token in self.generate_with_type(text):
-            if token.tp == 'a' or token.tp == 'd':
-                yield token
+        for start, end, tp in self.generate_spans(text, "ad"):
+            yield TypeToken(start, text[start:end], tp)
+
+    def _stream(self, chunks, types, byte_offsets=False):
+        """
+        Generator.
+        Tokenizes a stream given by chunks. The last run of every chunk is
+        held back until the next chunk shows whether it continues, unless it
+        is of a type that is not yielded. A run that continues through whole
+        chunks is collected without scanning it again, so only a token longer
+        than a chunk makes the memory used exceed the size of a chunk.
+
+        Args:
+            chunks (iterable): decoded chunks of the stream (str).
+            types (str): types of tokens to yield.
+            byte_offsets (bool): if True, ByteToken instances with positions
+                of tokens in the UTF-8 encoded stream are yielded.
+
+        Yields:
+            StreamToken or ByteToken instances.
+        """
+        wanted = frozenset(types.encode("ascii"))
+        carry = []      # parts of the last run of the previous chunks
+        carry_len = 0   # total length of the parts
+        carry_type = 0  # type code of the run
+        offset = 0      # position of carry in the stream
+        byte = 0        # position of carry in the encoded stream
+        line = 0        # line of the character at offset
+        line_start = 0  # position of the first character of that line
+        after_cr = False  # whether the stream before offset ends with "\r"
+        chunks = iter(chunks)
+        eof = False
+        while not eof:
+            chunk = next(chunks, None)
+            eof = chunk is None
+            if not eof:
+                if not chunk:
+                    continue
+                # the last run of the chunk
+                last = _char_type(ord(chunk[-1]))
+                i = len(chunk) - 1
+                while i > 0 and _char_type(ord(chunk[i - 1])) == last:
+                    i -= 1
+                if i == 0 and carry and last == carry_type:
+                    # the held back run goes on through the whole chunk
+                    carry.append(chunk)
+                    carry_len += len(chunk)
+                    continue
+            text = "".join(carry) + chunk if chunk else "".join(carry)
+            if not text:
+                continue
+
+            # everything but the last run is complete, the last run is
+            # complete only at the end of the stream or if it is not
+            # yielded anyway
+            cut = len(text)
+            if not eof and last in wanted:
+                cut = carry_len + i
+            ascii = byte_offsets and text.isascii()
+
+            done = 0
+            if cut:
+                for start, end, tp in self._spans(text[:cut], types):
+                    breaks, after = _line_breaks(
+                        text, done, start,
+                        text[done - 1] == "\r" if done else after_cr)
+                    if after >= 0:
+                        line += breaks
+                        line_start = offset + after
+                    if not byte_offsets:
+                        yield StreamToken(offset + start, text[start:end], tp,
+                                          line, offset + start - line_start)
+                    else:
+                        if ascii:
+                            byte += start - done
+                        else:
+                            byte += len(text[done:start].encode("utf-8"))
+                        yield ByteToken(offset + start, text[start:end], tp,
+                                        line, offset + start - line_start,
+                                        byte)
+                    done = start
+            breaks, after = _line_breaks(
+                text, done, cut, text[done - 1] == "\r" if done else after_cr)
+            if after >= 0:
+                line += breaks
+                line_start = offset + after
+            if cut:
+                after_cr = text[cut - 1] == "\r"
+            if byte_offsets:
+                if ascii:
+                    byte += cut - done
+                else:
+                    byte += len(text[done:cut].encode("utf-8"))
+            offset += cut
+            carry = [text[cut:]] if cut < len(text) else []
+            carry_len = len(text) - cut
+            if carry:
+                carry_type = last
+
+    def generate_stream(self, fileobj, chunk_size=65536, types=None,
+                        encoding="utf-8"):
+        """
+        Generator.
+        Divides the contents of a file object into StreamToken instances
+        reading it by chunks of fixed size, so the memory used does not
+        depend on the size of the file or the length of its lines. A token
+        that crosses the boundary of chunks is yielded whole.
+
+        Args:
+            fileobj (file): object with method read, opened in text or in
+                binary mode.
+            chunk_size (int): number of characters (or bytes) read at once.
+            types (str): types of tokens to yield, e.g. "ad" for alphabetic
+                and digit tokens only. All tokens are yielded if None.
+            encoding (str): encoding used to decode a binary stream.
+
+        Yields:
+            StreamToken instances.
+
+        Raises:
+            ValueError: in case chunk_size is not positive or types contains
+                an unknown type.
+        """
+        types = self._check_stream_args(chunk_size, types)
+
+        def chunks():
+            decoder = None
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if isinstance(chunk, bytes):
+                    if decoder is None:
+                        decoder = codecs.getincrementaldecoder(encoding)()
+                    if not chunk:
+                        yield decoder.decode(b"", True)
+                        return
+                    yield decoder.decode(chunk)
+                elif not chunk:
+                    return
+                else:
+                    yield chunk
+
+        yield from self._stream(chunks(), types)
+
+    def generate_mmap(self, source, chunk_size=1 << 20, types=None):
+        """
+        Generator.
+        Divides the contents of a UTF-8 file into ByteToken instances using
+        a memory map of the file. Chunks of the map are decoded one by one,
+        so neither the whole file nor its lines are held in memory, and every
+        token knows its position in bytes, so it can be read again later by
+        seeking to it.
+
+        Args:
+            source (str or buffer): path to the file, or an mmap or any other
+                object that supports the buffer protocol.
+            chunk_size (int): number of bytes decoded at once.
+            types (str): types of tokens to yield, e.g. "ad" for alphabetic
+                and digit tokens only. All tokens are yielded if None.
+
+        Yields:
+            ByteToken instances.
+
+        Raises:
+            ValueError: in case chunk_size is not positive or types contains
+                an unknown type.
+            UnicodeDecodeError: in case the file is not valid UTF-8.
+        """
+        types = self._check_stream_args(chunk_size, types)
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    yield from self.generate_mmap(mm, chunk_size, types)
+            return
+
+        view = memoryview(source).cast("B")
+
+        def chunks():
+            size = len(view)
+            start = 0
+            while start < size:
+                end = min(start + chunk_size, size)
+                # do not split the UTF-8 sequence of a character
+                while end > start and end < size and view[end] & 0xC0 == 0x80:
+                    end -= 1
+                if end == start:
+                    end += 1
+                    while end < size and view[end] & 0xC0 == 0x80:
+                        end += 1
+                yield str(view[start:end], "utf-8")
+                start = end
+
+        try:
+            yield from self._stream(chunks(), types, byte_offsets=True)
+        finally:
+            view.release()
+
+    def _check_stream_args(self, chunk_size, types):
+        """
+        Checks the arguments of generate_stream and generate_mmap.
+
+        Returns:
+            types, all types if types is None.
+
+        Raises:
+            ValueError: in case chunk_size is not positive or types contains
+                an unknown type.
+        """
+        if not (isinstance(chunk_size, int) and chunk_size > 0):
+            raise ValueError(chunk_size)
+        if types is None:
+            return TYPES
+        if not set(types) <= set(TYPES):
+            raise ValueError("Unknown types: " + repr(types))
+        return types
+
+    def tokenize_many(self, texts, workers=None, chunksize=1000,
+                      method="generate_with_type"):
+        """
+        Generator.
+        Tokenizes many strings on a pool of processes. The strings are sent to
+        the workers in chunks and only a few chunks per worker are in flight
+        at a time, so texts may be an endless iterable.
+
+        Args:
+            texts (iterable): strings to be tokenized, e.g. lines of a file.
+            workers (int): number of processes, os.cpu_count() if None. With
+                one worker the strings are tokenized in this process.
+            chunksize (int): number of strings sent to a worker at once.
+            method (str): generator used for every string, one of
+                BATCH_METHODS.
+
+        Yields:
+            Lists of tokens (or spans for generate_spans), one per string, in
+            the order of texts.
+
+        Raises:
+            ValueError: in case method is unknown or a text is not str.
+        """
+        if method not in BATCH_METHODS:
+            raise ValueError("Unknown method: " + repr(method))
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            generate = getattr(self, method)
+            for text in texts:
+                yield list(generate(text))
+            return
+
+        texts = iter(texts)
+        chunks = iter(lambda: list(islice(texts, chunksize)), [])
+        pool = ProcessPoolExecutor(workers)
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(_tokenize_chunk, self.backend,
+                                           method, chunk))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def tokenize_arrays(self, text, types=None):
+        """
+        Divides a string into tokens classifying all its characters at once.
+        The tokens are returned as parallel numpy arrays instead of TypeToken
+        instances. Works with any backend, but requires numpy.
+
+        Args:
+            text (str): String to be tokenized.
+            types (str): types of tokens to return, e.g. "ad" for alphabetic
+                and digit tokens only. All tokens are returned if None.
+
+        Returns:
+            Tuple of numpy arrays (start, end, type) where start is the
+            position of the first character of a token, end is the position
+            after its last character and type is the code of its type
+            (ord of 'a', 'd', 's', 'p' or 'o').
+
+        Raises:
+            ValueError: in case text is not str.
+            ImportError: in case numpy is not installed.
+        """
+        if not isinstance(text, str):
+            raise ValueError
+        if numpy is None:
+            raise ImportError("tokenize_arrays requires numpy")
+        if not text:
+            empty = numpy.zeros(0, dtype=numpy.int64)
+            return empty, empty, numpy.zeros(0, dtype=numpy.uint8)
+
+        codes = _type_array(text)
+        # a token starts wherever the type differs from the previous one
+        change = numpy.flatnonzero(codes[1:] != codes[:-1]) + 1
+        starts = numpy.concatenate(([0], change))
+        ends = numpy.concatenate((change, [len(codes)]))
+        tps = codes[starts]
+        if types is not None:
+            keep = numpy.isin(tps, numpy.frombuffer(types.encode("ascii"),
+                                                    dtype=numpy.uint8))
+            starts, ends, tps = starts[keep], ends[keep], tps[keep]
+        return starts, ends, tps
 
 
 def main():
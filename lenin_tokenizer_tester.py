@@ -1,7 +1,8 @@
 import unittest
 import os
-from collections import Generator
-from lenin_tokenizer import Tokenizer
+import io
+from collections.abc import Generator
+from lenin_tokenizer import Tokenizer, Token, TypeToken, numpy
 
 
 class GetTypeTest(unittest.TestCase):
@@ -63,6 +64,14 @@ class GetTypeTest(unittest.TestCase):
         self.assertEqual(len(result), 1)
         self.assertEqual(result, "p")
 
+    def test_astral(self):
+        result = self.tokenizer._getType('𝐀')
+        self.assertEqual(result, "a")
+        result = self.tokenizer._getType('𝟗')
+        self.assertEqual(result, "d")
+        result = self.tokenizer._getType('😀')
+        self.assertEqual(result, "o")
+
         
 class GenerateTest(unittest.TestCase):
     """
@@ -271,6 +280,15 @@ class GenerateWithTypeTest(unittest.TestCase):
         self.assertEqual(result[26].pos, 47)
         self.assertEqual(result[26].tp, 'p')
 
+    def test_astral_characters(self):
+        result = list(self.tokenizer.generate_with_type('𝐀𝐁c 😀😀'))
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result[0].s, '𝐀𝐁c')
+        self.assertEqual(result[0].tp, 'a')
+        self.assertEqual(result[2].s, '😀😀')
+        self.assertEqual(result[2].pos, 4)
+        self.assertEqual(result[2].tp, 'o')
+
     def test_empty_string(self):
         result = list(self.tokenizer.generate(""))
         self.assertEqual(len(result), 0)
@@ -304,6 +322,397 @@ class GenerateWordsAndNumbersTest(unittest.TestCase):
         self.assertEqual(result[12].s, '30')
         self.assertEqual(result[12].pos, 45)
 
+
+class GenerateSpansTest(unittest.TestCase):
+    """
+    Tests method generate_spans of class Tokenizer
+    """
+    def setUp(self):
+        self.tokenizer = Tokenizer()
+
+    def test_output_type(self):
+        result = self.tokenizer.generate_spans('test')
+        self.assertIsInstance(result, Generator)
+
+    def test_all_types_of_character(self):
+        result = list(self.tokenizer.generate_spans('I am  tired, 6:30!!!'))
+        self.assertEqual(result, [(0, 1, 'a'), (1, 2, 's'), (2, 4, 'a'),
+                                  (4, 6, 's'), (6, 11, 'a'), (11, 12, 'p'),
+                                  (12, 13, 's'), (13, 14, 'd'),
+                                  (14, 15, 'p'), (15, 17, 'd'),
+                                  (17, 20, 'p')])
+
+    def test_types_filter(self):
+        result = list(self.tokenizer.generate_spans('I am  tired, 6:30!!!',
+                                                    "ad"))
+        self.assertEqual(result, [(0, 1, 'a'), (2, 4, 'a'), (6, 11, 'a'),
+                                  (13, 14, 'd'), (15, 17, 'd')])
+        result = list(self.tokenizer.generate_spans('I am  tired, 6:30!!!',
+                                                    "p"))
+        self.assertEqual(result, [(11, 12, 'p'), (14, 15, 'p'),
+                                  (17, 20, 'p')])
+
+    def test_empty_string(self):
+        result = list(self.tokenizer.generate_spans(""))
+        self.assertEqual(len(result), 0)
+
+    def test_error_wrong_input_number(self):
+        with self.assertRaises(ValueError):
+            list(self.tokenizer.generate_spans(42))
+
+    def test_error_wrong_types(self):
+        with self.assertRaises(ValueError):
+            list(self.tokenizer.generate_spans("test", "ax"))
+
+    def test_empty_types(self):
+        backends = ["char", "regex"] + (["numpy"] if numpy is not None else [])
+        for backend in backends:
+            tokenizer = Tokenizer(backend=backend)
+            self.assertEqual(list(tokenizer.generate_spans("a b, 1", "")), [])
+            self.assertEqual(list(tokenizer.generate_stream(
+                io.StringIO("a b, 1"), types="")), [])
+
+    def test_backends(self):
+        text = 'I am  tired, 6:30!!! 😀𝐀b'
+        ideal = list(self.tokenizer.generate_spans(text))
+        backends = ["regex"] + (["numpy"] if numpy is not None else [])
+        for backend in backends:
+            tokenizer = Tokenizer(backend=backend)
+            self.assertEqual(list(tokenizer.generate_spans(text)), ideal)
+            self.assertEqual(list(tokenizer.generate_spans(text, "dp")),
+                             [span for span in ideal if span[2] in "dp"])
+
+
+class TokenSlotsTest(unittest.TestCase):
+    """
+    Tests that tokens do not have __dict__.
+    """
+    def test_token(self):
+        token = Token(0, 'test')
+        self.assertFalse(hasattr(token, '__dict__'))
+        with self.assertRaises(AttributeError):
+            token.tp = 'a'
+
+    def test_type_token(self):
+        token = TypeToken(0, 'test', 'a')
+        self.assertFalse(hasattr(token, '__dict__'))
+        self.assertEqual((token.pos, token.s, token.tp), (0, 'test', 'a'))
+
+
+class GenerateStreamTest(unittest.TestCase):
+    """
+    Tests method generate_stream of class Tokenizer
+    """
+    def setUp(self):
+        self.tokenizer = Tokenizer()
+        self.text = "Hello wor😀ld\n\nЯ очень  устала.\nok 12" * 3
+
+    def test_output_type(self):
+        result = self.tokenizer.generate_stream(io.StringIO(self.text))
+        self.assertIsInstance(result, Generator)
+
+    def test_one_chunk(self):
+        result = list(self.tokenizer.generate_stream(io.StringIO("ab 1\n c")))
+        self.assertEqual([(t.pos, t.s, t.tp, t.line, t.col) for t in result],
+                         [(0, 'ab', 'a', 0, 0), (2, ' ', 's', 0, 2),
+                          (3, '1', 'd', 0, 3), (4, '\n', 'o', 0, 4),
+                          (5, ' ', 's', 1, 0), (6, 'c', 'a', 1, 1)])
+
+    def test_chunk_boundaries(self):
+        ideal = [(t.pos, t.s, t.tp)
+                 for t in self.tokenizer.generate_with_type(self.text)]
+        lines = self.text.split("\n")
+        for chunk_size in (1, 2, 3, 7, 1000):
+            result = list(self.tokenizer.generate_stream(
+                io.StringIO(self.text), chunk_size))
+            self.assertEqual([(t.pos, t.s, t.tp) for t in result], ideal)
+            for t in result:
+                if "\n" not in t.s:
+                    self.assertEqual(lines[t.line][t.col:t.col + len(t.s)],
+                                     t.s)
+
+    def test_bytes(self):
+        ideal = [(t.pos, t.s, t.tp, t.line, t.col)
+                 for t in self.tokenizer.generate_stream(
+                     io.StringIO(self.text))]
+        for chunk_size in (1, 5, 1000):
+            result = list(self.tokenizer.generate_stream(
+                io.BytesIO(self.text.encode()), chunk_size))
+            self.assertEqual([(t.pos, t.s, t.tp, t.line, t.col)
+                              for t in result], ideal)
+
+    def test_types_filter(self):
+        result = list(self.tokenizer.generate_stream(
+            io.StringIO(self.text), 4, "ad"))
+        self.assertEqual([(t.pos, t.s) for t in result],
+                         [(t.pos, t.s)
+                          for t in self.tokenizer.generate_AD(self.text)])
+        self.assertEqual((result[3].s, result[3].line, result[3].col),
+                         ('Я', 2, 0))
+
+    def test_long_runs(self):
+        text = "a" * 5000 + " \n" * 3000 + "b" * 4000 + "..." + "c"
+        for types in (None, "ad"):
+            ideal = [(t.pos, t.s, t.tp)
+                     for t in self.tokenizer.generate_with_type(text)
+                     if types is None or t.tp in types]
+            result = list(self.tokenizer.generate_stream(
+                io.StringIO(text), 64, types))
+            self.assertEqual([(t.pos, t.s, t.tp) for t in result], ideal)
+            self.assertEqual((result[-1].line, result[-1].col),
+                             (3000, 4003))
+
+    def test_empty_stream(self):
+        result = list(self.tokenizer.generate_stream(io.StringIO("")))
+        self.assertEqual(result, [])
+
+    def test_error_wrong_chunk_size(self):
+        with self.assertRaises(ValueError):
+            list(self.tokenizer.generate_stream(io.StringIO("test"), 0))
+
+    def test_error_wrong_types(self):
+        with self.assertRaises(ValueError):
+            list(self.tokenizer.generate_stream(io.StringIO("test"), 10, "x"))
+
+
+class GenerateMmapTest(unittest.TestCase):
+    """
+    Tests method generate_mmap of class Tokenizer
+    """
+    def setUp(self):
+        self.tokenizer = Tokenizer()
+        self.text = "Hello wor😀ld\r\n\nЯ очень  устала.\nok 12" * 3
+        with open("test.txt", 'wb') as f:
+            f.write(self.text.encode('utf-8'))
+
+    def test_output_type(self):
+        result = self.tokenizer.generate_mmap("test.txt")
+        self.assertIsInstance(result, Generator)
+
+    def test_same_as_stream(self):
+        ideal = [(t.pos, t.s, t.tp, t.line, t.col)
+                 for t in self.tokenizer.generate_stream(
+                     io.StringIO(self.text))]
+        for chunk_size in (1, 2, 5, 1 << 20):
+            result = list(self.tokenizer.generate_mmap("test.txt",
+                                                       chunk_size))
+            self.assertEqual([(t.pos, t.s, t.tp, t.line, t.col)
+                              for t in result], ideal)
+
+    def test_universal_newlines(self):
+        text = "ab\rcd\r\nef\n\rgh\r\r\n\nij"
+        with open("test.txt", 'w', newline='') as f:
+            f.write(text)
+        with open("test.txt", encoding='utf-8') as f:
+            ideal = [(t.s, t.line, t.col)
+                     for t in self.tokenizer.generate_stream(f, types="ad")]
+        self.assertEqual(ideal, [('ab', 0, 0), ('cd', 1, 0), ('ef', 2, 0),
+                                 ('gh', 4, 0), ('ij', 7, 0)])
+        for chunk_size in range(1, len(text) + 1):
+            for types in ("ad", None):
+                result = [(t.s, t.line, t.col)
+                          for t in self.tokenizer.generate_mmap(
+                              "test.txt", chunk_size, types)
+                          if t.tp in "ad"]
+                self.assertEqual(result, ideal)
+
+    def test_byte_offsets(self):
+        with open("test.txt", 'rb') as f:
+            for t in self.tokenizer.generate_mmap("test.txt", 7, "ad"):
+                f.seek(t.byte)
+                self.assertEqual(f.read(len(t.s.encode('utf-8'))),
+                                 t.s.encode('utf-8'))
+
+    def test_buffer(self):
+        result = list(self.tokenizer.generate_mmap(b'ab \xd1\x8f', 2))
+        self.assertEqual([(t.pos, t.s, t.byte) for t in result],
+                         [(0, 'ab', 0), (2, ' ', 2), (3, 'я', 3)])
+
+    def test_empty_file(self):
+        with open("test.txt", 'wb') as f:
+            pass
+        result = list(self.tokenizer.generate_mmap("test.txt"))
+        self.assertEqual(result, [])
+
+    def test_error_wrong_chunk_size(self):
+        with self.assertRaises(ValueError):
+            list(self.tokenizer.generate_mmap("test.txt", -1))
+
+    def tearDown(self):
+        os.remove("test.txt")
+
+
+class TokenizeManyTest(unittest.TestCase):
+    """
+    Tests method tokenize_many of class Tokenizer
+    """
+    def setUp(self):
+        self.tokenizer = Tokenizer()
+        self.texts = ["line " + str(i) + ", Строка!" for i in range(100)]
+
+    def test_output_type(self):
+        result = self.tokenizer.tokenize_many(self.texts, workers=2)
+        self.assertIsInstance(result, Generator)
+        result.close()
+
+    def test_order(self):
+        result = list(self.tokenizer.tokenize_many(self.texts, workers=2,
+                                                   chunksize=7))
+        self.assertEqual(len(result), 100)
+        for text, tokens in zip(self.texts, result):
+            self.assertEqual(
+                [(t.pos, t.s, t.tp) for t in tokens],
+                [(t.pos, t.s, t.tp) for t in
+                 self.tokenizer.generate_with_type(text)])
+
+    def test_one_worker(self):
+        result = list(self.tokenizer.tokenize_many(self.texts, workers=1,
+                                                   method="generate_AD"))
+        self.assertEqual([t.s for t in result[42]], ['line', '42', 'Строка'])
+
+    def test_spans(self):
+        result = list(self.tokenizer.tokenize_many(iter(self.texts[:3]),
+                                                   workers=2,
+                                                   method="generate_spans"))
+        self.assertEqual(result[2], [(0, 4, 'a'), (4, 5, 's'), (5, 6, 'd'),
+                                     (6, 7, 'p'), (7, 8, 's'),
+                                     (8, 14, 'a'), (14, 15, 'p')])
+
+    def test_empty_input(self):
+        result = list(self.tokenizer.tokenize_many([], workers=2))
+        self.assertEqual(result, [])
+
+    def test_error_wrong_method(self):
+        with self.assertRaises(ValueError):
+            list(self.tokenizer.tokenize_many(self.texts, method="index"))
+
+    def test_error_wrong_input(self):
+        with self.assertRaises(ValueError):
+            list(self.tokenizer.tokenize_many(["test", 42], workers=2))
+
+
+class RegexBackendTest(unittest.TestCase):
+    """
+    Tests that the regex backend of class Tokenizer produces the same tokens
+    as the char backend.
+    """
+    texts = ["I am very  tired, I want to go to sleep at 6:30!!!",
+             "...Я очень устала :(((",
+             "Ёлки-палки, 1812 год\n",
+             "𝐀𝐁c 😀😀 ٣٤ x²",
+             "\t\u00a0 ¿Qué? «ёж»",
+             "a",
+             "!"]
+
+    def setUp(self):
+        self.char = Tokenizer()
+        self.regex = Tokenizer(backend="regex")
+
+    def test_wrong_backend(self):
+        with self.assertRaises(ValueError):
+            Tokenizer(backend="turtle")
+
+    def test_same_tokens(self):
+        for text in self.texts:
+            self.assertEqual(
+                [(t.pos, t.s) for t in self.char.generate(text)],
+                [(t.pos, t.s) for t in self.regex.generate(text)])
+            self.assertEqual(
+                [(t.pos, t.s, t.tp) for t in self.char.generate_with_type(text)],
+                [(t.pos, t.s, t.tp) for t in self.regex.generate_with_type(text)])
+            self.assertEqual(
+                [(t.pos, t.s, t.tp) for t in self.char.generate_AD(text)],
+                [(t.pos, t.s, t.tp) for t in self.regex.generate_AD(text)])
+
+    def test_error_wrong_input_AD(self):
+        with self.assertRaises(ValueError):
+            list(self.regex.generate_AD(42))
+
+
+class RegexGenerateTest(GenerateTest):
+    def setUp(self):
+        self.tokenizer = Tokenizer(backend="regex")
+
+
+class RegexTokenizeTest(TokenizeTest):
+    def setUp(self):
+        self.tokenizer = Tokenizer(backend="regex")
+
+
+class RegexGenerateWithTypeTest(GenerateWithTypeTest):
+    def setUp(self):
+        self.tokenizer = Tokenizer(backend="regex")
+
+
+class RegexGenerateWordsAndNumbersTest(GenerateWordsAndNumbersTest):
+    def setUp(self):
+        self.tokenizer = Tokenizer(backend="regex")
+
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TokenizeArraysTest(unittest.TestCase):
+    """
+    Tests method tokenize_arrays and the numpy backend of class Tokenizer.
+    """
+    def setUp(self):
+        self.tokenizer = Tokenizer(backend="numpy")
+
+    def test_output_type(self):
+        starts, ends, types = self.tokenizer.tokenize_arrays('test.')
+        self.assertIsInstance(starts, numpy.ndarray)
+        self.assertIsInstance(ends, numpy.ndarray)
+        self.assertIsInstance(types, numpy.ndarray)
+
+    def test_all_types_of_character(self):
+        starts, ends, types = self.tokenizer.tokenize_arrays('Я очень 12 😀!')
+        self.assertEqual(starts.tolist(), [0, 1, 2, 7, 8, 10, 11, 12])
+        self.assertEqual(ends.tolist(), [1, 2, 7, 8, 10, 11, 12, 13])
+        self.assertEqual(bytes(types.tolist()), b'asasdsop')
+
+    def test_types_filter(self):
+        starts, ends, types = self.tokenizer.tokenize_arrays(
+            'Я очень 12 😀!', "ad")
+        self.assertEqual(starts.tolist(), [0, 2, 8])
+        self.assertEqual(ends.tolist(), [1, 7, 10])
+        self.assertEqual(bytes(types.tolist()), b'aad')
+
+    def test_empty_string(self):
+        starts, ends, types = self.tokenizer.tokenize_arrays('')
+        self.assertEqual(len(starts), 0)
+        self.assertEqual(len(ends), 0)
+        self.assertEqual(len(types), 0)
+
+    def test_error_wrong_input_number(self):
+        with self.assertRaises(ValueError):
+            self.tokenizer.tokenize_arrays(42)
+
+    def test_same_tokens(self):
+        char = Tokenizer()
+        for text in RegexBackendTest.texts:
+            self.assertEqual(
+                [(t.pos, t.s) for t in char.generate(text)],
+                [(t.pos, t.s) for t in self.tokenizer.generate(text)])
+            self.assertEqual(
+                [(t.pos, t.s, t.tp) for t in char.generate_with_type(text)],
+                [(t.pos, t.s, t.tp) for t in
+                 self.tokenizer.generate_with_type(text)])
+            self.assertEqual(
+                [(t.pos, t.s, t.tp) for t in char.generate_AD(text)],
+                [(t.pos, t.s, t.tp) for t in self.tokenizer.generate_AD(text)])
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class NumpyGenerateTest(GenerateTest):
+    def setUp(self):
+        self.tokenizer = Tokenizer(backend="numpy")
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class NumpyGenerateWithTypeTest(GenerateWithTypeTest):
+    def setUp(self):
+        self.tokenizer = Tokenizer(backend="numpy")
+
     
 if __name__ == '__main__':
     unittest.main()